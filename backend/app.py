@@ -1,39 +1,236 @@
-from flask import Flask, request, jsonify
+import time
+IMPORT_STARTED = time.perf_counter()  # Checked against IMPORT_TIME_BUDGET_SECONDS at the end of the module
+
+from flask import Flask, Request, Response, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
-from detect_items import detect_objects
-from image_utils import validate_image, get_image_info
+from detect_items import (detect_objects, get_inference_stats, get_model_id, model_status, on_model_ready,
+                          resolve_modes, shutdown_inference, start_model_loading, wait_for_model, ModelNotReadyError,
+                          PREPROCESS_MODES, TILING_MODES)
+from image_utils import (decode_image, validate_image_array, get_image_info_array,
+                         ImageRejected, ImageUploadBuffer, MAX_FILE_SIZE)
+from job_queue import JobQueue, QueueFullError
+from detection_store import open_detection_store
+from inventory_shards import FridgeInventories, InvalidFridgeError, check_fridge_id
+from item_history import ItemHistory
+from event_stream import EventBroadcaster, format_event
+from capture_commands import CommandBus
+from frame_gate import FrameChangeGate, frame_signature
+from process_pool import PoolUnavailableError
+from result_cache import DetectionResultCache, content_hash, make_cache_key
+from roi import RegionStore, regions_key
+from temporal_filter import TemporalCountFilter
+from image_store import ImageStore
+from metrics import REGISTRY, CONTENT_TYPE, span, trace, format_trace
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import threading
+import logging
 import os
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+
+class UploadRequest(Request):
+    """
+    Streams the /upload image part into an ImageUploadBuffer instead of
+    Werkzeug's spooled temp file, so it never touches the disk and is
+    rejected by its header before the rest of the body is read
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint == "upload":
+            return ImageUploadBuffer()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)
 
 # Configuration
-UPLOAD_FOLDER = os.path.join("static", "images")
-DATABASE_FILE = "database.json"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+DEBUG = os.environ.get("FLASK_DEBUG", "0") == "1"  # Reloader + debugger for `python app.py` only
+PORT = int(os.environ.get("PORT", 5000))
+SHUTDOWN_DRAIN_SECONDS = 10  # On shutdown, wait this long for queued async detections (keep well below
+                             # gunicorn's graceful_timeout, which also covers in-flight requests)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")  # DEBUG for per-request details and stage timings
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+MAX_UPLOAD_REQUEST_BYTES = MAX_FILE_SIZE + 64 * 1024  # Image plus form fields; larger bodies get 413 unread
+IMPORT_TIME_BUDGET_SECONDS = 1.5  # Importing this module must not load the model
+MODEL_WAIT_SECONDS = 10  # Synchronous uploads wait this long for a loading model, then get 503
+UPLOAD_FOLDER = os.path.join("static", "images")  # <device_id>/<YYYYMMDD>/<time>_<random>.jpg
+IMAGE_MAX_BYTES = 2 * 1024 ** 3  # Disk budget for saved uploads; the oldest are evicted first
+IMAGE_MAX_AGE_DAYS = 7  # Also delete saved uploads older than this (None to keep)
+IMAGE_KEEP = "all"  # "all" frames or only frames that "changed" the inventory
+THUMBNAIL_FOLDER = os.path.join("static", "thumbnails")  # Small copies kept longer (None to disable)
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_MAX_BYTES = 256 * 1024 ** 2
+THUMBNAIL_MAX_AGE_DAYS = 90
+IMAGE_SWEEP_SECONDS = 60  # How often the retention thread evicts
+DATABASE_BACKEND = "jsonl"  # "jsonl" (append-only log) or "sqlite" (WAL mode, multi-process safe)
+DATABASE_FILE = "database.jsonl" if DATABASE_BACKEND == "jsonl" else "database.sqlite3"
+LEGACY_DATABASE_FILE = "database.json"  # Imported once if DATABASE_FILE does not exist yet
+DATABASE_MAX_ENTRIES = 1000  # Detections kept in history (None for unlimited)
+DATABASE_MAX_AGE_DAYS = None  # Also drop detections older than this
+DATABASE_FSYNC = False  # fsync every write (survives power loss, slower)
+SAVE_UPLOADS = True  # Persist original uploads to UPLOAD_FOLDER (off the request path)
+ASYNC_UPLOADS = False  # Default for /upload when the client does not pass async=true|false
+UPLOAD_WORKERS = 2  # Background detection workers for async uploads
+UPLOAD_QUEUE_SIZE = 32  # Queued async uploads before answering 429
+RETRY_AFTER_SECONDS = 5
+MAX_JOB_WAIT_SECONDS = 30  # Long-poll cap for /jobs/<id>?wait=
+EVENT_BUFFER_SIZE = 64  # Pending events per SSE client before it is dropped
+EVENT_HEARTBEAT_SECONDS = 15
+DEVICE_POLL_SECONDS = 25  # Default long-poll time for /devices/<id>/commands
+MAX_DEVICE_POLL_SECONDS = 60
+CAPTURE_COMMAND_TTL = 60  # Undelivered capture triggers expire after this
+DEFAULT_DEVICE_ID = "default"  # Used when an upload carries no device_id
+DEFAULT_FRIDGE_ID = "default"  # Inventory shard for uploads/requests without a fridge_id
+DEVICE_FRIDGES = {}  # device_id -> fridge_id, for cameras that do not send fridge_id themselves
+INVENTORY_DIR = "inventories"  # One <fridge_id>.json per fridge
+INVENTORY_FLUSH_SECONDS = 2  # Changed fridges are saved this often (and at exit)
+ITEM_HISTORY_DIR = "item_history"  # Compact per-item count history (/history/items, /history/consumption)
+CONSUMPTION_DEFAULT_DAYS = 7  # /history/consumption range when no since= is given
+FRAME_GATE_ENABLED = True  # Reuse the last result when a camera's frame is unchanged
+FRAME_CHANGE_THRESHOLD = 4.0  # Mean abs. pixel difference (0-255) of 64x48 thumbnails
+FRAME_GATE_MAX_AGE_SECONDS = 300  # Re-run detection at least this often per camera
+RESULT_CACHE_ENABLED = True  # Reuse results for byte-identical re-uploads (retries)
+RESULT_CACHE_SIZE = 256  # Max cached results (LRU)
+RESULT_CACHE_TTL_SECONDS = 3600
+RESULT_CACHE_FILE = "result_cache.json"  # Persist across restarts (None to disable)
+DEVICE_PREPROCESS_MODES = {}  # device_id -> "fixed" | "auto_gamma" | "clahe" | "none"
+DEVICE_TILING_MODES = {}  # device_id -> "off" | "on" | "auto" (high-resolution cameras)
+DEVICE_ROI_FILE = "device_rois.json"  # Per-camera regions of interest (PUT /devices/<id>/roi)
+TEMPORAL_FUSION = True  # Smooth per-camera counts over several frames before updating the inventory
+TEMPORAL_WINDOW = 5  # Frames in each (camera, item) sliding window (median)
+TEMPORAL_STABLE_FRAMES = 3  # A new count must hold for this many frames to be committed
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_REQUEST_BYTES
+
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger("app")
+
+# Start loading the detector before any of the threads below exist (the
+# process pool forks its workers here). The debug reloader's file-watcher
+# process never serves requests, so it does not load the model.
+if not (__name__ == "__main__" and DEBUG and os.environ.get("WERKZEUG_RUN_MAIN") != "true"):
+    start_model_loading()
+
+# Single background writer so persisting uploads never blocks a response
+image_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-writer")
+
+# Saved uploads (and thumbnails) with size- and age-based eviction
+image_store = ImageStore(
+    UPLOAD_FOLDER,
+    max_bytes=IMAGE_MAX_BYTES,
+    max_age_days=IMAGE_MAX_AGE_DAYS,
+    thumbnail_root=THUMBNAIL_FOLDER,
+    thumbnail_width=THUMBNAIL_WIDTH,
+    thumbnail_max_bytes=THUMBNAIL_MAX_BYTES,
+    thumbnail_max_age_days=THUMBNAIL_MAX_AGE_DAYS,
+    sweep_interval=IMAGE_SWEEP_SECONDS
+).start()
+
+# Append-only detection history
+detection_store = open_detection_store(
+    DATABASE_FILE,
+    backend=DATABASE_BACKEND,
+    max_entries=DATABASE_MAX_ENTRIES,
+    max_age_days=DATABASE_MAX_AGE_DAYS,
+    durable=DATABASE_FSYNC,
+    legacy_path=LEGACY_DATABASE_FILE
+)
+
+# Worker pool for async uploads (/upload?async=true -> /jobs/<id>)
+upload_jobs = JobQueue(num_workers=UPLOAD_WORKERS, max_queue_size=UPLOAD_QUEUE_SIZE)
+
+# Inventory per fridge, each with its own lock and file, loaded on first use
+inventories = FridgeInventories(INVENTORY_DIR, flush_interval=INVENTORY_FLUSH_SECONDS).start()
+
+# Every inventory change as compact binary records, for time-range analytics
+item_history = ItemHistory(ITEM_HISTORY_DIR)
+
+# Server-sent inventory deltas (/inventory/stream)
+inventory_events = EventBroadcaster(buffer_size=EVENT_BUFFER_SIZE, heartbeat_seconds=EVENT_HEARTBEAT_SECONDS)
+
+# Per-camera command queues for on-demand capture
+capture_commands = CommandBus(command_ttl=CAPTURE_COMMAND_TTL)
+
+# Per-camera change detection in front of detect_objects
+frame_gate = FrameChangeGate(threshold=FRAME_CHANGE_THRESHOLD, max_age_seconds=FRAME_GATE_MAX_AGE_SECONDS)
+
+# Per-camera, per-item count smoothing between detection and the inventory
+count_filter = TemporalCountFilter(window=TEMPORAL_WINDOW, stable_frames=TEMPORAL_STABLE_FRAMES)
+
+# Per-camera regions of interest; only these parts of a frame are run through the model
+region_store = RegionStore(DEVICE_ROI_FILE)
+
+# Detection results keyed by image content + parameters
+result_cache = DetectionResultCache(
+    max_entries=RESULT_CACHE_SIZE,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    model_id=get_model_id(),
+    persist_path=RESULT_CACHE_FILE
+)
+# Results from other weights (replaced file, other backend) are dropped once the detector has loaded
+on_model_ready(result_cache.set_model_id)
+
+# Prometheus metrics (/metrics); stage timings come from metrics.span()
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by endpoint, method and status")
+HTTP_ERRORS = REGISTRY.counter("http_request_errors_total", "HTTP requests that answered 5xx")
+HTTP_DURATION = REGISTRY.histogram("http_request_duration_seconds", "Time to build each HTTP response")
+UPLOAD_OUTCOMES = REGISTRY.counter("upload_outcomes_total", "Uploads by outcome (detected, cached, unchanged)")
+REGISTRY.gauge("upload_queue_depth", "Async uploads waiting for a worker",
+               lambda: upload_jobs.stats()["queue_depth"])
+REGISTRY.gauge("upload_jobs_pending", "Async uploads queued or running",
+               lambda: upload_jobs.stats()["pending_jobs"])
+REGISTRY.gauge("inference_queue_depth", "Frames waiting in the inference batch scheduler",
+               lambda: get_inference_stats().get("queue_depth"))
+REGISTRY.gauge("inventory_items", "Items in the loaded fridge inventories", lambda: inventories.stats()["items"])
+REGISTRY.gauge("event_subscribers", "Open /inventory/stream connections",
+               lambda: inventory_events.stats()["subscribers"])
+REGISTRY.gauge("image_store_bytes", "Bytes of saved uploads on disk",
+               lambda: image_store.stats()["images"]["bytes"])
+REGISTRY.gauge("model_ready", "1 once the detector is loaded", lambda: int(model_status()["ready"]))
+
+
+@app.before_request
+def start_request_timer():
+    request.environ["metrics.started"] = time.perf_counter()
+
 
-# Temporary in-memory storage for detected items
-inventory = []
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get("metrics.started")
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        HTTP_ERRORS.inc(endpoint=endpoint)
+    if started is not None:
+        HTTP_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
 
 
 @app.route("/upload", methods=["POST"])
 def upload():
+    with trace() as spans:
+        response = handle_upload()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TIMING] upload %s", format_trace(spans))
+    return response
+
+
+def handle_upload():
     try:
-        print("\n" + "="*50)
-        print("[DEBUG] Upload request received")
-        print("[DEBUG] Request method:", request.method)
-        print("[DEBUG] Request content type:", request.content_type)
-        print("[DEBUG] Request headers:", dict(request.headers))
-        print("[DEBUG] Request files keys:", list(request.files.keys()))
-        print("[DEBUG] Request form keys:", list(request.form.keys()))
-        print("[DEBUG] Request data:", request.data[:100] if request.data else "No data")
+        # The multipart body is read here; the image part streams into memory
+        # and is checked by its header as it arrives (UploadRequest)
+        with span("receive"):
+            files = request.files
+        logger.debug("[UPLOAD] %s request, content type %s, files %s, form %s",
+                     request.method, request.content_type, list(files), list(request.form))
         
         # Check if image file is present
         if "image" not in request.files:
-            print("[ERROR] No 'image' key in request.files")
-            print("[DEBUG] Available keys:", list(request.files.keys()))
+            logger.warning("[UPLOAD] No 'image' key in request.files (got %s)", list(request.files))
             return jsonify({
                 "error": "No image file provided. Expected key: 'image'",
                 "available_keys": list(request.files.keys())
@@ -42,184 +239,600 @@ def upload():
         file = request.files["image"]
         
         if file.filename == "" or file.filename is None:
-            print("[ERROR] Empty or None filename")
+            logger.warning("[UPLOAD] Empty or None filename")
             return jsonify({"error": "No file selected"}), 400
         
-        print(f"[SUCCESS] File received successfully!")
-        print(f"[SUCCESS] Filename: {file.filename}")
-        print(f"[SUCCESS] Content-Type: {file.content_type}")
+        logger.debug("[UPLOAD] File received: %s (%s, %s %s)", file.filename, file.content_type,
+                     getattr(file.stream, "image_format", None), getattr(file.stream, "image_size", None))
+        
+        device_id = request.form.get('device_id') or request.headers.get('X-Device-ID') or DEFAULT_DEVICE_ID
+        fridge_id = (request.form.get('fridge_id') or request.headers.get('X-Fridge-ID')
+                     or DEVICE_FRIDGES.get(device_id) or DEFAULT_FRIDGE_ID)
+        try:
+            check_fridge_id(fridge_id)
+        except InvalidFridgeError as e:
+            return jsonify({"error": str(e)}), 400
+        if device_id != DEFAULT_DEVICE_ID:
+            capture_commands.touch(device_id)
+        
+        # Read the upload once and decode it once; every stage below shares this array
+        image_bytes = file.read()
+        file_size = len(image_bytes)
+        image_hash = content_hash(image_bytes) if RESULT_CACHE_ENABLED else None
+        with span("decode"):
+            img = decode_image(image_bytes)
         
-        # Save the uploaded image with timestamped filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}.jpg"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        print(f"[SUCCESS] Image saved to: {filepath}")
+        filename = image_store.new_name(device_id)
+        filepath = image_store.path(filename)
         
         # Validate image
-        is_valid, error_message = validate_image(filepath)
+        with span("validate"):
+            is_valid, error_message = validate_image_array(img, file_size)
         if not is_valid:
-            print(f"[ERROR] Image validation failed: {error_message}")
+            logger.warning("[UPLOAD] Image validation failed: %s", error_message)
             return jsonify({"error": f"Invalid image: {error_message}"}), 400
         
-        # Get image information
-        image_info = get_image_info(filepath)
-        file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
-        
-        if image_info:
-            print(f"[INFO] Image dimensions: {image_info['width']}x{image_info['height']}")
-            print(f"[INFO] Image size: {image_info['file_size_kb']} KB")
-            print(f"[INFO] Image sharpness: {image_info['sharpness']}")
-            print(f"[INFO] Image brightness: {image_info['brightness']}")
-        
-        # 🧠 Run YOLO object detection
-        print("[DETECTION] Running YOLOv8 detection...")
+        # Persist the original bytes asynchronously (optional); with
+        # IMAGE_KEEP = "changed" process_upload decides after detection
+        save_image = request.form.get('save_image', str(SAVE_UPLOADS)).lower() == 'true'
+        pending_image = None
+        if save_image and IMAGE_KEEP == "changed":
+            pending_image = image_bytes
+        elif save_image:
+            image_writer.submit(write_image_file, filename, image_bytes, img)
         
         # Get detection parameters from request (optional)
-        min_confidence = float(request.form.get('min_confidence', 0.25))
-        filter_food = request.form.get('filter_food', 'true').lower() == 'true'
-        enable_preprocessing = request.form.get('preprocess', 'true').lower() == 'true'
-        save_annotated = request.form.get('save_annotated', 'false').lower() == 'true'
-        
-        # Run detection with enhanced settings
-        detected_items = detect_objects(
-            filepath, 
-            min_confidence=min_confidence, 
-            filter_food=filter_food,
-            enable_preprocessing=enable_preprocessing,
-            save_annotated=save_annotated
-        )
-        print(f"[DETECTION] Detected {len(detected_items)} items")
+        detection_params = {
+            "min_confidence": float(request.form.get('min_confidence', 0.25)),
+            "filter_food": request.form.get('filter_food', 'true').lower() == 'true',
+            "enable_preprocessing": request.form.get('preprocess', 'true').lower() == 'true',
+            "save_annotated": request.form.get('save_annotated', 'false').lower() == 'true',
+            "preprocess_mode": request.form.get('preprocess_mode') or DEVICE_PREPROCESS_MODES.get(device_id),
+            "tiling": request.form.get('tiling') or DEVICE_TILING_MODES.get(device_id),
+            "regions": region_store.get(device_id) if request.form.get('roi', 'true').lower() == 'true' else None,
+        }
+        if detection_params["preprocess_mode"] not in (None,) + PREPROCESS_MODES:
+            return jsonify({
+                "error": f"preprocess_mode must be one of {', '.join(PREPROCESS_MODES)}"
+            }), 400
+        if detection_params["tiling"] not in (None,) + TILING_MODES:
+            return jsonify({
+                "error": f"tiling must be one of {', '.join(TILING_MODES)}"
+            }), 400
+        force_detection = request.form.get('force', 'false').lower() == 'true'
+        image_meta = {
+            "device_id": device_id,
+            "fridge_id": fridge_id,
+            "filename": filename if save_image else None,
+            "filepath": filepath if save_image else None,
+            "thumbnail": image_store.thumbnail_path(filename) if save_image else None,
+            "size_kb": round(file_size / 1024, 2)
+        }
         
-        # Add status and timestamp to each item
-        for item in detected_items:
-            item["status"] = "Detected"
-            item["last_detected"] = datetime.now().isoformat()
+        # Async mode: accept the frame now, run detection on the worker pool
+        run_async = (request.args.get('async') or request.form.get('async') or str(ASYNC_UPLOADS)).lower() == 'true'
+        if run_async:
+            try:
+                job_id = upload_jobs.submit(
+                    process_upload_job, img, file_size, detection_params, image_meta,
+                    filepath.replace('.jpg', '_annotated.jpg'), force_detection, image_hash, pending_image
+                )
+            except QueueFullError:
+                logger.warning("[BACKPRESSURE] Upload queue full, rejecting frame")
+                response = jsonify({"error": "Server busy, retry later"})
+                response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+                return response, 429
+            logger.debug("[JOB] Queued upload job %s", job_id)
+            return jsonify({
+                "message": "Image accepted for processing",
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/jobs/{job_id}"
+            }), 202
         
-        # Save to database file
-        save_to_database(detected_items)
+        # Inventory routes work while the model loads; synchronous detection waits briefly
+        if not wait_for_model(MODEL_WAIT_SECONDS):
+            logger.warning("[DETECTION] Model not ready, rejecting synchronous upload")
+            response = jsonify({"error": "Detector is still loading, retry later", "model": model_status()})
+            response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+            return response, 503
         
-        # Merge with existing inventory instead of replacing
-        merge_inventory(detected_items)
-
-        print("[SUCCESS] Returning response with", len(detected_items), "items")
-        return jsonify({
-            "message": "Items detected successfully", 
-            "items": detected_items,
-            "detected_items": detected_items,  # Support both formats
-            "total_detected": len(detected_items),
-            "detection_summary": {
-                "total_items": len(detected_items),
-                "total_quantity": sum(item.get('quantity', 1) for item in detected_items),
-                "categories": list(set(item.get('category', 'other') for item in detected_items))
-            },
-            "image_info": {
-                "filename": filename,
-                "filepath": filepath,
-                "size_kb": round(file_size / 1024, 2) if 'file_size' in locals() else 0
-            }
-        })
+        result = process_upload(
+            img, file_size, detection_params, image_meta,
+            filepath.replace('.jpg', '_annotated.jpg'), force_detection, image_hash, pending_image
+        )
+        logger.debug("[UPLOAD] Returning response with %d items", result["total_detected"])
+        return jsonify(result)
         
+    except ImageRejected as e:
+        logger.warning("[UPLOAD] Rejected while receiving: %s", e)
+        return jsonify({"error": f"Invalid image: {e}"}), e.status_code
+    except RequestEntityTooLarge:
+        logger.warning("[UPLOAD] Request body larger than %d bytes, rejected unread", MAX_UPLOAD_REQUEST_BYTES)
+        return jsonify({"error": f"Upload too large (max {MAX_FILE_SIZE // (1024 * 1024)}MB)"}), 413
+    except ModelNotReadyError as e:
+        logger.error("[DETECTION] %s", e)
+        return jsonify({"error": str(e), "model": model_status()}), 503
+    except PoolUnavailableError as e:
+        logger.error("[DETECTION] %s", e)
+        response = jsonify({"error": f"Detector unavailable: {e}", "model": model_status()})
+        response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+        return response, 503
     except Exception as e:
-        print(f"[ERROR] Upload exception: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[UPLOAD] Upload failed")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 
+def process_upload_job(*args):
+    """process_upload for the async job workers, with its own timing trace"""
+    with trace() as spans:
+        result = process_upload(*args)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TIMING] job %s", format_trace(spans))
+    return result
+
+
+def process_upload(img, file_size, detection_params, image_meta, annotated_path,
+                   force_detection=False, image_hash=None, pending_image=None):
+    """
+    Run detection on a decoded upload, record it and merge it into the inventory
+    
+    Used directly by synchronous uploads and by the job workers in async mode.
+    Frames that barely differ from the camera's last processed frame reuse its
+    detection result; they still count as frames for the camera's temporal
+    filter, so a static view reaches TEMPORAL_STABLE_FRAMES. Byte-identical re-uploads (image_hash) skip only the model run.
+    pending_image (the encoded upload) is saved only if the frame changed the
+    inventory (IMAGE_KEEP = "changed").
+    
+    Returns:
+        dict: The /upload response body
+    """
+    # Get image information
+    with span("image_info"):
+        image_info = get_image_info_array(img, file_size)
+    
+    if image_info:
+        logger.debug("[INFO] Image %dx%d, %s KB, sharpness %s, brightness %s",
+                     image_info['width'], image_info['height'], image_info['file_size_kb'],
+                     image_info['sharpness'], image_info['brightness'])
+    
+    # Skip inference if the camera's view looks the same as last time. Uploads
+    # without a device_id come from unrelated callers, so they never share a slot
+    device_id = image_meta.get("device_id", DEFAULT_DEVICE_ID)
+    use_gate = FRAME_GATE_ENABLED and device_id != DEFAULT_DEVICE_ID
+    params_key = tuple(sorted((k, v) for k, v in detection_params.items() if k != "save_annotated"))
+    signature = None
+    if use_gate and not force_detection:
+        with span("frame_gate"):
+            signature, cached_items, difference = frame_gate.check(device_id, img, params_key)
+        if cached_items is not None:
+            logger.info("[GATE] Frame unchanged for %s (diff %.2f), reusing last detection", device_id, difference)
+            UPLOAD_OUTCOMES.inc(outcome="unchanged")
+            if TEMPORAL_FUSION and device_id != DEFAULT_DEVICE_ID:
+                image_meta = commit_detections(cached_items, image_meta, img, pending_image)
+            elif pending_image is not None:
+                image_meta = dict(image_meta, filename=None, filepath=None, thumbnail=None)
+            return build_upload_response(cached_items, image_meta, frame_unchanged=True)
+    
+    # Same bytes with the same parameters (e.g. a camera retry): reuse the stored result
+    cache_key = None
+    detected_items = None
+    if RESULT_CACHE_ENABLED and image_hash:
+        # Resolved modes, so a changed default does not serve results from the old one
+        preprocess_mode, tiling = resolve_modes(
+            detection_params["enable_preprocessing"],
+            detection_params["preprocess_mode"],
+            detection_params["tiling"]
+        )
+        cache_key = make_cache_key(
+            image_hash,
+            detection_params["min_confidence"],
+            detection_params["filter_food"],
+            preprocess_mode,
+            tiling,
+            regions_key(detection_params["regions"])
+        )
+        if not force_detection:
+            detected_items = result_cache.get(cache_key)
+    
+    cached = detected_items is not None
+    if cached:
+        logger.info("[CACHE] Hit for %s, reusing stored detection", image_hash[:12])
+    else:
+        if detection_params["save_annotated"]:
+            # The upload's own directory may not exist yet (it is written
+            # on the image writer thread, or not at all with save_image=false)
+            image_store.ensure_dir(annotated_path)
+        # 🧠 Run YOLO object detection
+        # Run detection with enhanced settings
+        detected_items = detect_objects(
+            img, 
+            annotated_path=annotated_path,
+            brightness=image_info["brightness"] if image_info else None,
+            **detection_params
+        )
+        logger.info("[DETECTION] Detected %d items", len(detected_items))
+        if detection_params["save_annotated"]:
+            image_store.track(annotated_path)
+        
+        if cache_key is not None:
+            result_cache.put(cache_key, detected_items)
+    
+    # Add status and timestamp to each item
+    for item in detected_items:
+        item["status"] = "Detected"
+        item["last_detected"] = datetime.now().isoformat()
+    
+    image_meta = commit_detections(detected_items, image_meta, img, pending_image)
+    
+    UPLOAD_OUTCOMES.inc(outcome="cached" if cached else "detected")
+    if use_gate:
+        if signature is None:
+            signature = frame_signature(img)
+        frame_gate.update(device_id, signature, params_key, detected_items)
+    
+    return build_upload_response(detected_items, image_meta, cached=cached)
+
+
+def commit_detections(detected_items, image_meta, img, pending_image=None):
+    """
+    Record one frame's detections in the history and the fridge's inventory
+    
+    Cameras go through the temporal filter: only counts that held for
+    TEMPORAL_STABLE_FRAMES frames are written and pushed. Uploads without a
+    device_id (e.g. a one-off phone photo) are committed as-is.
+    
+    Returns:
+        dict: image_meta, without the file names if pending_image was not kept
+    """
+    device_id = image_meta.get("device_id", DEFAULT_DEVICE_ID)
+    committed_items = detected_items
+    if TEMPORAL_FUSION and device_id != DEFAULT_DEVICE_ID:
+        with span("temporal"):
+            committed_items = count_filter.observe(device_id, detected_items)
+        if committed_items:
+            logger.info("[TEMPORAL] %s: %d stable count changes", device_id, len(committed_items))
+    
+    if not committed_items:
+        if pending_image is not None:
+            image_meta = dict(image_meta, filename=None, filepath=None, thumbnail=None)
+        return image_meta
+    
+    # Save to database file (a camera's entry is its whole stable view)
+    with span("database"):
+        if committed_items is detected_items:
+            save_to_database(detected_items)
+        else:
+            save_to_database(count_filter.snapshot(device_id))
+    
+    # Merge with existing inventory instead of replacing
+    with span("merge"):
+        merge_inventory(committed_items, image_meta.get("fridge_id", DEFAULT_FRIDGE_ID))
+    
+    if pending_image is not None:
+        image_writer.submit(write_image_file, image_meta["filename"], pending_image, img)
+    return image_meta
+
+
+def build_upload_response(detected_items, image_meta, frame_unchanged=False, cached=False):
+    """Response body shared by fresh and reused (cached / unchanged frame) detections"""
+    if frame_unchanged:
+        message = "No change since last frame, reused previous detection"
+    else:
+        message = "Items detected successfully"
+    return {
+        "message": message,
+        "frame_unchanged": frame_unchanged,
+        "cached": cached,
+        "items": detected_items,
+        "detected_items": detected_items,  # Support both formats
+        "total_detected": len(detected_items),
+        "detection_summary": {
+            "total_items": len(detected_items),
+            "total_quantity": sum(item.get('quantity', 1) for item in detected_items),
+            "categories": list(set(item.get('category', 'other') for item in detected_items))
+        },
+        "image_info": image_meta
+    }
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Status/result of an async upload job
+    
+    Pass ?wait=<seconds> to long-poll until the job finishes (capped at MAX_JOB_WAIT_SECONDS).
+    """
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_JOB_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    
+    job = upload_jobs.wait(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    data = job.to_dict()
+    return jsonify(data), 200 if data["status"] in ("done", "failed") else 202
+
+
 @app.route("/", methods=["GET"])
 def home():
     """Health check endpoint"""
+    model = model_status()
     return jsonify({
         "message": "Smart Fridge Backend Running 🚀",
         "status": "ok",
+        "ready": model["ready"],
+        "model_loading": model["model_loading"],
+        "model": model,
         "endpoints": [
             "/upload - POST: Upload image for detection",
-            "/inventory - GET: Get current inventory",
+            "/inventory - GET: Get current inventory (?category= to filter, ?fridge_id= for other fridges)",
             "/inventory - PUT: Update inventory item",
             "/inventory - DELETE: Delete inventory item",
+            "/inventory/changes - GET: Inventory changes since a revision (?since=rev)",
+            "/inventory/stream - GET: Server-sent inventory deltas",
             "/add_item - POST: Manually add item",
-            "/trigger_capture - POST: Trigger ESP32 capture (for future use)"
+            "/fridges - GET: Known fridges with item counts",
+            "/fridges/inventory - GET: Items summed across all fridges (?category= to filter)",
+            "/trigger_capture - POST: Trigger capture on one camera (device_id) or all",
+            "/devices - GET: Known cameras",
+            "/devices/<id>/commands - GET: Camera long-poll for capture commands",
+            "/inference_stats - GET: Inference batching statistics",
+            "/metrics - GET: Prometheus metrics (stage latency histograms, request counts, queue depth)",
+            "/jobs/<id> - GET: Async upload job status/result (?wait=seconds to long-poll)",
+            "/history - GET: Detection history (?since=&until=&item=&limit=)",
+            "/history/items/<name>/counts - GET: Item count over time (?since=&until=&fridge_id=&bucket=)",
+            "/history/consumption - GET: Consumption rate per item (?since=&until=&fridge_id=)"
         ],
-        "inventory_count": len(inventory)
+        "inventory_count": len(inventories.get(DEFAULT_FRIDGE_ID)),
+        "inventory_revision": inventories.get(DEFAULT_FRIDGE_ID).revision,
+        "fridges": inventories.stats()["loaded_fridges"],
+        "event_subscribers": inventory_events.stats()["subscribers"],
+        "import_seconds": round(IMPORT_SECONDS, 3)
     }), 200
 
 
+@app.route("/inference_stats", methods=["GET"])
+def inference_stats():
+    """Batch scheduler statistics: queue depth and batch-size histogram"""
+    stats = get_inference_stats()
+    stats["upload_jobs"] = upload_jobs.stats()
+    stats["frame_gate"] = frame_gate.stats()
+    stats["result_cache"] = result_cache.stats()
+    stats["temporal_filter"] = count_filter.stats()
+    stats["image_store"] = image_store.stats()
+    stats["inventories"] = inventories.stats()
+    stats["item_history"] = item_history.stats()
+    return jsonify(stats), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def requested_inventory():
+    """
+    Fridge selected by ?fridge_id= (or "fridge_id" in a JSON body),
+    DEFAULT_FRIDGE_ID otherwise
+    
+    Returns:
+        tuple: (fridge_id, InventoryStore)
+    
+    Raises:
+        InvalidFridgeError: Answered with 400 by the error handler below
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    fridge_id = request.args.get("fridge_id") or (data or {}).get("fridge_id") or DEFAULT_FRIDGE_ID
+    return fridge_id, inventories.get(check_fridge_id(fridge_id))
+
+
+@app.errorhandler(InvalidFridgeError)
+def invalid_fridge(error):
+    return jsonify({"error": str(error)}), 400
+
+
+def inventory_response(revision, build_items):
+    """
+    Serve an inventory listing tagged with its revision
+    
+    Clients send the ETag back in If-None-Match and get 304 (without the
+    listing being serialized) while the inventory is unchanged.
+    """
+    etag = f"inventory-{revision}"
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build_items())
+    response.set_etag(etag, weak=True)
+    response.headers["X-Inventory-Revision"] = str(revision)
+    return response
+
+
 @app.route("/get_inventory", methods=["GET"])
 def get_inventory():
-    return jsonify(inventory)
+    _, inventory = requested_inventory()
+    revision, items = inventory.versioned_items()
+    return inventory_response(revision, lambda: items)
 
 
 @app.route("/inventory", methods=["GET"])
 def get_inventory_route():
-    """Alternative endpoint name for inventory"""
-    return jsonify(inventory)
+    """Alternative endpoint name for inventory (optionally ?category=<name>)"""
+    _, inventory = requested_inventory()
+    category = request.args.get("category")
+    if category:
+        return inventory_response(inventory.revision, lambda: inventory.by_category(category))
+    revision, items = inventory.versioned_items()
+    return inventory_response(revision, lambda: items)
+
 
+@app.route("/fridges", methods=["GET"])
+def list_fridges():
+    """Every fridge with its item count, total quantity and revision"""
+    return jsonify({"fridges": inventories.summary()})
 
-def merge_inventory(new_items):
-    """Merge newly detected items with existing inventory"""
-    global inventory
+
+@app.route("/fridges/inventory", methods=["GET"])
+def get_aggregate_inventory():
+    """Items summed by name across all fridges (optionally ?category=<name>)"""
+    items = inventories.aggregate(request.args.get("category"))
+    return jsonify({"items": items, "fridges": inventories.fridge_ids()})
+
+
+@app.route("/inventory/changes", methods=["GET"])
+def get_inventory_changes():
+    """
+    Items added/updated and names deleted since revision ?since=<rev>
     
-    # Create a dictionary for quick lookup by name (case-insensitive)
-    inventory_dict = {}
-    for item in inventory:
-        key = item["name"].lower()
-        inventory_dict[key] = item
+    If "full" is true in the response the change log no longer reaches back
+    that far and the client should refetch GET /inventory.
+    """
+    try:
+        since = int(request.args.get("since", ""))
+    except ValueError:
+        return jsonify({"error": "since must be an integer revision"}), 400
     
-    # Merge new items
-    merged_count = 0
-    added_count = 0
-    for new_item in new_items:
-        key = new_item["name"].lower()
-        
-        if key in inventory_dict:
-            # Item exists - update quantity and detection info
-            existing_item = inventory_dict[key]
-            existing_item["quantity"] = new_item["quantity"]  # Update to latest count
-            existing_item["last_detected"] = new_item.get("last_detected", datetime.now().isoformat())
-            existing_item["confidence"] = new_item.get("confidence", 0.0)
-            existing_item["status"] = "Detected"
-            merged_count += 1
-            print(f"[MERGE] Updated: {existing_item['name']} (qty: {existing_item['quantity']})")
-        else:
-            # New item - add to inventory
-            inventory.append(new_item)
-            inventory_dict[key] = new_item
-            added_count += 1
-            print(f"[ADD] New item: {new_item['name']} (qty: {new_item['quantity']})")
+    _, inventory = requested_inventory()
+    return jsonify(inventory.changes_since(since))
+
+
+def write_image_file(filename, image_bytes, img=None):
+    """Write the original encoded upload (and its thumbnail) to disk (runs on the image writer thread)"""
+    try:
+        with span("save"):
+            filepath = image_store.save(filename, image_bytes, img)
+        logger.debug("[UPLOAD] Image saved to: %s", filepath)
+    except Exception as e:
+        logger.error("[UPLOAD] Could not save image %s: %s", filename, e)
+
+
+def publish_inventory_delta(fridge_id, revision, upserted=(), deleted=()):
+    """Push an inventory change to the fridge's /inventory/stream subscribers and the item history"""
+    inventory_events.publish("inventory", {
+        "fridge_id": fridge_id,
+        "revision": revision,
+        "upserted": list(upserted),
+        "deleted": list(deleted)
+    }, event_id=revision, topic=fridge_id)
+    try:
+        item_history.record(fridge_id, upserted, deleted)
+    except Exception as e:
+        logger.error("[HISTORY] %s", e)
+
+
+@app.route("/inventory/stream", methods=["GET"])
+def stream_inventory():
+    """
+    Server-sent events with inventory deltas as they happen
     
-    print(f"[INVENTORY] Merged: {merged_count} updated, {added_count} added, Total: {len(inventory)} items")
+    Reconnecting clients send Last-Event-ID (or ?since=<rev>) and first receive
+    the changes they missed; "full": true means they must refetch /inventory.
+    One stream follows one fridge (?fridge_id=, default DEFAULT_FRIDGE_ID).
+    """
+    fridge_id, inventory = requested_inventory()
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    subscriber = inventory_events.subscribe(topic=fridge_id)
+    initial = []
+    if since:
+        try:
+            delta = dict(inventory.changes_since(int(since)), fridge_id=fridge_id)
+            initial.append(format_event("inventory", delta, event_id=delta["revision"]))
+        except ValueError:
+            pass
+    
+    response = Response(
+        stream_with_context(inventory_events.stream(subscriber, initial)),
+        mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # Don't let reverse proxies buffer events
+    return response
+
+
+def merge_inventory(new_items, fridge_id=DEFAULT_FRIDGE_ID):
+    """Merge newly detected items with the fridge's existing inventory"""
+    inventory = inventories.get(fridge_id)
+    updated, added, revision = inventory.merge_detections(new_items)
+    if updated or added:
+        publish_inventory_delta(fridge_id, revision, upserted=updated + added)
+    for item in updated:
+        logger.debug("[MERGE] Updated: %s (qty: %s)", item['name'], item['quantity'])
+    for item in added:
+        logger.debug("[ADD] New item: %s (qty: %s)", item['name'], item['quantity'])
+    
+    logger.info("[INVENTORY] %s merged: %d updated, %d added, Total: %d items",
+                fridge_id, len(updated), len(added), len(inventory))
 
 
 def save_to_database(items):
-    """Save detected items to database.json with timestamp"""
+    """Append detected items to the detection history with timestamp"""
     try:
-        # Load existing data
-        if os.path.exists(DATABASE_FILE):
-            with open(DATABASE_FILE, 'r') as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    data = []
-        else:
-            data = []
-        
-        # Append new detection
-        data.append({
-            "timestamp": datetime.now().isoformat(),
-            "items": items
-        })
-        
-        # Save back to file (keep last 100 detections to prevent file bloat)
-        if len(data) > 100:
-            data = data[-100:]
-        
-        with open(DATABASE_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
-        
-        print(f"[DATABASE] Saved {len(items)} items to database")
+        detection_store.append(items)
+        logger.debug("[DATABASE] Saved %d items to database", len(items))
     except Exception as e:
-        print(f"[DATABASE ERROR] {str(e)}")
+        logger.error("[DATABASE] %s", e)
+
+
+@app.route("/history", methods=["GET"])
+def get_history():
+    """
+    Detection history, oldest first
+    
+    Query params: since / until (ISO timestamps), item (name), limit (default 100)
+    """
+    try:
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    entries = detection_store.query(
+        since=request.args.get("since"),
+        until=request.args.get("until"),
+        item=request.args.get("item"),
+        limit=limit
+    )
+    return jsonify({"count": len(entries), "entries": entries})
+
+
+@app.route("/history/items/<name>/counts", methods=["GET"])
+def get_item_counts(name):
+    """
+    An item's count after each change, summed over fridges unless ?fridge_id= is given
+    
+    Query params: since / until (ISO timestamps), fridge_id, bucket (seconds; last count per bucket)
+    """
+    try:
+        bucket = float(request.args["bucket"]) if request.args.get("bucket") else None
+        result = item_history.item_counts(
+            name,
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            fridge_id=request.args.get("fridge_id"),
+            bucket_seconds=bucket
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    return jsonify(result)
+
+
+@app.route("/history/consumption", methods=["GET"])
+def get_consumption():
+    """
+    Items consumed (count decreases) and restocked per item, with a per-day rate
+    
+    Query params: since (default CONSUMPTION_DEFAULT_DAYS ago) / until (ISO timestamps), fridge_id
+    """
+    since = request.args.get("since") or (datetime.now() - timedelta(days=CONSUMPTION_DEFAULT_DAYS)).isoformat()
+    until = request.args.get("until")
+    try:
+        result = item_history.consumption(since, until, fridge_id=request.args.get("fridge_id"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    return jsonify(dict(result, since=since, until=until or datetime.now().isoformat()))
 
 
 @app.route("/add_item", methods=["POST"])
@@ -236,12 +849,14 @@ def add_item():
         "status": data["status"]
     }
     
-    inventory.append(new_item)
+    fridge_id, inventory = requested_inventory()
+    item, _, revision = inventory.upsert(new_item)
+    publish_inventory_delta(fridge_id, revision, upserted=[item])
     
     # Also save to database
     save_to_database([new_item])
 
-    return jsonify({"message": "Item added successfully", "inventory": inventory})
+    return jsonify({"message": "Item added successfully", "item": item, "revision": revision})
 
 
 @app.route("/inventory", methods=["PUT"])
@@ -252,14 +867,13 @@ def update_inventory():
     if not data or "name" not in data:
         return jsonify({"error": "Item name required"}), 400
     
-    # Find and update item
-    for item in inventory:
-        if item["name"] == data["name"]:
-            if "quantity" in data:
-                item["quantity"] = data["quantity"]
-            if "status" in data:
-                item["status"] = data["status"]
-            return jsonify({"message": "Item updated", "item": item})
+    # Find and update item (case-insensitive, same as delete)
+    fields = {key: data[key] for key in ("quantity", "status") if key in data}
+    fridge_id, inventory = requested_inventory()
+    item, revision = inventory.update(data["name"], fields)
+    if item is not None:
+        publish_inventory_delta(fridge_id, revision, upserted=[item])
+        return jsonify({"message": "Item updated", "item": item, "revision": revision})
     
     return jsonify({"error": "Item not found"}), 404
 
@@ -272,12 +886,11 @@ def delete_inventory():
     if not name:
         return jsonify({"error": "Item name required"}), 400
     
-    global inventory
-    original_count = len(inventory)
-    inventory = [item for item in inventory if item["name"].lower() != name.lower()]
-    
-    if len(inventory) < original_count:
-        return jsonify({"message": "Item deleted", "inventory": inventory})
+    fridge_id, inventory = requested_inventory()
+    item, revision = inventory.delete(name)
+    if item is not None:
+        publish_inventory_delta(fridge_id, revision, deleted=[item["name"]])
+        return jsonify({"message": "Item deleted", "name": item["name"], "revision": revision})
     else:
         return jsonify({"error": "Item not found"}), 404
 
@@ -285,40 +898,178 @@ def delete_inventory():
 @app.route("/trigger_capture", methods=["POST"])
 def trigger_capture():
     """
-    Trigger endpoint for on-demand ESP32 capture.
-    Note: ESP32 would need to poll this endpoint or use WebSocket for real-time triggering.
-    For now, this is a placeholder for future implementation.
+    Trigger an on-demand capture on one camera or on all of them
+    
+    Body (JSON, optional): {"device_id": "<id>", "trigger_id": "door_open"}
+    Without device_id the trigger is sent to every known camera. Cameras pick
+    it up through GET /devices/<id>/commands.
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     trigger_id = data.get("trigger_id", "manual")
+    device_id = data.get("device_id")
     
-    print(f"[TRIGGER] Capture requested: {trigger_id}")
+    if device_id:
+        command = capture_commands.send(device_id, "capture", trigger_id=trigger_id)
+        targets = [device_id]
+    else:
+        targets = capture_commands.broadcast("capture", trigger_id=trigger_id)
+        command = None
     
-    # In the future, this could:
-    # - Add trigger to a queue that ESP32 polls
-    # - Use WebSocket to notify ESP32
-    # - Use MQTT to send command to ESP32
+    logger.info("[TRIGGER] Capture requested: %s -> %s", trigger_id, targets or 'no known devices')
     
     return jsonify({
-        "message": "Trigger received",
+        "message": "Trigger queued" if targets else "No cameras have connected yet",
         "trigger_id": trigger_id,
-        "note": "ESP32 currently captures on interval. Real-time triggering requires additional setup."
-    }), 200
+        "devices": targets,
+        "command": command
+    }), 202 if targets else 200
 
 
-if __name__ == "__main__":
-    # Load existing inventory from database on startup
-    print("[INIT] Loading inventory from database...")
+@app.route("/devices/<device_id>/commands", methods=["GET"])
+def poll_device_commands(device_id):
+    """
+    Long-poll endpoint held open by cameras
+    
+    Returns 200 with the next command as soon as one is queued, or 204 after
+    ?wait=<seconds> (default DEVICE_POLL_SECONDS) with nothing to do.
+    """
     try:
-        if os.path.exists(DATABASE_FILE):
-            with open(DATABASE_FILE, 'r') as f:
-                data = json.load(f)
-                if data:
-                    # Get the most recent detection as starting inventory
-                    latest_detection = data[-1]
-                    inventory.extend(latest_detection.get("items", []))
-                    print(f"[INIT] Loaded {len(inventory)} items from database")
+        wait = min(float(request.args.get("wait", DEVICE_POLL_SECONDS)), MAX_DEVICE_POLL_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    
+    command = capture_commands.wait_for_command(device_id, wait)
+    if command is None:
+        return "", 204
+    logger.info("[TRIGGER] Delivered %s to %s", command['command'], device_id)
+    return jsonify(command), 200
+
+
+@app.route("/devices/<device_id>/roi", methods=["GET"])
+def get_device_roi(device_id):
+    """Regions of interest of one camera (404 if it runs on the whole frame)"""
+    regions = region_store.get(device_id)
+    if regions is None:
+        return jsonify({"error": "No regions configured", "device_id": device_id}), 404
+    return jsonify({"device_id": device_id, "regions": regions})
+
+
+@app.route("/devices/<device_id>/roi", methods=["PUT"])
+def set_device_roi(device_id):
+    """
+    Set a camera's regions of interest
+    
+    Body (JSON): {"regions": [{"name": "top shelf", "rect": [x1, y1, x2, y2]},
+                              {"polygon": [[x, y], ...]}]}
+    Coordinates are fractions (0.0-1.0) of the frame width and height.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        regions = region_store.set(device_id, data.get("regions"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid regions: {e}"}), 400
+    return jsonify({"message": "Regions updated", "device_id": device_id, "regions": regions})
+
+
+@app.route("/devices/<device_id>/roi", methods=["DELETE"])
+def delete_device_roi(device_id):
+    """Go back to running detection on the whole frame"""
+    if not region_store.delete(device_id):
+        return jsonify({"error": "No regions configured", "device_id": device_id}), 404
+    return jsonify({"message": "Regions removed", "device_id": device_id})
+
+
+@app.route("/devices", methods=["GET"])
+def list_devices():
+    """Cameras that have polled for commands or uploaded images"""
+    return jsonify(capture_commands.devices())
+
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+logger.info("[INIT] Backend imported in %.2fs (budget %.1fs)", IMPORT_SECONDS, IMPORT_TIME_BUDGET_SECONDS)
+if IMPORT_SECONDS > IMPORT_TIME_BUDGET_SECONDS:
+    logger.warning("[INIT] Import took longer than the budget; is something loading the model at import time?")
+
+
+def seed_default_inventory():
+    """
+    Fridges load their own saved inventory on first use. Before the first
+    save, seed the default fridge from the latest detection (as before sharding)
+    """
+    if inventories.exists(DEFAULT_FRIDGE_ID):
+        return
+    logger.info("[INIT] Loading inventory from database...")
+    try:
+        # Only the most recent detection is read, not the whole history
+        latest_detection = detection_store.latest()
+        if latest_detection:
+            inventory = inventories.get(DEFAULT_FRIDGE_ID)
+            inventory.load(latest_detection.get("items", []))
+            logger.info("[INIT] Loaded %d items from database", len(inventory))
     except Exception as e:
-        print(f"[INIT ERROR] Could not load inventory: {str(e)}")
+        logger.error("[INIT] Could not load inventory: %s", e)
+
+
+def backfill_item_history():
+    """Fill an empty item history from the detection history (once, on the first start)"""
+    if len(item_history):
+        return
+    try:
+        entries = detection_store.query()
+        if entries:
+            written = item_history.import_entries(entries, DEFAULT_FRIDGE_ID)
+            logger.info("[INIT] Imported %d detections (%d item records) into the item history",
+                        len(entries), written)
+    except Exception as e:
+        logger.error("[INIT] Could not backfill item history: %s", e)
+
+
+_shutdown_lock = threading.Lock()
+_shutdown_done = False
+
+
+def shutdown_services(timeout=SHUTDOWN_DRAIN_SECONDS):
+    """
+    Drain background work and flush everything to disk (runs once)
+
+    Called by the WSGI server when a worker exits (see gunicorn.conf.py),
+    after in-flight requests have finished, and at interpreter exit.
     
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    Args:
+        timeout: Seconds to wait for queued async detections
+    """
+    global _shutdown_done
+    with _shutdown_lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+    started = time.time()
+    # Save what is already done first, in case the server kills us mid-drain
+    _run_shutdown_steps((("inventory", inventories.flush), ("result cache", result_cache.save)))
+    if not upload_jobs.shutdown(timeout=timeout):
+        logger.warning("[SHUTDOWN] Async uploads still pending after %ss", timeout)
+    # After the job drain, which may still be feeding it frames
+    _run_shutdown_steps((("inference scheduler", lambda: shutdown_inference(timeout=timeout)),))
+    image_writer.shutdown(wait=True)
+    _run_shutdown_steps((("inventory", inventories.shutdown), ("result cache", result_cache.save),
+                         ("history", detection_store.close), ("item history", item_history.close),
+                         ("image store", image_store.shutdown)))
+    logger.info("[SHUTDOWN] Drained and flushed in %.2fs", time.time() - started)
+
+
+def _run_shutdown_steps(steps):
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            logger.error("[SHUTDOWN] Could not close %s: %s", name, e)
+
+
+atexit.register(shutdown_services)
+
+
+if __name__ == "__main__":
+    # Development server. In production run: gunicorn -c gunicorn.conf.py wsgi:application
+    seed_default_inventory()
+    backfill_item_history()
+    app.run(host="0.0.0.0", port=PORT, debug=DEBUG)
@@ -0,0 +1,414 @@
+"""
+Benchmark the upload and detection path
+
+Runs each stage in isolation (validate_image, get_image_info, enhance_image,
+preprocess_image, detect_objects, save_to_database, merge_inventory), then
+end to end through Flask's test client, then a load test in which N
+simulated cameras post frames at a fixed interval. The report holds
+p50/p95/p99 latency, throughput and peak RSS as JSON.
+
+Everything runs in a temporary working directory, so the real history,
+inventory and uploads are not touched. Frames are synthetic and seeded, so
+runs are repeatable. With --stub (the default) the deterministic stub
+detector is used and no model is downloaded.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --resolutions 640x480,1920x1080 --iterations 50
+    python benchmark.py --cameras 8 --interval 0.5 --duration 20
+    python benchmark.py --no-stub            # real model (yolov8n.pt)
+    python benchmark.py --url http://127.0.0.1:5000 --cameras 16 --interval 0.25
+
+With --url only the load test runs, against an already running server
+(e.g. `python app.py` vs. `gunicorn -c gunicorn.conf.py wsgi:application`).
+"""
+import argparse
+import http.client
+import importlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILES = ("yolov8n.pt", "yolov8n.onnx", "yolov8n_int8.onnx")
+
+
+def synthetic_fridge_image(width, height, seed=0):
+    """
+    A dim fridge interior: vertical lighting gradient, shelf edges, coloured
+    items and sensor noise. The same seed always gives the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(70, 25, height, dtype=np.float32)[:, None, None]
+    img = np.broadcast_to(gradient, (height, width, 3)).copy()
+    shelves = 3
+    for shelf in range(1, shelves + 1):
+        y = int(height * shelf / (shelves + 1))
+        cv2.line(img, (0, y), (width, y), (150, 150, 150), max(2, height // 120))
+    for _ in range(int(rng.integers(4, 10))):
+        w = int(rng.integers(width // 16, width // 6))
+        h = int(rng.integers(height // 10, height // 4))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        color = tuple(int(c) for c in rng.integers(60, 255, size=3))
+        if rng.random() < 0.5:
+            cv2.rectangle(img, (x, y), (x + w, y + h), color, -1)
+        else:
+            cv2.ellipse(img, (x + w // 2, y + h // 2), (w // 2, h // 2), 0, 0, 360, color, -1)
+    img += rng.normal(0, 4, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(img, quality=85):
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def parse_resolutions(text):
+    resolutions = []
+    for part in text.split(","):
+        width, height = part.lower().split("x")
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def summarize(samples, elapsed=None):
+    """Latency percentiles (ms) and throughput for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    total = elapsed if elapsed is not None else float(np.sum(samples))
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "throughput_per_s": round(len(samples) / total, 2) if total > 0 else None,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def time_stage(fn, iterations, warmup=2):
+    """Call fn() warmup + iterations times and summarize the timed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_stages(backend, images, iterations):
+    """Each stage in isolation, per resolution"""
+    image_utils = importlib.import_module("image_utils")
+    detect_items = backend["detect_items"]
+    app_module = backend["app"]
+    sample_items = [
+        {"name": name, "quantity": 1 + i % 3, "confidence": 0.8, "category": "fruits",
+         "status": "Detected", "last_detected": "2025-01-01T00:00:00"}
+        for i, name in enumerate(("apple", "banana", "orange", "bottle", "cup", "carrot"))
+    ]
+
+    report = {}
+    for label, (img, data) in images.items():
+        path = os.path.abspath(f"bench_{label}.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+        brightness = float(np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)))
+        report[label] = {
+            "decode_image": time_stage(lambda: image_utils.decode_image(data), iterations),
+            "validate_image": time_stage(lambda: image_utils.validate_image(path), iterations),
+            "get_image_info": time_stage(lambda: image_utils.get_image_info(path), iterations),
+            "enhance_image": time_stage(lambda: detect_items.enhance_image(img, brightness=brightness), iterations),
+            "preprocess_image": time_stage(lambda: detect_items.preprocess_image(path), iterations),
+            "detect_objects": time_stage(lambda: detect_items.detect_objects(img, enable_preprocessing=True), iterations),
+            "save_to_database": time_stage(lambda: app_module.save_to_database(sample_items), iterations),
+            "merge_inventory": time_stage(lambda: app_module.merge_inventory(sample_items), iterations),
+        }
+    return report
+
+
+def post_frame(client, data, device_id, extra=None):
+    form = {"image": (io.BytesIO(data), "frame.jpg"), "device_id": device_id}
+    form.update(extra or {})
+    return client.post("/upload", data=form, content_type="multipart/form-data")
+
+
+class HttpUploader:
+    """
+    POST /upload to a running server the way a camera does: one persistent
+    connection, reopened only when the server closes it
+    """
+
+    def __init__(self, url, timeout=60):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.connection = None
+        self.connections = 0
+
+    def post_frame(self, data, device_id, extra=None):
+        """Returns the response status (0 if the request failed twice)"""
+        boundary = uuid.uuid4().hex
+        fields = dict(extra or {}, device_id=device_id)
+        body = b"".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        ) + (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+             f'Content-Type: image/jpeg\r\n\r\n').encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self.connections += 1
+            try:
+                self.connection.request("POST", "/upload", body, headers)
+                response = self.connection.getresponse()
+                response.read()
+                if response.will_close:
+                    self.close()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.close()  # Server dropped an idle keep-alive connection; retry once on a new one
+        return 0
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def bench_end_to_end(backend, images, iterations, seed):
+    """Synchronous POST /upload through the test client, a fresh frame per request"""
+    client = backend["app"].app.test_client()
+    report = {}
+    for label, (img, _) in images.items():
+        height, width = img.shape[:2]
+        frames = [encode_jpeg(synthetic_fridge_image(width, height, seed + 1000 + i)) for i in range(iterations + 2)]
+        statuses = {}
+        samples = []
+        for i, data in enumerate(frames):
+            started = time.perf_counter()
+            response = post_frame(client, data, f"bench-{label}")
+            if i >= 2:  # First two are warm-up
+                samples.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        report[label] = summarize(samples)
+        report[label]["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    return report
+
+
+def run_load(backend, cameras, interval, duration, resolution, seed, async_uploads=False, url=None):
+    """
+    N camera threads each post a new frame every `interval` seconds for `duration` seconds
+
+    A camera that falls behind posts again immediately rather than bursting
+    to catch up, like a real camera that waits for its previous upload.
+    With url, frames go over HTTP to that server instead of the test client.
+    """
+    width, height = resolution
+    # Pre-encode a distinct frame per post (so the frame gate and result
+    # cache don't short-circuit) and keep JPEG encoding out of the timings
+    per_camera = min(64, int(duration / interval) + 2) if interval > 0 else 64
+    frames = {
+        camera: [encode_jpeg(synthetic_fridge_image(width, height, seed + camera * 1000 + i))
+                 for i in range(per_camera)]
+        for camera in range(cameras)
+    }
+    samples = []
+    statuses = {}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(cameras)
+    extra = {"async": "true"} if async_uploads else None
+    connections = []
+
+    def camera_loop(camera):
+        if url:
+            uploader = HttpUploader(url)
+            send = uploader.post_frame
+        else:
+            client = backend["app"].app.test_client()
+            send = lambda *args: post_frame(client, *args).status_code
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        next_post = time.perf_counter()
+        sent = 0
+        while time.perf_counter() < deadline:
+            data = frames[camera][sent % len(frames[camera])]
+            started = time.perf_counter()
+            status = send(data, f"cam-{camera}", extra)
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+            sent += 1
+            next_post = max(next_post + interval, time.perf_counter())
+            time.sleep(max(0.0, next_post - time.perf_counter()))
+        if url:
+            uploader.close()
+            with lock:
+                connections.append(uploader.connections)
+
+    threads = [threading.Thread(target=camera_loop, args=(camera,), daemon=True) for camera in range(cameras)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = summarize(samples, elapsed)
+    report.update({
+        "cameras": cameras,
+        "interval_s": interval,
+        "duration_s": round(elapsed, 2),
+        "resolution": f"{width}x{height}",
+        "offered_rate_per_s": round(cameras / interval, 2) if interval > 0 else None,
+        "async": async_uploads,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    })
+    if url:
+        report["url"] = url
+        report["tcp_connections"] = sum(connections)  # == cameras when keep-alive works
+    return report
+
+
+def drain(backend, timeout=60):
+    """Wait for queued async uploads and image writes and flush, while still in the work directory"""
+    app_module = backend["app"]
+    app_module.result_cache.persist_path = None  # Not worth saving a benchmark's cache
+    app_module.shutdown_services(timeout=timeout)
+
+
+def load_backend(stub, stub_latency_ms):
+    """Import detect_items/app in the current (temporary) directory with benchmark settings"""
+    if stub:
+        os.environ["DETECTOR_BACKEND"] = "stub"
+        os.environ["STUB_LATENCY_MS"] = str(stub_latency_ms)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("MODEL_LOADING", "eager")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    detect_items = importlib.import_module("detect_items")
+    app_module = importlib.import_module("app")
+    if not detect_items.wait_for_model(detect_items.MODEL_LOAD_TIMEOUT):
+        raise RuntimeError(f"Detector did not load: {detect_items.model_status()}")
+    return {"detect_items": detect_items, "app": app_module}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the upload and detection path")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080",
+                        help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per stage and resolution")
+    parser.add_argument("--cameras", type=int, default=4, help="Simulated cameras in the load test (0 to skip)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between frames per camera")
+    parser.add_argument("--duration", type=float, default=10.0, help="Load test length in seconds")
+    parser.add_argument("--load-resolution", default="1280x720")
+    parser.add_argument("--async-load", action="store_true", help="Load test posts with async=true")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--stub", dest="stub", action="store_true", default=True,
+                        help="Use the deterministic stub detector (default)")
+    parser.add_argument("--no-stub", dest="stub", action="store_false", help="Use the configured real detector")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated model time per frame")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Do not delete the temporary directory")
+    parser.add_argument("--url", help="Load-test this running server over HTTP instead (skips the other stages)")
+    args = parser.parse_args()
+
+    if args.url:
+        report = {
+            "config": {"url": args.url, "seed": args.seed, "python": platform.python_version(),
+                       "cpu_count": os.cpu_count()},
+            "load": run_load(None, max(1, args.cameras), args.interval, args.duration,
+                             parse_resolutions(args.load_resolution)[0], args.seed, args.async_load, url=args.url),
+        }
+        write_report(report, args.output)
+        return
+
+    output = os.path.abspath(args.output) if args.output else None
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="fridge-bench-")
+    for name in MODEL_FILES:
+        for directory in (original_dir, BACKEND_DIR):
+            source = os.path.join(directory, name)
+            if os.path.exists(source) and not os.path.exists(os.path.join(workdir, name)):
+                os.symlink(source, os.path.join(workdir, name))
+    os.chdir(workdir)
+
+    try:
+        load_started = time.perf_counter()
+        backend = load_backend(args.stub, args.stub_latency_ms)
+        startup_seconds = time.perf_counter() - load_started
+
+        images = {}
+        for width, height in parse_resolutions(args.resolutions):
+            img = synthetic_fridge_image(width, height, args.seed)
+            images[f"{width}x{height}"] = (img, encode_jpeg(img))
+
+        report = {
+            "config": {
+                "detector": backend["detect_items"].DETECTOR_BACKEND,
+                "stub_latency_ms": args.stub_latency_ms if args.stub else None,
+                "resolutions": list(images),
+                "iterations": args.iterations,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "startup_s": round(startup_seconds, 3),
+            "stages": bench_stages(backend, images, args.iterations),
+            "end_to_end": bench_end_to_end(backend, images, args.iterations, args.seed),
+        }
+        if args.cameras > 0:
+            report["load"] = run_load(
+                backend, args.cameras, args.interval, args.duration,
+                parse_resolutions(args.load_resolution)[0], args.seed, args.async_load)
+        report["peak_rss_mb"] = peak_rss_mb()
+        drain(backend)
+    finally:
+        os.chdir(original_dir)
+        if args.keep_workdir:
+            print(f"[BENCH] Work directory kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    write_report(report, output)
+
+
+def write_report(report, output=None):
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"[BENCH] Report written to {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
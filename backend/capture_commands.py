@@ -0,0 +1,139 @@
+"""
+Per-device command queues for on-demand capture
+
+Cameras long-poll GET /devices/<id>/commands and hold the request open until
+a command arrives (or the wait times out). /trigger_capture enqueues a
+capture command for one device or fans it out to every known device.
+"""
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+
+class DeviceChannel:
+    """Pending commands and presence info for one camera"""
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.commands = deque()
+        self.last_seen = None
+        self.last_seen_monotonic = None
+        self.waiting = 0  # number of open long-poll requests
+
+
+class CommandBus:
+    """
+    Command queues keyed by device ID
+
+    Commands expire after command_ttl seconds so a camera that was offline
+    does not fire a burst of stale captures when it reconnects. Repeated
+    capture triggers for a device that has not picked up the previous one
+    are coalesced.
+    """
+
+    def __init__(self, command_ttl=60, max_pending=16, online_window=90):
+        self.command_ttl = command_ttl
+        self.max_pending = max_pending
+        self.online_window = online_window
+        self._channels = {}
+        self._cond = threading.Condition()
+
+    def _channel(self, device_id):
+        # Caller holds self._cond
+        channel = self._channels.get(device_id)
+        if channel is None:
+            channel = DeviceChannel(device_id)
+            self._channels[device_id] = channel
+        return channel
+
+    def _drop_expired(self, channel, now):
+        while channel.commands and now - channel.commands[0]["_queued_monotonic"] > self.command_ttl:
+            channel.commands.popleft()
+
+    def touch(self, device_id):
+        """Record that a device was seen (upload or poll)"""
+        with self._cond:
+            channel = self._channel(device_id)
+            channel.last_seen = datetime.now().isoformat()
+            channel.last_seen_monotonic = time.monotonic()
+
+    def send(self, device_id, command, **params):
+        """
+        Queue a command for one device
+
+        Returns:
+            dict: The queued command (or the pending one it was coalesced into)
+        """
+        now = time.monotonic()
+        with self._cond:
+            channel = self._channel(device_id)
+            self._drop_expired(channel, now)
+            for pending in channel.commands:
+                if pending["command"] == command:
+                    return self._public(pending)
+            entry = {
+                "id": uuid.uuid4().hex,
+                "command": command,
+                "params": params,
+                "issued_at": datetime.now().isoformat(),
+                "_queued_monotonic": now,
+            }
+            channel.commands.append(entry)
+            while len(channel.commands) > self.max_pending:
+                channel.commands.popleft()
+            self._cond.notify_all()
+            return self._public(entry)
+
+    def broadcast(self, command, **params):
+        """Queue a command for every known device; returns the device IDs targeted"""
+        with self._cond:
+            device_ids = list(self._channels)
+        for device_id in device_ids:
+            self.send(device_id, command, **params)
+        return device_ids
+
+    def wait_for_command(self, device_id, timeout):
+        """
+        Block up to timeout seconds for the next command for device_id
+
+        Returns:
+            dict or None: The command, or None if the wait timed out
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            channel = self._channel(device_id)
+            channel.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    channel.last_seen = datetime.now().isoformat()
+                    channel.last_seen_monotonic = now
+                    self._drop_expired(channel, now)
+                    if channel.commands:
+                        return self._public(channel.commands.popleft())
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+            finally:
+                channel.waiting -= 1
+
+    def devices(self):
+        """Known devices with presence and queue info"""
+        now = time.monotonic()
+        with self._cond:
+            return [{
+                "device_id": channel.device_id,
+                "last_seen": channel.last_seen,
+                "online": channel.waiting > 0 or (
+                    channel.last_seen_monotonic is not None
+                    and now - channel.last_seen_monotonic < self.online_window),
+                "listening": channel.waiting > 0,
+                "pending_commands": len(channel.commands),
+            } for channel in self._channels.values()]
+
+    @staticmethod
+    def _public(entry):
+        return {key: value for key, value in entry.items() if not key.startswith("_")}
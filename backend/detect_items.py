@@ -1,13 +1,79 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance
+from detectors import create_detector
+from inference_scheduler import BatchInferenceScheduler
+from metrics import span
+from process_pool import InferenceProcessPool, PoolUnavailableError
+from roi import crop_regions
+from tiling import crop_tiles, merge_detections, offset_detections, tile_grid
+import atexit
+import functools
+import logging
 import os
+import threading
+import time
+
+logger = logging.getLogger("detection")
 
 # Load YOLOv8 pre-trained model (make sure yolov8n.pt is downloaded automatically)
-print("[DETECTION] Loading YOLOv8 model...")
-model = YOLO("yolov8n.pt")
-print("[DETECTION] Model loaded successfully!")
+MODEL_PATH = "yolov8n.pt"
+
+# Detector backend: "ultralytics" (PyTorch), "onnx" (ONNX Runtime on CPU,
+# export first with: python detectors.py export [--int8]) or "stub"
+# (deterministic, no model; used by benchmark.py)
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "ultralytics")
+ONNX_MODEL_PATH = os.environ.get("ONNX_MODEL_PATH", "yolov8n.onnx")  # or yolov8n_int8.onnx
+ONNX_INTRA_OP_THREADS = 0  # Threads inside one operator (0 = one per physical core)
+ONNX_INTER_OP_THREADS = 1  # Operators run in parallel (1 = sequential graph)
+STUB_LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "0"))  # Simulated model time for "stub"
+WARMUP_ON_START = True  # Run one dummy inference at startup so the first upload is not slow
+
+# When the detector is loaded: "background" (thread started by start_model_loading,
+# the server answers immediately), "lazy" (on the first detection) or "eager"
+# (while this module is imported, e.g. before a pre-forking server forks)
+MODEL_LOADING = os.environ.get("MODEL_LOADING", "background")
+MODEL_LOAD_TIMEOUT = 120  # Max seconds a detection waits for the model to finish loading
+
+# Multi-process inference: N worker processes, each with its own copy of the
+# model, fed through shared memory (0 = run the model in this process)
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", "0"))
+PIN_INFERENCE_CORES = True  # Pin each worker process to one CPU core
+THREADS_PER_PROCESS = 1  # Torch/OpenCV/ONNX Runtime threads inside each worker
+INFERENCE_TASK_TIMEOUT = 30  # Seconds before a stuck worker is killed and restarted
+
+DETECTOR_MODEL_PATH = {"onnx": ONNX_MODEL_PATH, "stub": "stub"}.get(DETECTOR_BACKEND, MODEL_PATH)
+detector_factory = functools.partial(
+    create_detector,
+    DETECTOR_BACKEND,
+    DETECTOR_MODEL_PATH,
+    imgsz=640,  # Input image size (optimal for YOLOv8n)
+    iou=0.45,  # Non-maximum suppression IoU threshold
+    intra_op_threads=THREADS_PER_PROCESS if INFERENCE_PROCESSES > 0 else ONNX_INTRA_OP_THREADS,
+    inter_op_threads=ONNX_INTER_OP_THREADS,
+    latency_ms=STUB_LATENCY_MS,
+)
+
+PRELOAD_BEFORE_FORK = False  # Load the model here and fork workers that share its weights copy-on-write
+
+detector = None  # In-process detector (also kept when preloaded for the process pool)
+process_pool = None
+batch_scheduler = None
+
+
+class ModelNotReadyError(RuntimeError):
+    """Detection was requested before the detector finished loading"""
+
+
+def get_model_id():
+    """
+    Identifier of the loaded weights; changes whenever the model file or
+    backend changes (used to invalidate cached detection results)
+    """
+    try:
+        stat = os.stat(DETECTOR_MODEL_PATH)
+        return f"{DETECTOR_BACKEND}:{DETECTOR_MODEL_PATH}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return f"{DETECTOR_BACKEND}:{DETECTOR_MODEL_PATH}"
 
 # Extended food items that YOLO can detect (COCO dataset classes)
 FOOD_ITEMS = {
@@ -40,52 +106,273 @@ MIN_CONFIDENCE = 0.25
 # Image preprocessing settings
 ENABLE_PREPROCESSING = True
 TARGET_SIZE = (640, 640)  # YOLOv8 optimal input size
+PREPROCESS_MODES = ("fixed", "auto_gamma", "clahe", "none")
+PREPROCESS_MODE = "auto_gamma"  # Default enhancement, can be overridden per device/request
+BRIGHTNESS_FACTOR = 1.2  # "fixed" mode: +20% brightness (helps with dark fridge images)
+CONTRAST_FACTOR = 1.1  # +10% contrast around the mean gray level
+SHARPNESS_FACTOR = 1.1  # Slight sharpness increase
+AUTO_GAMMA_TARGET = 110  # "auto_gamma" mode: target mean gray level (0-255)
+AUTO_GAMMA_RANGE = (0.4, 1.2)  # Clamp so very dark/bright frames aren't over-corrected
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_TILE_GRID = (8, 8)
+
+# Micro-batching: frames from concurrent requests share one model call
+BATCH_INFERENCE = True
+BATCH_MAX_SIZE = 8  # Max frames per model call
+BATCH_MAX_WAIT_MS = 20  # Max time the first frame waits for others to join
+
+# Sliced inference for high-resolution frames: overlapping tiles run as one
+# batch and their boxes are merged with a cross-tile NMS.
+# "off", "on" or "auto" (only frames above TILE_AUTO_MIN_PIXELS). Off by default:
+# a 12 MP photo is ~48 tiles, so cameras that need it opt in (DEVICE_TILING_MODES)
+TILING_MODES = ("off", "on", "auto")
+TILED_INFERENCE = os.environ.get("TILED_INFERENCE", "off")
+TILE_SIZE = 640  # Tile width/height in pixels (the model input size)
+TILE_OVERLAP = 0.2  # Minimum overlap between neighbouring tiles
+TILE_AUTO_MIN_PIXELS = 1280 * 960  # "auto": tile frames larger than this (VGA is never tiled)
+TILE_INCLUDE_FULL_FRAME = True  # Also run the whole frame so items larger than a tile are kept
+TILE_NMS_IOU = 0.45  # Cross-tile NMS IoU threshold
+TILE_CONTAINMENT = 0.8  # Drop boxes this much inside a stronger box of the same class
+
+
+def predict_batch(images, min_confidence=MIN_CONFIDENCE):
+    """Run the detector on a list of images in a single call"""
+    return detector.predict(images, min_confidence)
+
+
+def run_inference(img, min_confidence=MIN_CONFIDENCE):
+    """
+    Run inference on a single decoded image, through the process pool or the
+    batch scheduler when enabled
+    
+    Returns:
+        tuple: (cls int array (N,), conf float array (N,), xyxy float array (N, 4))
+    """
+    if process_pool is not None:
+        return process_pool.predict(img, min_confidence)
+    if batch_scheduler is not None:
+        return batch_scheduler.predict(img, min_confidence)
+    return predict_batch([img], min_confidence)[0]
+
+
+def run_inference_many(images, min_confidence=MIN_CONFIDENCE):
+    """
+    Run inference on several images of one request as a single batch
+
+    With the process pool or the batch scheduler every image is submitted
+    before any result is awaited, so they share workers or model calls.
+
+    Returns:
+        list: (cls, conf, xyxy) per image, in order
+    """
+    runner = process_pool or batch_scheduler
+    if runner is not None:
+        futures = [runner.submit(img, min_confidence) for img in images]
+        return [future.result() for future in futures]
+    return predict_batch(images, min_confidence)
+
+
+def resolve_modes(enable_preprocessing, preprocess_mode=None, tiling=None):
+    """
+    The enhancement and tiling modes a detection with these parameters runs
+    with, after applying the PREPROCESS_MODE / TILED_INFERENCE defaults
+
+    Returns:
+        tuple: (preprocess mode, tiling mode)
+    """
+    mode = (preprocess_mode or PREPROCESS_MODE) if enable_preprocessing else "none"
+    return mode, tiling or TILED_INFERENCE
+
+
+def should_tile(shape, mode=None):
+    """Whether a frame of this shape is run as tiles under the given TILING_MODES mode"""
+    mode = mode or TILED_INFERENCE
+    if mode == "on":
+        return shape[0] > TILE_SIZE or shape[1] > TILE_SIZE
+    if mode == "auto":
+        return shape[0] * shape[1] > TILE_AUTO_MIN_PIXELS
+    return False
+
+
+def inference_inputs(img, tiling=None, regions=None):
+    """
+    Images that go through the model for one frame
+    
+    With regions of interest the frame is cropped to them once (see roi.py);
+    that crop, or the whole frame, is cut into tiles when should_tile says so.
+    
+    Returns:
+        tuple: (list of images, list of (x, y) offsets of each image in the frame)
+    """
+    if regions:
+        crop, offset = crop_regions(img, regions)
+        parts = [(crop, offset)] if crop is not None else []
+    else:
+        parts = [(img, (0, 0))]
+    images, offsets = [], []
+    for part, (dx, dy) in parts:
+        if should_tile(part.shape, tiling):
+            tiles = tile_grid(part.shape, TILE_SIZE, TILE_OVERLAP)
+            images.extend(crop_tiles(part, tiles))
+            offsets.extend((dx + x1, dy + y1) for x1, y1, _, _ in tiles)
+            if not TILE_INCLUDE_FULL_FRAME:
+                continue
+        images.append(part)
+        offsets.append((dx, dy))
+    return images, offsets
+
+
+def run_frame_inference(img, min_confidence=MIN_CONFIDENCE, tiling=None, regions=None):
+    """
+    Inference on one frame, sliced into regions and/or tiles when configured
+    
+    Slices run as one batch; their boxes are shifted back to full-frame
+    coordinates and merged with a cross-tile NMS.
+    
+    Returns:
+        tuple: (cls, conf, xyxy) in full-frame coordinates
+    """
+    if not regions and not should_tile(img.shape, tiling):
+        return run_inference(img, min_confidence)
+    images, offsets = inference_inputs(img, tiling, regions)
+    logger.debug("[DETECTION] Sliced inference: %d inputs (%d regions) for %dx%d",
+                 len(images), len(regions or ()), img.shape[1], img.shape[0])
+    if not images:
+        return offset_detections([], [])
+    cls, conf, xyxy = offset_detections(run_inference_many(images, min_confidence), offsets)
+    return merge_detections(cls, conf, xyxy, TILE_NMS_IOU, TILE_CONTAINMENT)
+
+
+def get_inference_stats():
+    """Return batch scheduler or process pool statistics"""
+    stats = {"backend": DETECTOR_BACKEND, "model": model_status(), "batching": batch_scheduler is not None,
+             "tiling": TILED_INFERENCE}
+    if batch_scheduler is not None:
+        stats.update(batch_scheduler.stats())
+    if process_pool is not None:
+        stats["process_pool"] = process_pool.stats()
+    return stats
+
+
+def shutdown_inference(timeout=None):
+    """Finish the frames already queued on the batch scheduler and stop it"""
+    if batch_scheduler is not None:
+        batch_scheduler.shutdown(timeout=timeout)
+
+
+def build_tone_lut(mean_gray, mode="fixed"):
+    """
+    Brightness (or gamma) and contrast fused into a single 256-entry lookup table
+    
+    Args:
+        mean_gray: Mean gray level of the input image (0-255)
+        mode: "fixed" for constant brightness, "auto_gamma" for a gamma picked so
+              the mean moves towards AUTO_GAMMA_TARGET, anything else for contrast only
+    
+    Returns:
+        numpy.ndarray: uint8 LUT for cv2.LUT
+    """
+    levels = np.arange(256, dtype=np.float32)
+    mean_gray = float(np.clip(mean_gray, 1.0, 254.0))
+    
+    if mode == "fixed":
+        toned = np.clip(levels * BRIGHTNESS_FACTOR, 0, 255)
+        new_mean = min(mean_gray * BRIGHTNESS_FACTOR, 255.0)
+    elif mode == "auto_gamma":
+        gamma = np.log(AUTO_GAMMA_TARGET / 255.0) / np.log(mean_gray / 255.0)
+        gamma = float(np.clip(gamma, *AUTO_GAMMA_RANGE))
+        toned = 255.0 * (levels / 255.0) ** gamma
+        new_mean = 255.0 * (mean_gray / 255.0) ** gamma
+    else:
+        toned = levels
+        new_mean = mean_gray
+    
+    # Contrast around the (adjusted) mean, same as PIL's ImageEnhance.Contrast
+    lut = new_mean + CONTRAST_FACTOR * (toned - new_mean)
+    return np.clip(np.round(lut), 0, 255).astype(np.uint8)
+
+
+def build_sharpen_kernel(factor=SHARPNESS_FACTOR):
+    """
+    Single 3x3 kernel equivalent to PIL's ImageEnhance.Sharpness(factor):
+    img + (factor - 1) * (img - smooth) with PIL's SMOOTH kernel
+    """
+    smooth = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13.0
+    identity = np.zeros((3, 3), dtype=np.float32)
+    identity[1, 1] = 1.0
+    amount = factor - 1.0
+    return (1.0 + amount) * identity - amount * smooth
+
+
+SHARPEN_KERNEL = build_sharpen_kernel()
+_clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID)
+
+
+def enhance_image(img, mode=None, brightness=None):
+    """
+    Enhance a decoded BGR image in memory to improve detection accuracy
+    - Brightness/gamma and contrast in one cv2.LUT pass
+    - Sharpening in one cv2.filter2D pass
+    - Optional CLAHE on the lightness channel instead of the global tone curve
+    
+    Args:
+        img: Decoded BGR image (numpy array)
+        mode: One of PREPROCESS_MODES (default: PREPROCESS_MODE)
+        brightness: Mean gray level if already known (e.g. from get_image_info)
+    
+    Returns:
+        numpy.ndarray: Enhanced BGR image (the original array if enhancement fails)
+    """
+    mode = mode or PREPROCESS_MODE
+    if mode == "none":
+        return img
+    try:
+        if mode == "clahe":
+            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+            lab[:, :, 0] = _clahe.apply(lab[:, :, 0])
+            toned = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+        else:
+            if brightness is None:
+                # A downscaled copy is plenty to estimate the mean
+                small = cv2.resize(img, (64, 48), interpolation=cv2.INTER_AREA)
+                brightness = float(np.mean(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)))
+            toned = cv2.LUT(img, build_tone_lut(brightness, mode))
+        
+        return cv2.filter2D(toned, -1, SHARPEN_KERNEL)
+        
+    except Exception as e:
+        logger.warning("[PREPROCESSING] Failed: %s, using original image", e)
+        return img
+
 
 def preprocess_image(image_path):
     """
-    Preprocess image to improve detection accuracy
-    - Adjust brightness and contrast
-    - Enhance sharpness
-    - Resize if needed
+    Preprocess an image file to improve detection accuracy
+    
+    Kept for callers that work with files; the upload path uses
+    enhance_image() directly on the decoded array.
+    
+    Returns:
+        str: Path to the preprocessed image (or the original path on failure)
     """
     try:
         # Read image
         img = cv2.imread(image_path)
         if img is None:
-            print(f"[WARNING] Could not read image: {image_path}")
+            logger.warning("[PREPROCESSING] Could not read image: %s", image_path)
             return image_path
         
-        # Convert to RGB (OpenCV uses BGR)
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # Convert to PIL for enhancement
-        pil_img = Image.fromarray(img_rgb)
-        
-        # Enhance brightness (helps with dark fridge images)
-        enhancer = ImageEnhance.Brightness(pil_img)
-        pil_img = enhancer.enhance(1.2)  # Increase brightness by 20%
-        
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(pil_img)
-        pil_img = enhancer.enhance(1.1)  # Increase contrast by 10%
-        
-        # Enhance sharpness
-        enhancer = ImageEnhance.Sharpness(pil_img)
-        pil_img = enhancer.enhance(1.1)  # Slight sharpness increase
-        
-        # Convert back to numpy array and BGR for OpenCV
-        img_enhanced = np.array(pil_img)
-        img_enhanced = cv2.cvtColor(img_enhanced, cv2.COLOR_RGB2BGR)
+        img_enhanced = enhance_image(img)
         
         # Save preprocessed image temporarily
         preprocessed_path = image_path.replace('.jpg', '_preprocessed.jpg').replace('.png', '_preprocessed.png')
         cv2.imwrite(preprocessed_path, img_enhanced)
         
-        print(f"[PREPROCESSING] Enhanced image saved to: {preprocessed_path}")
+        logger.debug("[PREPROCESSING] Enhanced image saved to: %s", preprocessed_path)
         return preprocessed_path
         
     except Exception as e:
-        print(f"[WARNING] Preprocessing failed: {str(e)}, using original image")
+        logger.warning("[PREPROCESSING] Failed: %s, using original image", e)
         return image_path
 
 
@@ -115,137 +402,301 @@ def is_food_item(item_name):
     return False
 
 
-def detect_objects(image_path, min_confidence=MIN_CONFIDENCE, filter_food=True, 
-                  enable_preprocessing=ENABLE_PREPROCESSING, save_annotated=False):
+def build_class_tables(names):
+    """
+    Per-class lookup arrays indexed by YOLO class ID
+    
+    Returns:
+        tuple: (display names, food mask, categories) as numpy arrays
+    """
+    num_classes = max(names) + 1 if names else 0
+    class_names = np.array([names.get(i, "") for i in range(num_classes)], dtype=object)
+    food_mask = np.array([is_food_item(name) for name in class_names], dtype=bool)
+    categories = np.array([get_food_category(name) for name in class_names], dtype=object)
+    return class_names, food_mask, categories
+
+
+# Precomputed once the model is loaded so post-processing never scans
+# keyword/category lists per box
+CLASS_NAMES, FOOD_MASK, CLASS_CATEGORIES = build_class_tables({})
+
+_model_lock = threading.Lock()
+_model_ready = threading.Event()
+_model_status = {"state": "not_loaded", "error": None, "load_seconds": None, "model_id": None}
+_model_ready_callbacks = []
+
+
+def _preloaded_detector():
+    """Detector factory for forked pool workers: the parent's already loaded detector"""
+    return detector
+
+
+def start_model_loading(force=False):
+    """
+    Start loading the detector (no-op if it is already loading or loaded)
+    
+    The process pool is forked on the calling thread, so call this before
+    the server starts other threads. Loading the weights and the warm-up
+    run in a background thread unless MODEL_LOADING is "eager".
+    
+    Args:
+        force: Also start in "lazy" mode (used by the first detection)
+    """
+    global detector, process_pool
+    if MODEL_LOADING == "lazy" and not force:
+        return
+    with _model_lock:
+        if _model_status["state"] != "not_loaded":
+            return
+        _model_status["state"] = "loading"
+    started = time.perf_counter()
+    logger.info("[DETECTION] Loading %s detector (%s)...", DETECTOR_BACKEND, DETECTOR_MODEL_PATH)
+    try:
+        if INFERENCE_PROCESSES > 0:
+            factory = detector_factory
+            if PRELOAD_BEFORE_FORK:
+                detector = detector_factory()
+                factory = _preloaded_detector
+            process_pool = InferenceProcessPool(
+                factory,
+                num_workers=INFERENCE_PROCESSES,
+                pin_cores=PIN_INFERENCE_CORES,
+                threads_per_worker=THREADS_PER_PROCESS,
+                task_timeout=INFERENCE_TASK_TIMEOUT,
+            )
+            atexit.register(process_pool.shutdown)
+    except Exception as e:
+        _loading_failed(e)
+        return
+    if MODEL_LOADING == "eager":
+        _finish_loading(started)
+    else:
+        threading.Thread(target=_finish_loading, args=(started,), name="model-loader", daemon=True).start()
+
+
+def _finish_loading(started):
+    global detector, batch_scheduler, CLASS_NAMES, FOOD_MASK, CLASS_CATEGORIES
+    try:
+        if process_pool is not None:
+            # Workers load and warm up in their own processes; PoolLoadError
+            # carries the workers' load error once all of them have given up
+            if not process_pool.wait_ready(MODEL_LOAD_TIMEOUT):
+                raise TimeoutError(f"No inference worker was ready after {MODEL_LOAD_TIMEOUT}s")
+            names = process_pool.names
+        else:
+            detector = detector_factory()
+            if WARMUP_ON_START:
+                detector.warm_up()
+            names = detector.names
+            if BATCH_INFERENCE:
+                batch_scheduler = BatchInferenceScheduler(
+                    predict_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+        CLASS_NAMES, FOOD_MASK, CLASS_CATEGORIES = build_class_tables(names)
+    except Exception as e:
+        _loading_failed(e)
+        return
+    model_id = get_model_id()
+    with _model_lock:
+        _model_status["state"] = "ready"
+        _model_status["load_seconds"] = round(time.perf_counter() - started, 3)
+        _model_status["model_id"] = model_id
+        callbacks = list(_model_ready_callbacks)
+    _model_ready.set()
+    logger.info("[DETECTION] Model ready in %.2fs", _model_status['load_seconds'])
+    for callback in callbacks:
+        try:
+            callback(model_id)
+        except Exception:
+            logger.exception("[DETECTION] Model-ready callback failed")
+
+
+def on_model_ready(callback):
+    """
+    Call callback(model_id) when the detector has loaded (right away if it already has)
+    
+    model_id is get_model_id() at the time the weights were loaded, so
+    callers can tell whether results they kept came from this model.
+    """
+    with _model_lock:
+        _model_ready_callbacks.append(callback)
+        model_id = _model_status["model_id"] if _model_status["state"] == "ready" else None
+    if model_id is not None:
+        callback(model_id)
+
+
+def _loading_failed(error):
+    logger.error("[DETECTION] Could not load detector: %s", error)
+    with _model_lock:
+        _model_status["state"] = "error"
+        _model_status["error"] = str(error)
+    _model_ready.set()
+
+
+def wait_for_model(timeout=None):
+    """
+    Block until the detector is ready, starting it first if it is not loading yet
+    
+    Returns:
+        bool: True if the detector is ready
+    """
+    start_model_loading(force=True)
+    _model_ready.wait(timeout)
+    return _model_status["state"] == "ready"
+
+
+def model_status():
+    """Loading state for health checks: not_loaded, loading, ready or error"""
+    with _model_lock:
+        status = dict(_model_status)
+    status["ready"] = status["state"] == "ready"
+    status["model_loading"] = status["state"] == "loading"
+    status["backend"] = DETECTOR_BACKEND
+    return status
+
+
+def draw_detections(img, cls, conf, xyxy):
+    """Draw boxes and labels on a copy of img"""
+    annotated = img.copy()
+    for class_id, score, box in zip(cls, conf, xyxy.astype(int)):
+        x1, y1, x2, y2 = box
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(annotated, f"{CLASS_NAMES[class_id]} {score:.2f}", (x1, max(y1 - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return annotated
+
+
+def summarize_detections(cls, conf, min_confidence=MIN_CONFIDENCE, filter_food=True):
+    """
+    Turn per-box arrays into per-item counts using array operations
+    
+    Returns:
+        List of detected items, sorted by confidence (highest first; ties keep
+        the order in which the items were first detected)
+    """
+    keep = conf >= min_confidence
+    if filter_food:
+        keep &= FOOD_MASK[cls]
+    cls, conf = cls[keep], conf[keep]
+    if len(cls) == 0:
+        return []
+    
+    num_classes = len(CLASS_NAMES)
+    counts = np.bincount(cls, minlength=num_classes)
+    max_conf = np.zeros(num_classes, dtype=np.float32)
+    np.maximum.at(max_conf, cls, conf)
+    first_seen = np.full(num_classes, len(cls), dtype=np.intp)
+    np.minimum.at(first_seen, cls, np.arange(len(cls)))
+    
+    present = np.flatnonzero(counts)
+    rounded = np.round(max_conf[present].astype(np.float64), 2)
+    order = present[np.lexsort((first_seen[present], -rounded))]
+    
+    detected_items = []
+    for class_id in order:
+        confidence = round(float(max_conf[class_id]), 2)
+        detected_items.append({
+            'name': CLASS_NAMES[class_id],
+            'quantity': int(counts[class_id]),
+            'confidence': confidence,
+            'category': CLASS_CATEGORIES[class_id],
+            'detections': int(counts[class_id]),  # Number of times detected
+            'avg_confidence': confidence
+        })
+    return detected_items
+
+
+def detect_objects(image, min_confidence=MIN_CONFIDENCE, filter_food=True, 
+                  enable_preprocessing=ENABLE_PREPROCESSING, save_annotated=False,
+                  annotated_path=None, preprocess_mode=None, brightness=None, tiling=None,
+                  regions=None):
     """
     Detect objects in an image using YOLOv8 with enhanced preprocessing
     
     Args:
-        image_path: Path to the image file
+        image: Path to the image file, or an already decoded BGR image
+               (numpy array) which is used as-is without touching the disk
         min_confidence: Minimum confidence score (0.0-1.0)
         filter_food: If True, only return food-related items
         enable_preprocessing: If True, enhance image before detection
         save_annotated: If True, save image with bounding boxes
+        annotated_path: Where to write the annotated image (defaults to
+                        <image_path>_annotated.jpg when a path is given)
+        preprocess_mode: Enhancement mode (see PREPROCESS_MODES), e.g. per device
+        brightness: Mean gray level from get_image_info, saves recomputing it
+        tiling: Sliced inference mode (see TILING_MODES, default TILED_INFERENCE)
+        regions: The camera's regions of interest (roi.py); only these are
+                 run through the model, boxes are in full-frame coordinates
     
     Returns:
         List of detected items with their details
+    
+    Raises:
+        ModelNotReadyError: If the detector failed or is still loading after MODEL_LOAD_TIMEOUT
+        PoolUnavailableError: If no inference worker could take the frame in time
     """
+    if not wait_for_model(MODEL_LOAD_TIMEOUT):
+        raise ModelNotReadyError(f"Detector not ready ({_model_status['state']})")
+    
     try:
-        print(f"[DETECTION] Starting detection for: {image_path}")
+        if isinstance(image, np.ndarray):
+            logger.debug("[DETECTION] Starting detection for in-memory image %dx%d", image.shape[1], image.shape[0])
+            img = image
+        else:
+            logger.debug("[DETECTION] Starting detection for: %s", image)
+            
+            # Validate image exists
+            if not os.path.exists(image):
+                logger.error("[DETECTION] Image not found: %s", image)
+                return []
+            
+            img = cv2.imread(image)
+            if img is None:
+                logger.error("[DETECTION] Could not read image: %s", image)
+                return []
+            
+            if annotated_path is None:
+                annotated_path = image.replace('.jpg', '_annotated.jpg').replace('.png', '_annotated.png')
         
-        # Validate image exists
-        if not os.path.exists(image_path):
-            print(f"[ERROR] Image not found: {image_path}")
-            return []
-        
-        # Preprocess image if enabled
-        processed_image_path = image_path
+        # Preprocess image if enabled (in memory, no temporary files)
         if enable_preprocessing:
-            print("[PREPROCESSING] Enhancing image...")
-            processed_image_path = preprocess_image(image_path)
+            logger.debug("[PREPROCESSING] Enhancing image (%s)", preprocess_mode or PREPROCESS_MODE)
+            with span("preprocess"):
+                img = enhance_image(img, preprocess_mode, brightness)
         
         # Run YOLOv8 detection with improved settings
-        print(f"[DETECTION] Running YOLOv8 with confidence threshold: {min_confidence}")
-        results = model(
-            processed_image_path, 
-            conf=min_confidence,
-            iou=0.45,  # Non-maximum suppression IoU threshold
-            imgsz=640,  # Input image size (optimal for YOLOv8n)
-            verbose=False  # Reduce output noise
-        )
-        
-        detected_items = []
-        item_counts = {}  # Track quantities and bounding boxes
-        all_detections = []  # Store all detections for annotation
-
-        # Process detection results
-        for r in results:
-            if r.boxes is not None and len(r.boxes) > 0:
-                for box in r.boxes:
-                    cls = int(box.cls)
-                    confidence = float(box.conf)
-                    item_name = model.names[cls].lower()
-                    
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    bbox = {
-                        'x1': float(x1),
-                        'y1': float(y1),
-                        'x2': float(x2),
-                        'y2': float(y2),
-                        'width': float(x2 - x1),
-                        'height': float(y2 - y1)
-                    }
-                    
-                    # Filter for food items if requested
-                    if filter_food:
-                        if not is_food_item(item_name):
-                            continue
-                    
-                    # Store detection info
-                    detection_info = {
-                        'name': model.names[cls],  # Keep original capitalization
-                        'confidence': confidence,
-                        'bbox': bbox
-                    }
-                    all_detections.append(detection_info)
-                    
-                    # Count occurrences of same item
-                    if item_name not in item_counts:
-                        item_counts[item_name] = {
-                            'name': model.names[cls],
-                            'confidence': confidence,
-                            'count': 0,
-                            'bboxes': [],
-                            'category': get_food_category(item_name)
-                        }
-                    
-                    item_counts[item_name]['count'] += 1
-                    item_counts[item_name]['bboxes'].append(bbox)
-                    
-                    # Update to highest confidence if this detection is more confident
-                    if confidence > item_counts[item_name]['confidence']:
-                        item_counts[item_name]['confidence'] = confidence
-
-        # Convert to list format with additional metadata
-        for item_name, item_data in item_counts.items():
-            detected_items.append({
-                'name': item_data['name'],
-                'quantity': item_data['count'],
-                'confidence': round(item_data['confidence'], 2),
-                'category': item_data['category'],
-                'detections': item_data['count'],  # Number of times detected
-                'avg_confidence': round(item_data['confidence'], 2)
-            })
+        logger.debug("[DETECTION] Running %s with confidence threshold: %s", DETECTOR_BACKEND, min_confidence)
+        with span("inference"):
+            cls, conf, xyxy = run_frame_inference(img, min_confidence, tiling, regions)
         
-        # Sort by confidence (highest first)
-        detected_items.sort(key=lambda x: x['confidence'], reverse=True)
+        # Process detection results (batches run at the lowest threshold of
+        # their members, so the caller's threshold is re-applied here)
+        with span("postprocess"):
+            detected_items = summarize_detections(cls, conf, min_confidence, filter_food)
         
-        print(f"[DETECTION] Detected {len(detected_items)} unique items:")
-        for item in detected_items:
-            print(f"  - {item['name']}: {item['quantity']}x (confidence: {item['confidence']:.2f})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DETECTION] Detected %d unique items: %s", len(detected_items), ", ".join(
+                f"{item['name']} x{item['quantity']} ({item['confidence']:.2f})" for item in detected_items))
         
         # Save annotated image if requested
-        if save_annotated and len(all_detections) > 0:
+        if save_annotated and annotated_path and len(detected_items) > 0:
             try:
-                annotated_path = image_path.replace('.jpg', '_annotated.jpg').replace('.png', '_annotated.png')
-                annotated_img = results[0].plot()  # Get annotated image
-                cv2.imwrite(annotated_path, annotated_img)
-                print(f"[DETECTION] Annotated image saved to: {annotated_path}")
+                shown = conf >= min_confidence
+                annotated_img = draw_detections(img, cls[shown], conf[shown], xyxy[shown])
+                if cv2.imwrite(annotated_path, annotated_img):
+                    logger.debug("[DETECTION] Annotated image saved to: %s", annotated_path)
+                else:
+                    logger.error("[DETECTION] Could not write annotated image to %s", annotated_path)
             except Exception as e:
-                print(f"[WARNING] Could not save annotated image: {str(e)}")
-        
-        # Clean up preprocessed image
-        if enable_preprocessing and processed_image_path != image_path and os.path.exists(processed_image_path):
-            try:
-                os.remove(processed_image_path)
-            except:
-                pass  # Ignore cleanup errors
+                logger.warning("[DETECTION] Could not save annotated image: %s", e)
         
         return detected_items
 
+    except PoolUnavailableError:
+        raise
     except Exception as e:
-        print(f"[ERROR] Detection failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[DETECTION] Detection failed")
         return []
+
+
+if MODEL_LOADING == "eager":
+    start_model_loading()
@@ -0,0 +1,378 @@
+"""
+Append-only storage for detection history
+
+Two backends share one interface (append / latest / query / count / close):
+- JsonlDetectionStore: one JSON object per line, O(1) appends, periodic
+  compaction through an atomic rename
+- SqliteDetectionStore: SQLite in WAL mode, safe for several processes
+
+Both keep a time index and an item-name index and apply a configurable
+retention (max entries and/or max age) instead of a fixed cap.
+"""
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Physical lines allowed per retained entry before the JSONL file is compacted
+COMPACT_FACTOR = 2
+
+
+def _item_names(items):
+    return {str(item.get("name", "")).lower() for item in items if item.get("name")}
+
+
+def _cutoff(max_age_days):
+    if not max_age_days:
+        return None
+    return (datetime.now() - timedelta(days=max_age_days)).isoformat()
+
+
+class DetectionStore:
+    """Interface shared by the storage backends"""
+
+    def append(self, items, timestamp=None):
+        """Record one detection; returns the stored entry"""
+        raise NotImplementedError
+
+    def latest(self):
+        """Return the most recent entry (or None) without loading the history"""
+        raise NotImplementedError
+
+    def query(self, since=None, until=None, item=None, limit=None):
+        """
+        Return entries in time order
+
+        Args:
+            since: ISO timestamp, inclusive lower bound
+            until: ISO timestamp, inclusive upper bound
+            item: Only entries containing this item name (case-insensitive)
+            limit: Only the newest `limit` matching entries
+        """
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonlDetectionStore(DetectionStore):
+    """
+    JSON-lines detection log
+
+    Each append is a single write of one line followed by flush (and fsync
+    when durable=True). A torn last line left by a crash is ignored and
+    truncated on the next load. Indexes are built lazily, so reading only the
+    latest entry at startup never scans the file.
+    """
+
+    def __init__(self, path, max_entries=1000, max_age_days=None, durable=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.durable = durable
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._timestamps = []  # time index, parallel to _offsets
+        self._offsets = []
+        self._names = []  # item names per retained entry
+        self._item_index = {}  # item name -> sorted absolute positions
+        self._dropped = 0  # entries trimmed from the front of the in-memory index
+        self._physical_lines = 0
+
+    # -- loading ---------------------------------------------------------
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    offset += len(line)
+                    good_end = offset
+                    self._physical_lines += 1
+                    continue
+                self._index_entry(entry, offset)
+                offset += len(line)
+                good_end = offset
+                self._physical_lines += 1
+        if good_end < os.path.getsize(self.path):
+            logger.warning("[DATABASE] Dropping incomplete trailing record in %s", self.path)
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+        self._apply_retention()
+
+    def _index_entry(self, entry, offset):
+        position = self._dropped + len(self._offsets)
+        self._timestamps.append(entry.get("timestamp", ""))
+        self._offsets.append(offset)
+        names = _item_names(entry.get("items", []))
+        self._names.append(names)
+        for name in names:
+            self._item_index.setdefault(name, []).append(position)
+
+    # -- retention and compaction ------------------------------------------
+
+    def _apply_retention(self):
+        drop = 0
+        if self.max_entries and len(self._offsets) > self.max_entries:
+            drop = len(self._offsets) - self.max_entries
+        cutoff = _cutoff(self.max_age_days)
+        if cutoff:
+            drop = max(drop, bisect.bisect_left(self._timestamps, cutoff))
+        if drop:
+            for names in self._names[:drop]:
+                for name in names:
+                    positions = self._item_index.get(name)
+                    if positions:
+                        positions.pop(0)
+                        if not positions:
+                            del self._item_index[name]
+            del self._timestamps[:drop]
+            del self._offsets[:drop]
+            del self._names[:drop]
+            self._dropped += drop
+        if self._physical_lines > max(len(self._offsets), 1) * COMPACT_FACTOR:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite only the retained entries, then atomically swap the file in"""
+        tmp_path = self.path + ".compact"
+        new_offsets = []
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            for offset in self._offsets:
+                src.seek(offset)
+                new_offsets.append(dst.tell())
+                dst.write(src.readline())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, self.path)
+        self._offsets = new_offsets
+        self._physical_lines = len(new_offsets)
+        logger.info("[DATABASE] Compacted %s to %d entries", self.path, len(new_offsets))
+
+    # -- interface ---------------------------------------------------------
+
+    def append(self, items, timestamp=None):
+        entry = {"timestamp": timestamp or datetime.now().isoformat(), "items": items}
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        with self._lock:
+            self._ensure_loaded()
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+                f.flush()
+                if self.durable:
+                    os.fsync(f.fileno())
+            self._physical_lines += 1
+            self._index_entry(entry, offset)
+            self._apply_retention()
+        return entry
+
+    def _read_at(self, f, offset):
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def latest(self):
+        with self._lock:
+            if self._loaded:
+                if not self._offsets:
+                    return None
+                with open(self.path, "rb") as f:
+                    return self._read_at(f, self._offsets[-1])
+            return self._read_last_line()
+
+    def _read_last_line(self):
+        """Read the newest complete record by scanning backwards from the end"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            chunk_size = 8192
+            buffer = b""
+            position = end
+            while position > 0:
+                step = min(chunk_size, position)
+                position -= step
+                f.seek(position)
+                buffer = f.read(step) + buffer
+                lines = buffer.split(b"\n")
+                # lines[-1] is the (possibly torn) data after the last newline
+                complete = lines[1:-1] if position > 0 else lines[:-1]
+                for line in reversed(complete):
+                    if line.strip():
+                        try:
+                            return json.loads(line)
+                        except ValueError:
+                            continue
+        return None
+
+    def query(self, since=None, until=None, item=None, limit=None):
+        with self._lock:
+            self._ensure_loaded()
+            start = bisect.bisect_left(self._timestamps, since) if since else 0
+            stop = bisect.bisect_right(self._timestamps, until) if until else len(self._timestamps)
+            if item is not None:
+                positions = self._item_index.get(item.lower(), [])
+                lo = bisect.bisect_left(positions, self._dropped + start)
+                hi = bisect.bisect_left(positions, self._dropped + stop)
+                indices = [p - self._dropped for p in positions[lo:hi]]
+            else:
+                indices = range(start, stop)
+            indices = list(indices)
+            if limit:
+                indices = indices[-limit:]
+            if not indices:
+                return []
+            with open(self.path, "rb") as f:
+                return [self._read_at(f, self._offsets[i]) for i in indices]
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._offsets)
+
+
+class SqliteDetectionStore(DetectionStore):
+    """SQLite (WAL mode) detection log with time and item-name indexes"""
+
+    def __init__(self, path, max_entries=1000, max_age_days=None, durable=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")  # retention deletes cascade to detection_items
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS detections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                items TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections(timestamp);
+            CREATE TABLE IF NOT EXISTS detection_items (
+                detection_id INTEGER NOT NULL REFERENCES detections(id) ON DELETE CASCADE,
+                name TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_detection_items_name ON detection_items(name, detection_id);
+        """)
+
+    def append(self, items, timestamp=None):
+        entry = {"timestamp": timestamp or datetime.now().isoformat(), "items": items}
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute("INSERT INTO detections (timestamp, items) VALUES (?, ?)",
+                            (entry["timestamp"], json.dumps(items)))
+                detection_id = cur.lastrowid
+                cur.executemany("INSERT INTO detection_items (detection_id, name) VALUES (?, ?)",
+                                [(detection_id, name) for name in _item_names(items)])
+                self._apply_retention(cur)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return entry
+
+    def _apply_retention(self, cur):
+        if self.max_entries:
+            cur.execute("DELETE FROM detections WHERE id <= "
+                        "(SELECT id FROM detections ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (self.max_entries,))
+        cutoff = _cutoff(self.max_age_days)
+        if cutoff:
+            cur.execute("DELETE FROM detections WHERE timestamp < ?", (cutoff,))
+
+    @staticmethod
+    def _row_to_entry(row):
+        return {"timestamp": row[0], "items": json.loads(row[1])}
+
+    def latest(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT timestamp, items FROM detections ORDER BY id DESC LIMIT 1").fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def query(self, since=None, until=None, item=None, limit=None):
+        sql = "SELECT d.timestamp, d.items FROM detections d"
+        clauses, params = [], []
+        if item is not None:
+            sql += " JOIN detection_items i ON i.detection_id = d.id"
+            clauses.append("i.name = ?")
+            params.append(item.lower())
+        if since:
+            clauses.append("d.timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("d.timestamp <= ?")
+            params.append(until)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY d.id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_entry(row) for row in reversed(rows)]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_detection_store(path, backend="jsonl", max_entries=1000, max_age_days=None,
+                         durable=False, legacy_path=None):
+    """
+    Open a detection store, importing a legacy database.json list if present
+
+    Args:
+        path: Store file (database.jsonl / database.sqlite3)
+        backend: "jsonl" or "sqlite"
+        max_entries: Keep at most this many detections (None/0 = unlimited)
+        max_age_days: Drop detections older than this (None = keep)
+        durable: fsync every append (slower, survives power loss)
+        legacy_path: Old whole-file JSON database to migrate on first start
+    """
+    is_new = not os.path.exists(path)
+    if backend == "sqlite":
+        store = SqliteDetectionStore(path, max_entries, max_age_days, durable)
+    elif backend == "jsonl":
+        store = JsonlDetectionStore(path, max_entries, max_age_days, durable)
+    else:
+        raise ValueError(f"Unknown detection store backend: {backend}")
+
+    if is_new and legacy_path and os.path.exists(legacy_path):
+        try:
+            with open(legacy_path, "r") as f:
+                legacy = json.load(f)
+            for entry in legacy:
+                store.append(entry.get("items", []), timestamp=entry.get("timestamp"))
+            logger.info("[DATABASE] Imported %d detections from %s", len(legacy), legacy_path)
+        except Exception as e:
+            logger.error("[DATABASE] Could not import %s: %s", legacy_path, e)
+    return store
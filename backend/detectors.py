@@ -0,0 +1,300 @@
+"""
+Detector backends behind detect_objects
+
+Every backend exposes the same small interface:
+    names                       class ID -> class name
+    model_path                  weights file (used for cache invalidation)
+    predict(images, min_conf)   one (cls, conf, xyxy) tuple of arrays per image
+    warm_up()                   one dummy inference so the first request is not slow
+
+Backends:
+    ultralytics  PyTorch YOLOv8 through ultralytics (default)
+    onnx         Exported YOLOv8 ONNX graph (FP32 or INT8) in ONNX Runtime on CPU
+    stub         Deterministic blob detector for benchmarks, no model download
+
+Export (and optionally quantize) the ONNX model once:
+    python detectors.py export --model yolov8n.pt --int8
+"""
+import argparse
+import ast
+import logging
+import os
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_BACKENDS = ("ultralytics", "onnx", "stub")
+
+
+def empty_detections():
+    return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.float32)
+
+
+class Detector:
+    """Base class: subclasses set names/model_path and implement predict()"""
+
+    backend = None
+
+    def __init__(self, model_path, imgsz=640, iou=0.45):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.iou = iou
+        self.names = {}
+
+    def predict(self, images, min_confidence):
+        raise NotImplementedError
+
+    def warm_up(self, shape=(480, 640, 3)):
+        """Run one inference on a blank frame and return how long it took (seconds)"""
+        start = time.perf_counter()
+        self.predict([np.zeros(shape, dtype=np.uint8)], 0.99)
+        elapsed = time.perf_counter() - start
+        logger.info("[DETECTION] %s warm-up took %.0f ms", self.backend, elapsed * 1000)
+        return elapsed
+
+
+class UltralyticsDetector(Detector):
+    """YOLOv8 PyTorch model through ultralytics"""
+
+    backend = "ultralytics"
+
+    def __init__(self, model_path, imgsz=640, iou=0.45):
+        super().__init__(model_path, imgsz, iou)
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+
+    def predict(self, images, min_confidence):
+        results = self.model(
+            images,
+            conf=min_confidence,
+            iou=self.iou,  # Non-maximum suppression IoU threshold
+            imgsz=self.imgsz,  # Input image size (optimal for YOLOv8n)
+            verbose=False  # Reduce output noise
+        )
+        return [self._arrays(result) for result in results]
+
+    @staticmethod
+    def _arrays(result):
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return empty_detections()
+        return (boxes.cls.cpu().numpy().astype(np.intp),
+                boxes.conf.cpu().numpy().astype(np.float32),
+                boxes.xyxy.cpu().numpy().astype(np.float32).reshape(-1, 4))
+
+
+class OnnxDetector(Detector):
+    """
+    Exported YOLOv8 graph in ONNX Runtime
+
+    Pre-processing (letterbox to imgsz, BGR->RGB, /255) and post-processing
+    (per-class NMS) follow ultralytics. Results match the PyTorch backend
+    closely but not bit for bit: ultralytics pads to a multiple of 32
+    rather than to a full square.
+    """
+
+    backend = "onnx"
+
+    def __init__(self, model_path, imgsz=640, iou=0.45, intra_op_threads=0, inter_op_threads=1,
+                 providers=("CPUExecutionProvider",)):
+        super().__init__(model_path, imgsz, iou)
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("DETECTOR_BACKEND='onnx' needs onnxruntime (pip install onnxruntime)")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found, export it with: python detectors.py export")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 = one per physical core
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        available = ort.get_available_providers()
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options,
+            providers=[p for p in providers if p in available] or ["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]  # Static export size wins over the setting
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+    def _letterbox(self, img):
+        """Resize keeping the aspect ratio and pad to imgsz x imgsz; returns (blob, gain, (pad_x, pad_y))"""
+        height, width = img.shape[:2]
+        gain = min(self.imgsz / height, self.imgsz / width)
+        new_w, new_h = int(round(width * gain)), int(round(height * gain))
+        pad_x, pad_y = (self.imgsz - new_w) / 2, (self.imgsz - new_h) / 2
+        if (new_w, new_h) != (width, height):
+            img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        blob = cv2.dnn.blobFromImage(img, 1 / 255.0, swapRB=True)
+        return blob, gain, (left, top)
+
+    def _postprocess(self, output, min_confidence, gain, pad, shape):
+        # output: (4 + num_classes, num_anchors) -> one row per anchor
+        predictions = output.T
+        scores = predictions[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(cls)), cls]
+        keep = conf >= min_confidence
+        if not keep.any():
+            return empty_detections()
+        cls, conf, boxes = cls[keep], conf[keep], predictions[keep, :4]
+
+        # cx, cy, w, h -> x, y, w, h for NMS, then undo the letterbox
+        xywh = boxes.copy()
+        xywh[:, 0] -= xywh[:, 2] / 2
+        xywh[:, 1] -= xywh[:, 3] / 2
+        kept = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(), min_confidence, self.iou)
+        kept = np.asarray(kept, dtype=np.intp).reshape(-1)
+        if len(kept) == 0:
+            return empty_detections()
+        kept = kept[np.argsort(-conf[kept], kind="stable")]
+
+        xyxy = np.empty((len(kept), 4), dtype=np.float32)
+        xyxy[:, 0] = xywh[kept, 0]
+        xyxy[:, 1] = xywh[kept, 1]
+        xyxy[:, 2] = xywh[kept, 0] + xywh[kept, 2]
+        xyxy[:, 3] = xywh[kept, 1] + xywh[kept, 3]
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / gain
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+        return cls[kept].astype(np.intp), conf[kept].astype(np.float32), xyxy
+
+    def predict(self, images, min_confidence):
+        if isinstance(images, np.ndarray):
+            images = [images]
+        detections = []
+        for img in images:
+            blob, gain, pad = self._letterbox(img)
+            output = self.session.run(None, {self.input_name: blob})[0]
+            detections.append(self._postprocess(output[0], min_confidence, gain, pad, img.shape))
+        return detections
+
+
+class StubDetector(Detector):
+    """
+    Deterministic stand-in for benchmarks without model downloads
+
+    Boxes are the bright blobs in the frame (Otsu threshold and contours).
+    The class comes from each blob's mean hue, so the same image always gives
+    the same result. latency_ms adds a fixed delay that stands in for the
+    model's cost.
+    """
+
+    backend = "stub"
+
+    # Subset of COCO IDs so food filtering and categories behave as with YOLO
+    CLASSES = {39: "bottle", 41: "cup", 46: "banana", 47: "apple", 49: "orange", 51: "carrot"}
+
+    def __init__(self, model_path="stub", imgsz=640, iou=0.45, latency_ms=0):
+        super().__init__(model_path, imgsz, iou)
+        self.latency_ms = latency_ms
+        self.names = dict(self.CLASSES)
+        self._class_ids = np.array(sorted(self.CLASSES), dtype=np.intp)
+
+    def _detect(self, img, min_confidence):
+        height, width = img.shape[:2]
+        scale = min(1.0, self.imgsz / max(height, width))
+        small = cv2.resize(img, (int(width * scale), int(height * scale))) if scale < 1.0 else img
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        hue = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)[:, :, 0]
+        min_area = 0.002 * small.shape[0] * small.shape[1]
+
+        cls, conf, boxes = [], [], []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < min_area:
+                continue
+            score = 0.5 + 0.5 * cv2.contourArea(contour) / (w * h)  # Solid blobs score higher
+            if score < min_confidence:
+                continue
+            mean_hue = float(hue[y:y + h, x:x + w].mean())
+            cls.append(self._class_ids[int(mean_hue * len(self._class_ids) / 180) % len(self._class_ids)])
+            conf.append(score)
+            boxes.append((x / scale, y / scale, (x + w) / scale, (y + h) / scale))
+        if not cls:
+            return empty_detections()
+        order = np.argsort(-np.asarray(conf), kind="stable")
+        return (np.asarray(cls, dtype=np.intp)[order],
+                np.asarray(conf, dtype=np.float32)[order],
+                np.asarray(boxes, dtype=np.float32).reshape(-1, 4)[order])
+
+    def predict(self, images, min_confidence):
+        if isinstance(images, np.ndarray):
+            images = [images]
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return [self._detect(img, min_confidence) for img in images]
+
+
+# Options each backend accepts (create_detector drops the others)
+_BACKEND_OPTIONS = {
+    "ultralytics": (UltralyticsDetector, ("imgsz", "iou")),
+    "onnx": (OnnxDetector, ("imgsz", "iou", "intra_op_threads", "inter_op_threads", "providers")),
+    "stub": (StubDetector, ("imgsz", "iou", "latency_ms")),
+}
+
+
+def create_detector(backend, model_path, **options):
+    """
+    Build a detector for the given backend
+
+    Args:
+        backend: One of DETECTOR_BACKENDS
+        model_path: .pt weights for "ultralytics", .onnx graph for "onnx"
+        options: Backend settings (imgsz, iou, thread counts, stub latency);
+                 settings another backend uses are ignored
+    """
+    if backend in _BACKEND_OPTIONS:
+        detector_class, accepted = _BACKEND_OPTIONS[backend]
+        return detector_class(model_path, **{key: value for key, value in options.items() if key in accepted})
+    raise ValueError(f"Unknown detector backend '{backend}' (expected one of {DETECTOR_BACKENDS})")
+
+
+def export_onnx(model_path="yolov8n.pt", imgsz=640, int8=False):
+    """
+    Export PyTorch weights to ONNX and optionally quantize them to INT8
+
+    Returns:
+        str: Path of the model to use with DETECTOR_BACKEND='onnx'
+    """
+    from ultralytics import YOLO
+    onnx_path = YOLO(model_path).export(format="onnx", imgsz=imgsz, simplify=True)
+    print(f"[EXPORT] Wrote {onnx_path}")
+    if not int8:
+        return onnx_path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = onnx_path.replace(".onnx", "_int8.onnx")
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    print(f"[EXPORT] Wrote {int8_path} (dynamic INT8 weights)")
+    return int8_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector backend tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Export YOLOv8 weights to ONNX")
+    export.add_argument("--model", default="yolov8n.pt")
+    export.add_argument("--imgsz", type=int, default=640)
+    export.add_argument("--int8", action="store_true", help="Also write a dynamically quantized INT8 model")
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx(args.model, args.imgsz, args.int8)
+
+
+if __name__ == "__main__":
+    main()
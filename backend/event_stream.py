@@ -0,0 +1,99 @@
+"""
+Server-sent events fan-out
+
+Each published event is serialized once and the same bytes are handed to
+every subscriber. Subscribers have a bounded buffer; a client that falls
+behind far enough to fill it is disconnected instead of slowing the others
+down (it reconnects and catches up with Last-Event-ID).
+"""
+import json
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event, data, event_id=None):
+    """Serialize one SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscriber:
+    """One connected client and its bounded outgoing buffer"""
+
+    def __init__(self, buffer_size, topic=None):
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.topic = topic  # Only events published to this topic (None: all events)
+        self.dropped = False
+
+
+class EventBroadcaster:
+    """Fan out SSE payloads to any number of subscribers"""
+
+    def __init__(self, buffer_size=64, heartbeat_seconds=15):
+        self.buffer_size = buffer_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self, topic=None):
+        subscriber = Subscriber(self.buffer_size, topic)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data, event_id=None, topic=None):
+        """Serialize once and enqueue for every subscriber of the topic; slow ones are dropped"""
+        payload = format_event(event, data, event_id)
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.topic is None or s.topic == topic]
+            self._published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(payload)
+            except queue.Full:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                with self._lock:
+                    self._dropped += 1
+                logger.warning("[EVENTS] Dropped slow subscriber")
+
+    def stream(self, subscriber, initial=()):
+        """
+        Generator of SSE bytes for one subscriber
+
+        Args:
+            subscriber: Value returned by subscribe()
+            initial: Payloads (bytes) to send before live events, e.g. a catch-up delta
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            for payload in initial:
+                yield payload
+            while not subscriber.dropped:
+                try:
+                    yield subscriber.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self._published,
+                "dropped_subscribers": self._dropped,
+            }
@@ -0,0 +1,106 @@
+"""
+Frame-change gating before detection
+
+Each camera's last processed frame is kept as a tiny grayscale thumbnail.
+A new frame whose thumbnail differs from it by less than a threshold (mean
+absolute pixel difference, 0-255) reuses the previous detection result
+instead of running the model again.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Thumbnail size used for comparison; small enough to be ~free, large enough to see items move
+SIGNATURE_SIZE = (64, 48)
+
+
+def frame_signature(img):
+    """Downscaled, slightly blurred grayscale thumbnail used for change detection"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(small, (3, 3), 0).astype(np.float32)
+
+
+def frame_difference(a, b):
+    """Mean absolute difference between two signatures (0 = identical, 255 = inverted)"""
+    return float(np.mean(np.abs(a - b)))
+
+
+class _DeviceState:
+    __slots__ = ("signature", "params_key", "items", "processed_at", "checks", "skips")
+
+    def __init__(self):
+        self.signature = None
+        self.params_key = None
+        self.items = None
+        self.processed_at = 0.0
+        self.checks = 0
+        self.skips = 0
+
+
+class FrameChangeGate:
+    """
+    Per-device change detector with the cached detection result
+
+    A cached result is only reused when the detection parameters match and
+    it is younger than max_age_seconds, so a slowly drifting scene is still
+    re-detected periodically.
+    """
+
+    def __init__(self, threshold=4.0, max_age_seconds=300):
+        self.threshold = threshold
+        self.max_age_seconds = max_age_seconds
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def check(self, device_id, img, params_key):
+        """
+        Compare a frame with the device's last processed frame
+
+        Returns:
+            tuple: (signature, cached items or None, difference or None)
+                   Pass the signature back to update() after running detection.
+        """
+        signature = frame_signature(img)
+        with self._lock:
+            state = self._devices.setdefault(device_id, _DeviceState())
+            state.checks += 1
+            if state.signature is None or state.params_key != params_key:
+                return signature, None, None
+            difference = frame_difference(signature, state.signature)
+            fresh = time.monotonic() - state.processed_at < self.max_age_seconds
+            if difference < self.threshold and fresh:
+                state.skips += 1
+                return signature, [dict(item) for item in state.items], difference
+            return signature, None, difference
+
+    def update(self, device_id, signature, params_key, items):
+        """Remember the frame that was just run through detection and its result"""
+        with self._lock:
+            state = self._devices.setdefault(device_id, _DeviceState())
+            state.signature = signature
+            state.params_key = params_key
+            state.items = [dict(item) for item in items]
+            state.processed_at = time.monotonic()
+
+    def stats(self):
+        """Skip counters and hit rate, overall and per device"""
+        with self._lock:
+            checks = sum(state.checks for state in self._devices.values())
+            skips = sum(state.skips for state in self._devices.values())
+            return {
+                "threshold": self.threshold,
+                "checks": checks,
+                "skipped": skips,
+                "hit_rate": round(skips / checks, 3) if checks else 0.0,
+                "devices": {
+                    device_id: {
+                        "checks": state.checks,
+                        "skipped": state.skips,
+                        "hit_rate": round(state.skips / state.checks, 3) if state.checks else 0.0,
+                    }
+                    for device_id, state in self._devices.items()
+                },
+            }
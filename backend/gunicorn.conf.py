@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for the detection server
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Every setting can be overridden from the environment (GUNICORN_WORKERS=2 ...)
+or on the command line.
+
+Workers are processes and each one loads its own model and keeps its own
+inventory shards, frame gate, temporal filter and SSE subscribers. Keep
+one worker unless DATABASE_BACKEND is "sqlite" and every camera and client
+of a fridge is pinned to the same worker; scale with threads instead (the
+model itself scales with INFERENCE_PROCESSES). Every open /inventory/stream
+and /devices/<id>/commands long-poll holds a thread for its whole duration, so
+the thread count is sized from the expected cameras and stream clients plus
+threads left free for uploads (see README_DETECTION.md, "Production serving").
+"""
+import os
+import sys
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+worker_class = "gthread"
+
+# Each camera keeps one command long-poll open and each dashboard one SSE
+# stream; uploads only get the threads left over, so count those on top
+expected_cameras = int(os.environ.get("EXPECTED_CAMERAS", 32))
+expected_stream_clients = int(os.environ.get("EXPECTED_STREAM_CLIENTS", 8))
+upload_threads = int(os.environ.get("UPLOAD_THREADS", 16))
+threads = int(os.environ.get("GUNICORN_THREADS", expected_cameras + expected_stream_clients + upload_threads))
+
+# ESP32 cameras post every few seconds; reuse their connections instead of a
+# TCP (and TLS, behind a proxy) handshake per frame
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 75))
+
+# Long-polls and SSE heartbeats keep requests open; uploads that wait for a
+# cold model answer 503 after MODEL_WAIT_SECONDS
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+# On SIGTERM, workers stop accepting and finish in-flight requests; worker_exit
+# then flushes, drains async jobs and flushes again. graceful_timeout covers all
+# of it (the worker is killed after that), so the job drain gets at most a third
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# The app starts threads (and with INFERENCE_PROCESSES, a process pool) on
+# import, which would not survive the fork of a preloaded master
+preload_app = False
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")  # "-" for stdout; the app already logs requests
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+
+def worker_exit(server, worker):
+    app = sys.modules.get("app")  # Not there if the worker failed to import it
+    if app is not None:
+        app.shutdown_services(timeout=min(app.SHUTDOWN_DRAIN_SECONDS, graceful_timeout / 3))
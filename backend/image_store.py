@@ -0,0 +1,258 @@
+"""
+Bounded on-disk storage for uploaded frames
+
+Images are written under <root>/<device_id>/<YYYYMMDD>/ with names made of
+the time in microseconds plus a random suffix, so two cameras (or two
+server processes) never overwrite each other and no directory grows without
+bound. An optional thumbnail tier keeps small copies of the same frames under a
+separate root, usually for much longer than the full images.
+
+Every tier keeps an in-memory index of its files in write order. A
+background thread evicts the oldest files once a tier is over its byte
+budget or its files are older than the tier's maximum age, and removes
+the empty day directories. The index is built by one directory scan when
+the thread starts, so sweeps never walk the tree.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def safe_device_dir(device_id):
+    """Directory name for a device ID (anything outside [A-Za-z0-9_.-] becomes '_')"""
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(device_id or "default")).strip(".")
+    return name[:64] or "default"
+
+
+class _Tier:
+    """Files of one storage tier, oldest first, with their total size"""
+
+    def __init__(self, root, max_bytes, max_age_seconds):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.files = deque()  # (mtime, path, size)
+        self.total_bytes = 0
+        self.evicted = 0
+
+    def scan(self):
+        """Files already on disk, oldest first (read once, at startup)"""
+        found = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+        found.sort()
+        return found
+
+    def merge_scanned(self, found):
+        """Put scanned files in front of the ones written since startup"""
+        known = {path for _, path, _ in self.files}
+        found = [entry for entry in found if entry[1] not in known]
+        self.files = deque(found + list(self.files))
+        self.total_bytes += sum(size for _, _, size in found)
+
+    def add(self, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self.files.append((time.time(), path, size))
+        self.total_bytes += size
+
+    def expired(self, now):
+        """Pop and return the files that are over the age or size budget"""
+        victims = []
+        while self.files:
+            mtime, path, size = self.files[0]
+            too_old = self.max_age_seconds is not None and now - mtime > self.max_age_seconds
+            too_big = self.max_bytes is not None and self.total_bytes > self.max_bytes
+            if not (too_old or too_big):
+                break
+            self.files.popleft()
+            self.total_bytes -= size
+            self.evicted += 1
+            victims.append(path)
+        return victims
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "files": len(self.files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "evicted": self.evicted,
+        }
+
+
+class ImageStore:
+    """
+    Device-scoped image files with size- and age-based eviction
+
+    Args:
+        root: Directory for full-size images
+        max_bytes: Byte budget of the full-size tier (None for unlimited)
+        max_age_days: Delete full-size images older than this (None to keep)
+        thumbnail_root: Directory for the thumbnail tier (None to disable it)
+        thumbnail_width: Thumbnail width in pixels (height keeps the aspect ratio)
+        thumbnail_max_bytes: Byte budget of the thumbnail tier
+        thumbnail_max_age_days: Delete thumbnails older than this
+        sweep_interval: Seconds between eviction sweeps
+    """
+
+    def __init__(self, root, max_bytes=None, max_age_days=None, thumbnail_root=None, thumbnail_width=320,
+                 thumbnail_max_bytes=None, thumbnail_max_age_days=None, sweep_interval=60):
+        self.thumbnail_width = thumbnail_width
+        self.sweep_interval = sweep_interval
+        self._full = _Tier(root, max_bytes, max_age_days * 86400 if max_age_days else None)
+        self._thumbs = None
+        if thumbnail_root:
+            self._thumbs = _Tier(thumbnail_root, thumbnail_max_bytes,
+                                 thumbnail_max_age_days * 86400 if thumbnail_max_age_days else None)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for tier in self._tiers():
+            os.makedirs(tier.root, exist_ok=True)
+
+    def _tiers(self):
+        return [self._full] + ([self._thumbs] if self._thumbs else [])
+
+    def start(self):
+        """Start the background eviction thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="image-sweeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def new_name(self, device_id, extension=".jpg"):
+        """
+        Collision-free relative name for a new frame
+
+        Returns:
+            str: e.g. "cam-1/20250115/103000_123456_9f3a1c.jpg"
+        """
+        now = datetime.now()
+        return "/".join((safe_device_dir(device_id), now.strftime("%Y%m%d"),
+                         f"{now.strftime('%H%M%S_%f')}_{uuid.uuid4().hex[:6]}{extension}"))
+
+    def path(self, name):
+        """Path of a full-size image on disk"""
+        return os.path.join(self._full.root, *name.split("/"))
+
+    def thumbnail_path(self, name):
+        """Path of the thumbnail for an image name (None without a thumbnail tier)"""
+        return os.path.join(self._thumbs.root, *name.split("/")) if self._thumbs else None
+
+    def ensure_dir(self, path):
+        """Create the directory of a file that will be written into this store outside save()"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def save(self, name, image_bytes, img=None):
+        """
+        Write an encoded frame (and its thumbnail, if img is given and the tier is enabled)
+
+        Args:
+            name: Relative name from new_name()
+            image_bytes: The encoded upload, written as-is
+            img: Decoded BGR image used to make the thumbnail
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(image_bytes)
+        thumb_path = None
+        if self._thumbs is not None and img is not None:
+            height, width = img.shape[:2]
+            scale = min(1.0, self.thumbnail_width / width)
+            thumb = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+            thumb_path = self.thumbnail_path(name)
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            cv2.imwrite(thumb_path, thumb, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        with self._lock:
+            self._full.add(path)
+            if thumb_path:
+                self._thumbs.add(thumb_path)
+        return path
+
+    def track(self, path):
+        """Account for a file written elsewhere into the full-size tier (e.g. an annotated image)"""
+        if path and os.path.exists(path):
+            with self._lock:
+                self._full.add(path)
+
+    def sweep(self):
+        """Evict what is over budget or too old; returns the number of files removed"""
+        now = time.time()
+        with self._lock:
+            victims = [(tier.root, path) for tier in self._tiers() for path in tier.expired(now)]
+        for root, path in victims:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("[STORAGE] Could not delete %s: %s", path, e)
+                continue
+            self._remove_empty_dirs(os.path.dirname(path), root)
+        if victims:
+            logger.info("[STORAGE] Evicted %d images", len(victims))
+        return len(victims)
+
+    @staticmethod
+    def _remove_empty_dirs(directory, root):
+        root = os.path.abspath(root)
+        directory = os.path.abspath(directory)
+        if os.path.basename(directory) == datetime.now().strftime("%Y%m%d"):
+            return  # save() may be about to write into today's directory
+        while directory != root and directory.startswith(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return  # Not empty (or already gone)
+            directory = os.path.dirname(directory)
+
+    def _run(self):
+        # Index what earlier runs left on disk here, not in __init__, so a
+        # large directory does not slow down the server's import
+        for tier in self._tiers():
+            found = tier.scan()
+            with self._lock:
+                tier.merge_scanned(found)
+        logger.info("[STORAGE] Indexed %d images (%.1f MB)",
+                    len(self._full.files), self._full.total_bytes / (1024 * 1024))
+        self.sweep()
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("[STORAGE] Sweep failed")
+
+    def stats(self):
+        with self._lock:
+            stats = {"images": self._full.stats()}
+            if self._thumbs is not None:
+                stats["thumbnails"] = self._thumbs.stats()
+            return stats
+
+    def shutdown(self):
+        self._stop.set()
@@ -4,8 +4,219 @@ Utility functions for image processing and validation
 import cv2
 import numpy as np
 from PIL import Image
+import io
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Upload limits shared by path- and buffer-based validation
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MIN_DIMENSION = 50  # pixels
+MAX_DIMENSION = 8192  # pixels per side, checked from the header before decoding
+SNIFF_MAX_BYTES = 256 * 1024  # Stop looking for the JPEG frame header after this many bytes
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageRejected(Exception):
+    """An upload was rejected from its first bytes, before it was fully received or decoded"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _jpeg_size(data):
+    """(width, height) from the JPEG frame header, or None if it is not in data yet"""
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ImageRejected("Corrupt JPEG header")
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # Markers without a length
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ImageRejected("JPEG has no frame header")
+        if marker in JPEG_SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height = int.from_bytes(data[pos + 5:pos + 7], "big")
+            width = int.from_bytes(data[pos + 7:pos + 9], "big")
+            return width, height
+        pos += 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+    return None
+
+
+def sniff_image_header(data):
+    """
+    Format and dimensions of a JPEG or PNG from its first bytes
+    
+    Args:
+        data: The beginning of the encoded image
+    
+    Returns:
+        tuple: (format, width, height), or None if more bytes are needed
+    
+    Raises:
+        ImageRejected: If the bytes are not a JPEG or PNG
+    """
+    if len(data) < 8:
+        if not (PNG_SIGNATURE.startswith(data[:8]) or b"\xff\xd8\xff".startswith(data[:3])):
+            raise ImageRejected("Unsupported image format (expected JPEG or PNG)", 415)
+        return None
+    if data[:3] == b"\xff\xd8\xff":
+        size = _jpeg_size(data)
+        return ("jpeg",) + size if size else None
+    if data[:8] == PNG_SIGNATURE:
+        if len(data) < 24:
+            return None
+        if data[12:16] != b"IHDR":
+            raise ImageRejected("Corrupt PNG header")
+        return "png", int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    raise ImageRejected("Unsupported image format (expected JPEG or PNG)", 415)
+
+
+def check_image_dimensions(width, height):
+    """Reject images that are too small or too large, from their header dimensions"""
+    if width < MIN_DIMENSION or height < MIN_DIMENSION:
+        raise ImageRejected(f"Image is too small (min {MIN_DIMENSION}x{MIN_DIMENSION} pixels)")
+    if width > MAX_DIMENSION or height > MAX_DIMENSION:
+        raise ImageRejected(f"Image dimensions too large (max {MAX_DIMENSION} pixels per side)", 413)
+
+
+class ImageUploadBuffer(io.BytesIO):
+    """
+    In-memory destination for a streamed image upload
+    
+    Werkzeug writes the multipart file part here chunk by chunk. The size
+    limit is enforced as bytes arrive, and the format and dimensions are
+    checked as soon as the header is in, so garbage or huge uploads are
+    rejected before the rest of the body is read or anything is decoded.
+    """
+    
+    def __init__(self, max_size=MAX_FILE_SIZE):
+        super().__init__()
+        self.max_size = max_size
+        self.image_format = None
+        self.image_size = None
+        self._sniffing = True
+    
+    def write(self, data):
+        if self.tell() + len(data) > self.max_size:
+            raise ImageRejected(f"Image file too large (max {self.max_size // (1024 * 1024)}MB)", 413)
+        written = super().write(data)
+        if self._sniffing:
+            self._sniff()
+        return written
+    
+    def _sniff(self):
+        header = self.getvalue()[:SNIFF_MAX_BYTES]
+        result = sniff_image_header(header)
+        if result is None:
+            # Some JPEGs carry large EXIF blocks first; decoding checks those later
+            self._sniffing = len(header) < SNIFF_MAX_BYTES
+            return
+        self.image_format, width, height = result
+        self.image_size = (width, height)
+        self._sniffing = False
+        check_image_dimensions(width, height)
+
+
+def decode_image(data):
+    """
+    Decode raw encoded image bytes (JPEG/PNG) into a BGR array
+    
+    Args:
+        data: Encoded image bytes as received from the client
+    
+    Returns:
+        numpy.ndarray: Decoded BGR image, or None if the bytes are not an image
+    """
+    if not data:
+        return None
+    try:
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    except Exception as e:
+        logger.error("[IMAGE] Could not decode image: %s", e)
+        return None
+
+
+def validate_image_array(img, file_size):
+    """
+    Validate an already decoded image without touching the disk
+    
+    Args:
+        img: Decoded BGR image (numpy array) or None if decoding failed
+        file_size: Size of the encoded image in bytes
+    
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    if file_size == 0:
+        return False, "Image file is empty"
+    
+    if file_size > MAX_FILE_SIZE:
+        return False, "Image file too large (max 10MB)"
+    
+    if img is None:
+        return False, "Could not read image file (invalid format)"
+    
+    # Check image dimensions
+    height, width = img.shape[:2]
+    if width == 0 or height == 0:
+        return False, "Image has invalid dimensions"
+    
+    if width < MIN_DIMENSION or height < MIN_DIMENSION:
+        return False, "Image is too small (min 50x50 pixels)"
+    
+    return True, "Image is valid"
+
+
+def get_image_info_array(img, file_size):
+    """
+    Get information about an already decoded image
+    
+    Args:
+        img: Decoded BGR image (numpy array)
+        file_size: Size of the encoded image in bytes
+    
+    Returns:
+        dict: Image information
+    """
+    try:
+        if img is None:
+            return None
+        
+        height, width = img.shape[:2]
+        channels = img.shape[2] if len(img.shape) > 2 else 1
+        
+        # Calculate image quality metrics
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if channels > 1 else img
+        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        brightness = np.mean(gray)
+        
+        return {
+            "width": width,
+            "height": height,
+            "channels": channels,
+            "file_size_kb": round(file_size / 1024, 2),
+            "sharpness": round(laplacian_var, 2),  # Higher is sharper
+            "brightness": round(brightness, 2),  # 0-255
+            "aspect_ratio": round(width / height, 2)
+        }
+    
+    except Exception as e:
+        logger.error("[IMAGE] Could not get image info: %s", e)
+        return None
+
+
 def validate_image(image_path):
     """
     Validate that the image file is valid and can be processed
@@ -21,29 +232,15 @@ def validate_image(image_path):
         if not os.path.exists(image_path):
             return False, "Image file not found"
         
-        # Check file size
+        # Check file size before decoding anything
         file_size = os.path.getsize(image_path)
-        if file_size == 0:
-            return False, "Image file is empty"
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB limit
-            return False, "Image file too large (max 10MB)"
+        if file_size == 0 or file_size > MAX_FILE_SIZE:
+            return validate_image_array(None, file_size)
         
         # Try to open and read the image
         try:
             img = cv2.imread(image_path)
-            if img is None:
-                return False, "Could not read image file (invalid format)"
-            
-            # Check image dimensions
-            height, width = img.shape[:2]
-            if width == 0 or height == 0:
-                return False, "Image has invalid dimensions"
-            
-            if width < 50 or height < 50:
-                return False, "Image is too small (min 50x50 pixels)"
-            
-            return True, "Image is valid"
+            return validate_image_array(img, file_size)
             
         except Exception as e:
             return False, f"Error reading image: {str(e)}"
@@ -67,27 +264,10 @@ def get_image_info(image_path):
         if img is None:
             return None
         
-        height, width = img.shape[:2]
-        channels = img.shape[2] if len(img.shape) > 2 else 1
-        file_size = os.path.getsize(image_path)
-        
-        # Calculate image quality metrics
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if channels > 1 else img
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        brightness = np.mean(gray)
-        
-        return {
-            "width": width,
-            "height": height,
-            "channels": channels,
-            "file_size_kb": round(file_size / 1024, 2),
-            "sharpness": round(laplacian_var, 2),  # Higher is sharper
-            "brightness": round(brightness, 2),  # 0-255
-            "aspect_ratio": round(width / height, 2)
-        }
+        return get_image_info_array(img, os.path.getsize(image_path))
     
     except Exception as e:
-        print(f"[ERROR] Could not get image info: {str(e)}")
+        logger.error("[IMAGE] Could not get image info: %s", e)
         return None
 
 
@@ -135,6 +315,6 @@ def resize_image(image_path, target_size=(640, 640), maintain_aspect=True):
         return resized_path
     
     except Exception as e:
-        print(f"[ERROR] Could not resize image: {str(e)}")
+        logger.error("[IMAGE] Could not resize image: %s", e)
         return image_path
 
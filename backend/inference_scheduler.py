@@ -0,0 +1,149 @@
+"""
+Micro-batching scheduler for YOLO inference
+
+Frames submitted from concurrent requests are collected for a short window
+and run through the model as a single batched call. Each caller gets a
+Future that resolves to the result for its own frame.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class _InferenceRequest:
+    """A single frame waiting to be batched"""
+    __slots__ = ("image", "min_confidence", "future", "enqueued_at")
+
+    def __init__(self, image, min_confidence):
+        self.image = image
+        self.min_confidence = min_confidence
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchInferenceScheduler:
+    """
+    Collects frames for up to max_wait_ms (or until max_batch_size frames are
+    queued) and runs them through predict_fn in one call.
+
+    predict_fn(images, min_confidence) must return one result per image, in
+    order. The batch runs at the lowest confidence threshold of its members,
+    so callers are expected to re-apply their own threshold to the result.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=20, max_queue_size=0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._batch_histogram = {}  # batch size -> number of batches
+        self._total_batches = 0
+        self._total_frames = 0
+        self._total_errors = 0
+        self._total_wait_ms = 0.0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, min_confidence):
+        """
+        Queue a frame for inference
+
+        Args:
+            image: Decoded BGR image (numpy array)
+            min_confidence: Confidence threshold requested by the caller
+
+        Returns:
+            Future: Resolves to the model result for this frame
+        """
+        if not self._running:
+            raise RuntimeError("Inference scheduler is shut down")
+        request = _InferenceRequest(image, min_confidence)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, image, min_confidence, timeout=None):
+        """Submit a frame and block until its result is available"""
+        return self.submit(image, min_confidence).result(timeout=timeout)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Shutdown sentinel: finish this batch, then stop
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+            self._process(batch)
+            if not self._running and self._queue.empty():
+                break
+
+    def _process(self, batch):
+        started = time.monotonic()
+        min_confidence = min(r.min_confidence for r in batch)
+        try:
+            results = self.predict_fn([r.image for r in batch], min_confidence)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} frames")
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+        except Exception as e:
+            logger.error("[BATCH] Batched inference failed: %s", e)
+            with self._stats_lock:
+                self._total_errors += 1
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+        with self._stats_lock:
+            size = len(batch)
+            self._batch_histogram[size] = self._batch_histogram.get(size, 0) + 1
+            self._total_batches += 1
+            self._total_frames += size
+            self._total_wait_ms += sum((started - r.enqueued_at) * 1000.0 for r in batch)
+
+    def queue_depth(self):
+        """Number of frames waiting to be batched"""
+        return self._queue.qsize()
+
+    def stats(self):
+        """Return queue depth and batch-size statistics"""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "total_batches": self._total_batches,
+                "total_frames": self._total_frames,
+                "total_errors": self._total_errors,
+                "avg_batch_size": round(self._total_frames / self._total_batches, 2) if self._total_batches else 0,
+                "avg_queue_wait_ms": round(self._total_wait_ms / self._total_frames, 2) if self._total_frames else 0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_histogram.items())},
+            }
+
+    def shutdown(self, timeout=None):
+        """Stop accepting frames and finish everything already queued"""
+        if self._running:
+            self._running = False
+            self._queue.put(None)
+        self._thread.join(timeout=timeout)
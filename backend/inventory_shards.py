@@ -0,0 +1,237 @@
+"""
+Per-fridge inventory shards
+
+Every fridge has its own InventoryStore (and therefore its own lock,
+revision counter and change log) and its own JSON file under the data
+directory. Shards are loaded from disk on first access, so a process can
+serve many fridges while only touching the ones that are in use. Writers
+on one fridge never wait for another.
+
+A background thread saves shards whose revision moved since their last
+save, so request handlers never write files. Aggregate queries combine
+the loaded shards' snapshots with the saved files of the others, which are
+read for the query only and not kept in memory.
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+from inventory_store import InventoryStore, normalize_name
+
+logger = logging.getLogger(__name__)
+
+FRIDGE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class InvalidFridgeError(ValueError):
+    """A fridge ID that cannot be used (it also names the shard's file)"""
+
+
+def check_fridge_id(fridge_id):
+    """Return fridge_id if it is valid, raise InvalidFridgeError otherwise"""
+    if not isinstance(fridge_id, str) or not FRIDGE_ID_PATTERN.match(fridge_id) or fridge_id.strip(".") == "":
+        raise InvalidFridgeError("fridge_id must be 1-64 characters of A-Z, a-z, 0-9, '_', '-' or '.'")
+    return fridge_id
+
+
+def _quantity(item):
+    try:
+        return float(item.get("quantity", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _number(value):
+    return int(value) if float(value).is_integer() else value
+
+
+class _Shard:
+    __slots__ = ("store", "lock", "saved_revision")
+
+    def __init__(self):
+        self.store = None
+        self.lock = threading.Lock()  # Serializes loading and saving of this shard only
+        self.saved_revision = None
+
+
+class FridgeInventories:
+    """
+    Lazily loaded InventoryStore per fridge, persisted to <data_dir>/<fridge_id>.json
+
+    Args:
+        data_dir: Directory for the shard files
+        flush_interval: Seconds between background saves of changed shards
+    """
+
+    def __init__(self, data_dir, flush_interval=2.0):
+        self.data_dir = data_dir
+        self.flush_interval = flush_interval
+        self._shards = {}  # fridge_id -> _Shard
+        self._lock = threading.Lock()  # Guards only the _shards dict
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(data_dir, exist_ok=True)
+
+    def _path(self, fridge_id):
+        return os.path.join(self.data_dir, f"{fridge_id}.json")
+
+    def get(self, fridge_id):
+        """
+        The fridge's InventoryStore, loaded from its file on first use
+        (an empty one for a new fridge)
+
+        Raises:
+            InvalidFridgeError: If fridge_id is not a valid ID
+        """
+        with self._lock:
+            shard = self._shards.get(fridge_id)
+            if shard is None:
+                check_fridge_id(fridge_id)
+                shard = self._shards[fridge_id] = _Shard()
+        if shard.store is None:
+            with shard.lock:
+                if shard.store is None:
+                    shard.store = self._load(fridge_id)
+                    shard.saved_revision = shard.store.revision
+        return shard.store
+
+    def _read(self, fridge_id):
+        """
+        The shard's saved (revision, items); (None, []) if it has no readable file
+        """
+        path = self._path(fridge_id)
+        if not os.path.exists(path):
+            return None, []
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error("[INVENTORY] Could not load %s: %s", path, e)
+            return None, []
+        return data.get("revision"), data.get("items", [])
+
+    def _load(self, fridge_id):
+        items = self._read(fridge_id)[1]
+        if items:
+            logger.info("[INVENTORY] Loaded fridge %s (%d items)", fridge_id, len(items))
+        return InventoryStore(items)
+
+    def _versioned_items(self, fridge_id):
+        """
+        (revision, items) of a fridge, from memory if its shard is loaded and
+        from its file otherwise (without loading the shard)
+        """
+        with self._lock:
+            shard = self._shards.get(fridge_id)
+        store = shard.store if shard is not None else None
+        if store is not None:
+            return store.versioned_items()
+        return self._read(fridge_id)
+
+    def exists(self, fridge_id):
+        """True if the fridge is loaded or has a saved shard"""
+        with self._lock:
+            if fridge_id in self._shards:
+                return True
+        return os.path.exists(self._path(fridge_id))
+
+    def fridge_ids(self):
+        """Every known fridge: loaded ones and ones saved on disk"""
+        with self._lock:
+            ids = set(self._shards)
+        for name in os.listdir(self.data_dir):
+            if name.endswith(".json") and FRIDGE_ID_PATTERN.match(name[:-5]):
+                ids.add(name[:-5])
+        return sorted(ids)
+
+    def aggregate(self, category=None):
+        """
+        Items summed by name across all fridges
+
+        Returns:
+            list: {"name", "category", "quantity", "fridges": {fridge_id: quantity}}
+        """
+        totals = {}
+        for fridge_id in self.fridge_ids():
+            for item in self._versioned_items(fridge_id)[1]:
+                if category and item.get("category", "other") != category:
+                    continue
+                key = normalize_name(item["name"])
+                entry = totals.get(key)
+                if entry is None:
+                    entry = totals[key] = {"name": item["name"], "category": item.get("category", "other"),
+                                           "quantity": 0, "fridges": {}}
+                quantity = _quantity(item)
+                entry["quantity"] += quantity
+                entry["fridges"][fridge_id] = quantity
+        for entry in totals.values():
+            entry["quantity"] = _number(entry["quantity"])
+            entry["fridges"] = {fridge_id: _number(value) for fridge_id, value in entry["fridges"].items()}
+        return list(totals.values())
+
+    def summary(self):
+        """Per-fridge item count, total quantity and revision"""
+        fridges = []
+        for fridge_id in self.fridge_ids():
+            revision, items = self._versioned_items(fridge_id)
+            fridges.append({
+                "fridge_id": fridge_id,
+                "items": len(items),
+                "total_quantity": _number(sum(_quantity(item) for item in items)),
+                "revision": revision,
+            })
+        return fridges
+
+    # -- persistence -----------------------------------------------------------
+
+    def _save(self, fridge_id, shard):
+        with shard.lock:
+            revision, items = shard.store.versioned_items()
+            if revision == shard.saved_revision:
+                return False
+            path = self._path(fridge_id)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"fridge_id": fridge_id, "revision": revision, "items": items}, f)
+            os.replace(tmp_path, path)
+            shard.saved_revision = revision
+            return True
+
+    def flush(self):
+        """Save every shard that changed since its last save; returns how many were written"""
+        with self._lock:
+            shards = [(fridge_id, shard) for fridge_id, shard in self._shards.items() if shard.store is not None]
+        saved = 0
+        for fridge_id, shard in shards:
+            try:
+                saved += self._save(fridge_id, shard)
+            except Exception as e:
+                logger.error("[INVENTORY] Could not save fridge %s: %s", fridge_id, e)
+        return saved
+
+    def start(self):
+        """Start the background saver"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inventory-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def shutdown(self):
+        """Stop the saver and write what is still unsaved"""
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            loaded = [shard for shard in self._shards.values() if shard.store is not None]
+        return {
+            "loaded_fridges": len(loaded),
+            "items": sum(len(shard.store) for shard in loaded),
+            "unsaved_fridges": sum(1 for shard in loaded if shard.store.revision != shard.saved_revision),
+        }
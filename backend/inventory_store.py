@@ -0,0 +1,263 @@
+"""
+Thread-safe in-memory inventory
+
+Items are indexed by case-normalized name (O(1) upsert/delete/lookup) with a
+secondary index per category. Writers serialize on a lock; readers get an
+immutable snapshot that is rebuilt at most once per change and never wait
+behind a running merge.
+
+Every change bumps a monotonically increasing revision. A change log keeps
+the latest revision per item (plus bounded tombstones for deletions) so
+clients can fetch only what changed since the revision they last saw.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Deleted names remembered for delta sync; older clients get a full resync
+MAX_TOMBSTONES = 1000
+
+
+def normalize_name(name):
+    """Key used for the name index ("  Apple " and "apple" are the same item)"""
+    return str(name).strip().lower()
+
+
+class InventoryStore:
+    """Inventory items keyed by normalized name, in insertion order"""
+
+    def __init__(self, items=None):
+        self._lock = threading.Lock()
+        self._items = {}  # normalized name -> item dict
+        self._categories = {}  # category -> set of normalized names
+        # Revisions start at the process start time (ms) so they keep increasing
+        # across restarts and stale client revisions always fall below the floor
+        self._revision = int(time.time() * 1000)
+        self._published = (self._revision, ())  # last published (revision, tuple of item copies)
+        self._dirty = False
+        self._change_log = OrderedDict()  # normalized name -> revision of its last change, oldest first
+        self._tombstones = {}  # normalized name -> display name of deleted items
+        self._floor_revision = self._revision  # deltas since a revision below this need a full resync
+        if items:
+            self.load(items)
+
+    # -- internal helpers (caller holds self._lock) -----------------------
+
+    def _index_category(self, key, old_category, new_category):
+        if old_category == new_category:
+            return
+        if old_category is not None:
+            keys = self._categories.get(old_category)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._categories[old_category]
+        if new_category is not None:
+            self._categories.setdefault(new_category, set()).add(key)
+
+    def _put(self, item):
+        key = normalize_name(item["name"])
+        existing = self._items.get(key)
+        old_category = existing.get("category", "other") if existing else None
+        if existing is None:
+            self._items[key] = item
+        else:
+            existing.update(item)
+            item = existing
+        self._index_category(key, old_category, item.get("category", "other"))
+        self._record_change(key)
+        return item, existing is None
+
+    def _record_change(self, key):
+        self._revision += 1
+        self._change_log[key] = self._revision
+        self._change_log.move_to_end(key)
+        self._tombstones.pop(key, None)
+        self._dirty = True
+
+    def _record_delete(self, key, name):
+        self._record_change(key)
+        self._tombstones[key] = name
+        while len(self._tombstones) > MAX_TOMBSTONES:
+            oldest = next(iter(self._tombstones))
+            self._floor_revision = max(self._floor_revision, self._change_log.pop(oldest))
+            del self._tombstones[oldest]
+
+    def _publish(self):
+        self._published = (self._revision, tuple(dict(item) for item in self._items.values()))
+        self._dirty = False
+        return self._published
+
+    # -- writers ---------------------------------------------------------------
+
+    def load(self, items):
+        """Replace the whole inventory (used at startup)"""
+        with self._lock:
+            self._items = {}
+            self._categories = {}
+            self._change_log.clear()
+            self._tombstones.clear()
+            for item in items:
+                self._put(dict(item))
+            self._floor_revision = self._revision
+            self._publish()
+
+    def upsert(self, item):
+        """
+        Insert an item or update the existing one with the same name
+
+        Returns:
+            tuple: (copy of the stored item, True if it was newly added, revision of the change)
+        """
+        with self._lock:
+            stored, created = self._put(dict(item))
+            return dict(stored), created, self._revision
+
+    def merge_detections(self, new_items):
+        """
+        Merge one frame's detections: existing items take the latest count and
+        detection info, unknown items are added (unless their quantity is 0)
+
+        Returns:
+            tuple: (list of updated item copies, list of added item copies, revision)
+        """
+        updated, added = [], []
+        with self._lock:
+            for new_item in new_items:
+                key = normalize_name(new_item["name"])
+                existing = self._items.get(key)
+                if existing is not None:
+                    self._put({
+                        "name": existing["name"],
+                        "quantity": new_item["quantity"],  # Update to latest count
+                        "last_detected": new_item.get("last_detected", datetime.now().isoformat()),
+                        "confidence": new_item.get("confidence", 0.0),
+                        "status": new_item.get("status", "Detected"),
+                    })
+                    updated.append(dict(existing))
+                elif new_item["quantity"] > 0:
+                    stored, _ = self._put(dict(new_item))
+                    added.append(dict(stored))
+            revision = self._revision
+        return updated, added, revision
+
+    def update(self, name, fields):
+        """
+        Update fields of an existing item
+
+        Returns:
+            tuple: (updated copy or None if not found, current revision)
+        """
+        with self._lock:
+            existing = self._items.get(normalize_name(name))
+            if existing is None:
+                return None, self._revision
+            stored, _ = self._put(dict(fields, name=existing["name"]))
+            return dict(stored), self._revision
+
+    def delete(self, name):
+        """
+        Remove an item by name
+
+        Returns:
+            tuple: (removed item or None if not found, current revision)
+        """
+        with self._lock:
+            key = normalize_name(name)
+            item = self._items.pop(key, None)
+            if item is None:
+                return None, self._revision
+            self._index_category(key, item.get("category", "other"), None)
+            self._record_delete(key, item["name"])
+            return item, self._revision
+
+    # -- readers ---------------------------------------------------------------
+
+    def _current(self):
+        """
+        Latest published (revision, snapshot)
+
+        Rebuilt lazily after a change. If a writer currently holds the lock the
+        previously published snapshot is returned instead of waiting.
+        """
+        if not self._dirty:
+            return self._published
+        if not self._lock.acquire(blocking=False):
+            return self._published
+        try:
+            if self._dirty:
+                return self._publish()
+            return self._published
+        finally:
+            self._lock.release()
+
+    def snapshot(self):
+        """Immutable view of all items"""
+        return self._current()[1]
+
+    def items(self):
+        """All items as a list (JSON-serializable)"""
+        return list(self.snapshot())
+
+    def versioned_items(self):
+        """
+        All items together with the revision they reflect
+
+        Returns:
+            tuple: (revision, list of items)
+        """
+        revision, snapshot = self._current()
+        return revision, list(snapshot)
+
+    @property
+    def revision(self):
+        """Revision of the latest change"""
+        return self._revision
+
+    def changes_since(self, since):
+        """
+        Items added/updated and names deleted after revision `since`
+
+        Returns:
+            dict: {"revision", "full", "upserted", "deleted"}; when "full" is
+            True the log no longer reaches back to `since` and the caller must
+            refetch the whole inventory
+        """
+        with self._lock:
+            if since < self._floor_revision or since > self._revision:
+                return {"revision": self._revision, "full": True, "upserted": [], "deleted": []}
+            upserted, deleted = [], []
+            for key in reversed(self._change_log):
+                if self._change_log[key] <= since:
+                    break
+                if key in self._tombstones:
+                    deleted.append(self._tombstones[key])
+                else:
+                    upserted.append(dict(self._items[key]))
+            upserted.reverse()
+            deleted.reverse()
+            return {"revision": self._revision, "full": False, "upserted": upserted, "deleted": deleted}
+
+    def get(self, name):
+        """Copy of a single item, or None"""
+        with self._lock:
+            item = self._items.get(normalize_name(name))
+            return dict(item) if item is not None else None
+
+    def by_category(self, category):
+        """Items in one category (uses the category index)"""
+        with self._lock:
+            keys = self._categories.get(category, ())
+            return [dict(self._items[key]) for key in keys]
+
+    def categories(self):
+        """Category -> number of items"""
+        with self._lock:
+            return {category: len(keys) for category, keys in self._categories.items()}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._items
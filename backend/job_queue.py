@@ -0,0 +1,173 @@
+"""
+Bounded background job queue for asynchronous upload processing
+
+/upload hands accepted frames to a JobQueue and returns a job ID right away;
+a fixed pool of worker threads runs detection and stores the result, which
+clients fetch (or long-poll) from /jobs/<id>.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class Job:
+    """State of a single background job"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.finished_monotonic = None
+        self._done = threading.Event()
+
+    def to_dict(self):
+        status = self.status
+        data = {
+            "job_id": self.id,
+            "status": status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if status == "done":
+            data["result"] = self.result
+        elif status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Fixed-size worker pool fed by a bounded queue
+
+    Finished jobs are kept for result_ttl seconds (and at most max_results
+    of them) so clients have time to collect their results.
+    """
+
+    def __init__(self, num_workers=2, max_queue_size=32, result_ttl=300, max_results=1000):
+        self.max_queue_size = max_queue_size
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._jobs = {}
+        self._finished_order = []
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._closed = False
+        self._workers = []
+        for i in range(max(1, int(num_workers))):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for background execution
+
+        Returns:
+            str: Job ID
+
+        Raises:
+            QueueFullError: If the queue is at capacity (caller should answer 429)
+        """
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            if self._closed:
+                self._rejected += 1
+                raise QueueFullError("Job queue is shutting down")
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait((job, fn, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self._rejected += 1
+            raise QueueFullError("Job queue is full")
+        return job.id
+
+    def get(self, job_id):
+        """Return the Job for job_id, or None if unknown or expired"""
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Block up to timeout seconds for a job to finish (long-poll)"""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            job._done.wait(timeout)
+        return job
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting jobs and wait for the queued and running ones to finish
+
+        Returns:
+            bool: False if jobs were still unfinished when timeout expired
+        """
+        with self._lock:
+            self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _work(self):
+        while True:
+            job, fn, args, kwargs = self._queue.get()
+            job.status = "running"
+            result, error, status = None, None, "done"
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                logger.error("[JOB] Job %s failed: %s", job.id, e)
+                error, status = str(e), "failed"
+            with self._lock:
+                # Status last, so a reader that sees "done" also sees the result
+                job.result = result
+                job.error = error
+                job.finished_at = datetime.now().isoformat()
+                job.finished_monotonic = time.monotonic()
+                job.status = status
+                self._finished_order.append(job.id)
+            job._done.set()
+            self._queue.task_done()
+
+    def _expire(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        while self._finished_order:
+            oldest = self._jobs.get(self._finished_order[0])
+            too_many = len(self._finished_order) > self.max_results
+            if oldest is not None and not too_many and now - oldest.finished_monotonic < self.result_ttl:
+                break
+            self._jobs.pop(self._finished_order.pop(0), None)
+
+    def stats(self):
+        """Return queue depth and job counts"""
+        with self._lock:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "workers": len(self._workers),
+                "pending_jobs": pending,
+                "stored_results": len(self._finished_order),
+                "rejected": self._rejected,
+            }
@@ -0,0 +1,202 @@
+"""
+Prometheus-style metrics: counters, callback gauges and latency histograms
+
+Pipeline stages are timed with span():
+
+    with span("inference"):
+        ...
+
+Every span is recorded in the stage_duration_seconds histogram. While a
+trace() is active on the current thread, the span is also added to that
+trace, so one request's per-stage breakdown can be logged.
+render() returns everything in the Prometheus text exposition format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Value read from a callback at scrape time (e.g. a queue depth)"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read_fn):
+        self.name = name
+        self.help = help_text
+        self.read_fn = read_fn
+
+    def samples(self):
+        try:
+            value = self.read_fn()
+        except Exception:
+            return []
+        return [] if value is None else [(self.name, (), value)]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        samples = []
+        for key, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", repr(float(bound))),), cumulative))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series[-1]))
+            samples.append((f"{self.name}_sum", key, series[-2]))
+            samples.append((f"{self.name}_count", key, series[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def gauge(self, name, help_text, read_fn):
+        """Register (or replace) a gauge whose value comes from read_fn()"""
+        with self._lock:
+            self._metrics[name] = Gauge(name, help_text, read_fn)
+            return self._metrics[name]
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "stage_duration_seconds", "Time spent in each upload/detection pipeline stage")
+
+_local = threading.local()
+
+
+@contextmanager
+def span(stage):
+    """Time a pipeline stage into stage_duration_seconds (and the active trace, if any)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+@contextmanager
+def trace():
+    """
+    Collect the spans recorded on this thread
+
+    Nested traces share the outermost list, so a synchronous upload yields
+    one trace covering both the request handler and detection.
+
+    Yields:
+        list: (stage, seconds) tuples in the order the stages finished
+    """
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        yield spans
+        return
+    _local.spans = spans = []
+    try:
+        yield spans
+    finally:
+        _local.spans = None
+
+
+def format_trace(spans):
+    """'receive=1.2ms decode=3.4ms ...' for log lines"""
+    return " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in spans)
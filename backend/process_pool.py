@@ -0,0 +1,398 @@
+"""
+Multi-process YOLO inference with shared-memory frame handoff
+
+Each worker process builds its own detector (see detectors.py) once and
+owns one shared-memory input slot. The parent copies a decoded frame straight into an idle worker's slot
+and sends only (task id, shape, threshold) over a pipe, so pixels are never
+pickled. Workers send back the raw detection arrays (class IDs,
+confidences, boxes), which are small.
+
+A monitor thread restarts workers that die or hang, failing the frame they
+were working on, with exponential backoff between restarts. A worker that
+never manages to load its detector is given up after max_load_failures
+attempts; once every worker has given up, the pool is failed and
+wait_ready() raises the load error. A frame waits at most acquire_timeout
+seconds for a free worker, so requests fail fast instead of hanging while
+workers restart. Workers can be pinned to CPU cores.
+
+Workers are forked by default, so create the pool before the process starts
+any threads or runs the model itself (detect_items does this at import
+time). With the "spawn" start method every worker re-imports the main
+module, which for app.py means repeating its whole start-up.
+"""
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest frame a slot can hold (height, width, channels); bigger frames are downscaled to fit
+MAX_FRAME_SHAPE = (2160, 3840, 3)
+RESTART_BACKOFF_SECONDS = 0.5  # Delay before restarting a worker, doubled per consecutive crash
+MAX_RESTART_BACKOFF_SECONDS = 60
+WATCH_INTERVAL_SECONDS = 0.5
+
+
+class WorkerCrashedError(RuntimeError):
+    """The worker handling a frame died or timed out"""
+
+
+class PoolUnavailableError(RuntimeError):
+    """No worker could take a frame (all dead, restarting or busy for too long)"""
+
+
+class PoolLoadError(PoolUnavailableError):
+    """No worker could load its detector"""
+
+
+def _worker_main(index, detector_factory, slot_name, task_conn, result_queue, core, threads):
+    """Entry point of a worker process"""
+    if threads:
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(threads)
+        cv2.setNumThreads(threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            logger.warning("[POOL] Worker %d could not pin to core %s: %s", index, core, e)
+
+    slot = shared_memory.SharedMemory(name=slot_name)
+    try:
+        detector = detector_factory()
+        detector.warm_up()
+    except Exception as e:
+        result_queue.put(("failed", index, None, f"{type(e).__name__}: {e}"))
+        slot.close()
+        raise SystemExit(1)
+    result_queue.put(("ready", index, None, dict(detector.names)))
+
+    try:
+        while True:
+            message = task_conn.recv()
+            if message is None:
+                break
+            task_id, shape, min_confidence = message
+            try:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=slot.buf)
+                payload = detector.predict([frame], min_confidence)[0]
+                del frame
+                result_queue.put(("result", index, task_id, payload))
+            except Exception as e:
+                result_queue.put(("error", index, task_id, str(e)))
+    finally:
+        slot.close()
+
+
+class _Worker:
+    def __init__(self, index, core):
+        self.index = index
+        self.core = core
+        self.process = None
+        self.conn = None
+        self.slot = None
+        self.ready = False
+        self.loaded = False  # Has been ready at least once
+        self.task = None  # (task_id, future, started monotonic, box scale) while busy
+        self.restarts = 0
+        self.crashes = 0  # Consecutive, reset when the worker reports ready
+        self.restart_at = None  # Monotonic time of the pending restart
+        self.load_error = None
+        self.failed = False  # Gave up after max_load_failures
+        self.completed = 0
+
+
+class InferenceProcessPool:
+    """
+    Pool of detection worker processes
+
+    predict(img, min_confidence) returns (cls, conf, xyxy) arrays for one
+    frame, blocking until a worker is free and has finished it.
+    """
+
+    def __init__(self, detector_factory, num_workers=None, pin_cores=True, threads_per_worker=1,
+                 task_timeout=30, max_frame_shape=MAX_FRAME_SHAPE, start_method="fork", max_load_failures=3,
+                 acquire_timeout=None):
+        self.detector_factory = detector_factory
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.pin_cores = pin_cores
+        self.threads_per_worker = threads_per_worker
+        self.task_timeout = task_timeout
+        self.max_frame_shape = max_frame_shape
+        self.slot_size = int(np.prod(max_frame_shape))
+        self.max_load_failures = max_load_failures
+        self.acquire_timeout = task_timeout if acquire_timeout is None else acquire_timeout
+        self.names = None
+        self.error = None  # Load error once every worker has given up
+
+        self._ctx = mp.get_context(start_method)
+        self._results = self._ctx.Queue()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._running = True
+        self._settled = threading.Event()  # Set when a worker is ready or the pool has failed
+
+        cores = self._available_cores()
+        self._workers = []
+        for i in range(self.num_workers):
+            core = cores[i % len(cores)] if (pin_cores and cores) else None
+            worker = _Worker(i, core)
+            worker.slot = shared_memory.SharedMemory(create=True, size=self.slot_size)
+            self._workers.append(worker)
+            self._start_worker(worker)
+
+        self._collector = threading.Thread(target=self._collect, name="pool-collector", daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._watch, name="pool-monitor", daemon=True)
+        self._monitor.start()
+
+    @staticmethod
+    def _available_cores():
+        if hasattr(os, "sched_getaffinity"):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    def _start_worker(self, worker):
+        parent_conn, child_conn = self._ctx.Pipe()
+        worker.conn = parent_conn
+        worker.ready = False
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, self.detector_factory, worker.slot.name, child_conn, self._results,
+                  worker.core, self.threads_per_worker),
+            name=f"detector-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        child_conn.close()
+        logger.info("[POOL] Started worker %d (pid %d, core %s)", worker.index, worker.process.pid, worker.core)
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until at least one worker has loaded and warmed up its detector
+
+        Returns:
+            bool: False if timeout expired first
+
+        Raises:
+            PoolLoadError: If no worker could load its detector
+        """
+        self._settled.wait(timeout)
+        if self.error is not None:
+            raise PoolLoadError(self.error)
+        return self.names is not None
+
+    def _fit(self, img):
+        """Downscale frames larger than a slot; returns (frame, factor to map boxes back)"""
+        if img.nbytes <= self.slot_size:
+            return np.ascontiguousarray(img), 1.0
+        scale = (self.slot_size / img.nbytes) ** 0.5
+        height, width = img.shape[:2]
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        frame = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        return frame, width / size[0]
+
+    def _acquire(self):
+        """
+        Wait up to acquire_timeout for an idle worker
+
+        Raises:
+            PoolLoadError: If the pool has failed (also while waiting)
+            PoolUnavailableError: If no worker became idle in time
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            if not self._running:
+                raise RuntimeError("Inference pool is shut down")
+            if self.error is not None:
+                raise PoolLoadError(self.error)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PoolUnavailableError(f"No inference worker available after {self.acquire_timeout}s")
+            try:
+                return self._idle.get(timeout=min(remaining, WATCH_INTERVAL_SECONDS))
+            except queue.Empty:
+                continue
+
+    def submit(self, img, min_confidence):
+        """
+        Copy a frame into an idle worker's slot and queue it; returns a Future
+
+        Raises:
+            PoolUnavailableError: If no worker is free within acquire_timeout
+                                  (PoolLoadError if the pool has failed)
+        """
+        if img.dtype != np.uint8:
+            raise ValueError(f"Expected a uint8 frame, got {img.dtype}")
+        frame, scale = self._fit(img)
+        worker = self._acquire()
+        future = Future()
+        task_id = next(self._task_ids)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=worker.slot.buf)[...] = frame
+        with self._lock:
+            worker.task = (task_id, future, time.monotonic(), scale)
+        try:
+            worker.conn.send((task_id, frame.shape, float(min_confidence)))
+        except (BrokenPipeError, OSError) as e:
+            with self._lock:
+                worker.task = None
+            future.set_exception(WorkerCrashedError(f"Worker {worker.index} unavailable: {e}"))
+        return future
+
+    def predict(self, img, min_confidence, timeout=None):
+        return self.submit(img, min_confidence).result(timeout=timeout)
+
+    def _finish(self, worker, task_id):
+        """Detach the worker's task if it matches task_id; returns it"""
+        with self._lock:
+            task = worker.task
+            if task is None or task[0] != task_id:
+                return None
+            worker.task = None
+            worker.completed += 1
+        self._idle.put(worker)
+        return task
+
+    def _collect(self):
+        while self._running:
+            try:
+                kind, index, task_id, payload = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            worker = self._workers[index]
+            if kind == "ready":
+                if self.names is None:
+                    self.names = payload
+                worker.ready = worker.loaded = True
+                worker.crashes = 0
+                self._idle.put(worker)
+                self._settled.set()
+                continue
+            if kind == "failed":
+                worker.load_error = payload
+                logger.error("[POOL] Worker %d could not load its detector: %s", index, payload)
+                continue
+            task = self._finish(worker, task_id)
+            if task is None:
+                continue
+            future, scale = task[1], task[3]
+            if kind == "result":
+                cls, conf, xyxy = payload
+                future.set_result((cls, conf, xyxy * scale if scale != 1.0 else xyxy))
+            else:
+                future.set_exception(RuntimeError(f"Worker {index} inference failed: {payload}"))
+
+    def _watch(self):
+        while self._running:
+            time.sleep(WATCH_INTERVAL_SECONDS)
+            for worker in self._workers:
+                if not self._running:
+                    return
+                if worker.failed:
+                    continue
+                if worker.restart_at is not None:
+                    if time.monotonic() >= worker.restart_at:
+                        worker.restart_at = None
+                        worker.restarts += 1
+                        self._start_worker(worker)
+                    continue
+                with self._lock:
+                    task = worker.task
+                hung = task is not None and time.monotonic() - task[2] > self.task_timeout
+                if worker.process.is_alive() and not hung:
+                    continue
+                self._handle_exit(worker, hung)
+
+    def _handle_exit(self, worker, hung):
+        """Fail the dead worker's frame and schedule its restart (or give up on it)"""
+        reason = "timed out" if hung else f"exited with code {worker.process.exitcode}"
+        if hung:
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.ready = False
+        with self._lock:
+            task = worker.task
+            worker.task = None
+        if task is not None:
+            task[1].set_exception(WorkerCrashedError(f"Worker {worker.index} {reason}"))
+        self._drain_idle(worker)
+
+        worker.crashes += 1
+        if not worker.loaded and worker.crashes >= self.max_load_failures:
+            worker.failed = True
+            logger.error("[POOL] Worker %d %s; giving up after %d failed loads",
+                         worker.index, reason, worker.crashes)
+            if all(w.failed for w in self._workers):
+                self.error = worker.load_error or f"Worker {worker.index} {reason}"
+                self._settled.set()
+            return
+        delay = min(RESTART_BACKOFF_SECONDS * 2 ** (worker.crashes - 1), MAX_RESTART_BACKOFF_SECONDS)
+        logger.warning("[POOL] Worker %d %s, restarting in %.1fs", worker.index, reason, delay)
+        worker.restart_at = time.monotonic() + delay
+
+    def _drain_idle(self, dead_worker):
+        """Remove a dead worker from the idle queue (it re-enters when it reports ready)"""
+        kept = []
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not dead_worker:
+                kept.append(worker)
+        for worker in kept:
+            self._idle.put(worker)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "error": self.error,
+                "idle": self._idle.qsize(),
+                "busy": sum(1 for w in self._workers if w.task is not None),
+                "workers_detail": [{
+                    "index": w.index,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": bool(w.process and w.process.is_alive()),
+                    "ready": w.ready,
+                    "failed": w.failed,
+                    "core": w.core,
+                    "restarts": w.restarts,
+                    "completed": w.completed,
+                } for w in self._workers],
+            }
+
+    def shutdown(self, timeout=5):
+        """Stop workers and release shared memory"""
+        self._running = False
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.slot.close()
+            try:
+                worker.slot.unlink()
+            except FileNotFoundError:
+                pass
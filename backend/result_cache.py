@@ -0,0 +1,150 @@
+"""
+Content-addressed cache of detection results
+
+Keys are the SHA-256 of the uploaded bytes plus the detection parameters, so
+a retried or re-uploaded image returns the stored result without running
+the model. Entries are bounded (LRU), expire after a TTL and are dropped as
+a whole when the model changes. The cache can be saved to disk and reloaded
+on the next start.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    """Hex SHA-256 of the encoded image bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(image_hash, min_confidence, filter_food, preprocess_mode, tiling, roi=None):
+    """
+    Cache key: image content plus every parameter that changes the result
+
+    Args:
+        preprocess_mode, tiling: The modes actually used (see detect_items.resolve_modes),
+                                 not the request's possibly empty overrides
+        roi: regions_key() of the camera's regions, if any
+    """
+    key = f"{image_hash}:{float(min_confidence):.4f}:{int(bool(filter_food))}:{preprocess_mode}:tiling={tiling}"
+    if roi:
+        key += f":roi={roi}"
+    return key
+
+
+class DetectionResultCache:
+    """Thread-safe LRU cache with TTL, model invalidation and optional persistence"""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, model_id=None, persist_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.model_id = model_id
+        self.persist_path = persist_path
+        self._entries = OrderedDict()  # key -> (stored_at wall time, items)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        if persist_path:
+            self.load()
+
+    def get(self, key):
+        """Return a copy of the cached items for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            stored_at, items = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return [dict(item) for item in items]
+
+    def put(self, key, items):
+        with self._lock:
+            self._entries[key] = (time.time(), [dict(item) for item in items])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def set_model_id(self, model_id):
+        """Drop every entry if the model has changed"""
+        with self._lock:
+            if model_id != self.model_id:
+                if self._entries:
+                    logger.info("[CACHE] Model changed, dropping %d cached results", len(self._entries))
+                self._entries.clear()
+                self.model_id = model_id
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self):
+        """Write the cache to persist_path (atomic replace)"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            data = {
+                "model_id": self.model_id,
+                "entries": [[key, stored_at, items] for key, (stored_at, items) in self._entries.items()],
+            }
+        tmp_path = self.persist_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.persist_path)
+            logger.info("[CACHE] Saved %d cached results to %s", len(data['entries']), self.persist_path)
+        except Exception as e:
+            logger.error("[CACHE] Could not save cache: %s", e)
+
+    def load(self):
+        """Load persisted entries that belong to the current model and are not expired"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error("[CACHE] Could not load cache: %s", e)
+            return
+        if data.get("model_id") != self.model_id:
+            logger.info("[CACHE] Persisted cache belongs to a different model, ignoring it")
+            return
+        now = time.time()
+        with self._lock:
+            for key, stored_at, items in data.get("entries", []):
+                if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                    continue
+                self._entries[key] = (stored_at, items)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info("[CACHE] Loaded %d cached results from %s", len(self._entries), self.persist_path)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "model_id": self.model_id,
+            }
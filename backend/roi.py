@@ -0,0 +1,196 @@
+"""
+Per-camera regions of interest
+
+Each fridge camera has a fixed view, so only the shelves need to go
+through the model. A device's regions are rectangles or polygons in
+normalized coordinates (0.0-1.0 of the frame width/height, so they survive
+a resolution change):
+
+    [{"name": "top shelf", "rect": [0.05, 0.10, 0.95, 0.45]},
+     {"name": "door", "polygon": [[0.7, 0.5], [0.98, 0.5], [0.98, 0.95], [0.75, 0.95]]}]
+
+detect_objects crops the frame to the bounding box of all regions, masks
+what lies outside every region, runs that one image through the model and
+shifts the boxes back to full-frame coordinates. One input per frame keeps
+the model cost at or below a full-frame pass: separate crops would each be
+letterboxed up to the model's input size.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_REGIONS = 16  # Per device
+MASK_VALUE = 114  # Fill outside a polygon (the gray YOLO pads with)
+
+
+def validate_regions(regions):
+    """
+    Check and normalize a device's region list
+
+    Args:
+        regions: List of {"rect": [x1, y1, x2, y2]} or {"polygon": [[x, y], ...]}
+                 dicts with an optional "name", coordinates in 0.0-1.0
+
+    Returns:
+        list: Regions with float coordinates
+
+    Raises:
+        ValueError: If a region is malformed
+    """
+    if not isinstance(regions, list) or not regions:
+        raise ValueError("regions must be a non-empty list")
+    if len(regions) > MAX_REGIONS:
+        raise ValueError(f"at most {MAX_REGIONS} regions per device")
+    cleaned = []
+    for index, region in enumerate(regions):
+        if not isinstance(region, dict):
+            raise ValueError(f"region {index} must be an object")
+        name = str(region.get("name") or f"region-{index}")
+        try:
+            if "rect" in region:
+                x1, y1, x2, y2 = (float(v) for v in region["rect"])
+                points = None
+            elif "polygon" in region:
+                points = [[float(x), float(y)] for x, y in region["polygon"]]
+                if len(points) < 3:
+                    raise ValueError
+                xs, ys = zip(*points)
+                x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
+            else:
+                raise ValueError(f"region {index} needs a 'rect' or 'polygon'")
+        except (TypeError, ValueError) as e:
+            raise ValueError(str(e) or f"region {index} has invalid coordinates") from None
+        if not (0.0 <= x1 < x2 <= 1.0 and 0.0 <= y1 < y2 <= 1.0):
+            raise ValueError(f"region {index} must lie within 0.0-1.0 and have a non-zero area")
+        if points is None:
+            cleaned.append({"name": name, "rect": [x1, y1, x2, y2]})
+        else:
+            cleaned.append({"name": name, "polygon": points})
+    return cleaned
+
+
+def regions_key(regions):
+    """Short stable hash of a region list, for cache keys (None without regions)"""
+    if not regions:
+        return None
+    return hashlib.sha1(json.dumps(regions, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _region_points(region, width, height):
+    """Polygon of a region in pixel coordinates"""
+    if "rect" in region:
+        x1, y1, x2, y2 = region["rect"]
+        points = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+    else:
+        points = region["polygon"]
+    return np.asarray(points, dtype=np.float64) * (width, height)
+
+
+def crop_regions(img, regions):
+    """
+    The part of the frame covered by the regions, and its offset in the frame
+
+    The crop is the bounding box of all regions. It is a view when the
+    regions fill that box; otherwise it is a copy in which everything outside
+    the regions is filled with MASK_VALUE.
+
+    Returns:
+        tuple: (crop, (x, y)) or (None, None) if the regions are empty at this size
+    """
+    height, width = img.shape[:2]
+    polygons = [_region_points(region, width, height) for region in regions]
+    corners = np.round(np.concatenate(polygons), 3)  # 0.6 * 100 must not ceil to 61
+    left, top = (int(v) for v in np.floor(corners.min(axis=0)))
+    right, bottom = (int(v) for v in np.ceil(corners.max(axis=0)))
+    left, top = max(left, 0), max(top, 0)
+    right, bottom = min(right, width), min(bottom, height)
+    if right - left < 2 or bottom - top < 2:
+        return None, None
+    crop = img[top:bottom, left:right]
+    mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+    cv2.fillPoly(mask, [np.round(points - (left, top)).astype(np.int32) for points in polygons], 255)
+    if mask.all():
+        return crop, (left, top)
+    crop = crop.copy()
+    crop[mask == 0] = MASK_VALUE
+    return crop, (left, top)
+
+
+class RegionStore:
+    """Thread-safe device_id -> regions map, saved to a JSON file on every change"""
+
+    def __init__(self, persist_path=None):
+        self.persist_path = persist_path
+        self._regions = {}
+        self._lock = threading.Lock()
+        if persist_path:
+            self.load()
+
+    def get(self, device_id):
+        """The device's regions, or None to run on the whole frame"""
+        with self._lock:
+            return self._regions.get(device_id)
+
+    def set(self, device_id, regions):
+        """
+        Replace a device's regions
+
+        Returns:
+            list: The validated regions
+
+        Raises:
+            ValueError: If the regions are malformed
+        """
+        regions = validate_regions(regions)
+        with self._lock:
+            self._regions[device_id] = regions
+            self._save_locked()
+        logger.info("[ROI] %d regions set for %s", len(regions), device_id)
+        return regions
+
+    def delete(self, device_id):
+        """Remove a device's regions; returns False if it had none"""
+        with self._lock:
+            if self._regions.pop(device_id, None) is None:
+                return False
+            self._save_locked()
+        logger.info("[ROI] Regions removed for %s", device_id)
+        return True
+
+    def _save_locked(self):
+        if not self.persist_path:
+            return
+        tmp_path = self.persist_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._regions, f, indent=2)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            logger.error("[ROI] Could not save regions: %s", e)
+
+    def load(self):
+        """Load saved regions, skipping devices whose entries no longer validate"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error("[ROI] Could not load regions: %s", e)
+            return
+        loaded = {}
+        for device_id, regions in data.items():
+            try:
+                loaded[device_id] = validate_regions(regions)
+            except ValueError as e:
+                logger.warning("[ROI] Ignoring saved regions for %s: %s", device_id, e)
+        with self._lock:
+            self._regions = loaded
+        logger.info("[ROI] Loaded regions for %d devices from %s", len(loaded), self.persist_path)
@@ -0,0 +1,90 @@
+"""
+Stub camera client for testing on-demand capture without an ESP32
+
+Long-polls /devices/<id>/commands like the camera sketch does and uploads an
+image whenever a capture command arrives.
+
+Usage:
+    python stub_camera.py --device-id cam-1 --image test_image.jpg
+    curl -X POST http://localhost:5000/trigger_capture -H "Content-Type: application/json" \\
+         -d '{"device_id": "cam-1", "trigger_id": "door_open"}'
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import cv2
+import numpy as np
+
+
+def synthetic_frame(width=640, height=480):
+    """A dim fridge-like frame with a few coloured blobs, JPEG encoded"""
+    img = np.full((height, width, 3), 40, dtype=np.uint8)
+    rng = np.random.default_rng()
+    for _ in range(5):
+        x, y = int(rng.integers(0, width - 80)), int(rng.integers(0, height - 80))
+        color = tuple(int(c) for c in rng.integers(60, 255, size=3))
+        cv2.rectangle(img, (x, y), (x + 60, y + 80), color, -1)
+    ok, buffer = cv2.imencode(".jpg", img)
+    return buffer.tobytes()
+
+
+def upload(server, device_id, image_bytes):
+    """POST the image as multipart/form-data, the same way the ESP32 does"""
+    boundary = "----StubCamera" + uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="device_id"\r\n\r\n{device_id}\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="stub.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode("utf-8") + image_bytes + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    request = urllib.request.Request(
+        f"{server}/upload?async=true",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.status, json.loads(response.read() or b"{}")
+
+
+def poll(server, device_id, wait):
+    """Hold a long-poll open; returns the command dict or None"""
+    url = f"{server}/devices/{device_id}/commands?wait={wait}"
+    with urllib.request.urlopen(url, timeout=wait + 10) as response:
+        if response.status == 204:
+            return None
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub camera for on-demand capture testing")
+    parser.add_argument("--server", default="http://localhost:5000")
+    parser.add_argument("--device-id", default="stub-camera")
+    parser.add_argument("--image", help="JPEG to upload (default: synthetic frame)")
+    parser.add_argument("--wait", type=float, default=25, help="Long-poll seconds")
+    args = parser.parse_args()
+
+    image_bytes = open(args.image, "rb").read() if args.image else None
+    print(f"[STUB] {args.device_id} listening for commands on {args.server}")
+    while True:
+        try:
+            command = poll(args.server, args.device_id, args.wait)
+        except (urllib.error.URLError, OSError) as e:
+            print(f"[STUB] Poll failed: {e}, retrying in 5s")
+            time.sleep(5)
+            continue
+        if command is None:
+            continue
+        print(f"[STUB] Received {command['command']} ({command.get('params', {})})")
+        if command["command"] == "capture":
+            status, body = upload(args.server, args.device_id, image_bytes or synthetic_frame())
+            print(f"[STUB] Upload -> {status} {body}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Multi-frame count smoothing per camera and item
+
+A single frame is a noisy measurement: one occluded or low-confidence box
+makes an item's count drop, and the next frame puts it back. Each
+(camera, item) pair keeps a sliding window of its recent per-frame counts.
+Its smoothed count is the median of that window. A new count is committed
+only after the smoothed value has held for stable_frames consecutive frames,
+so short flickers never reach the inventory, the history or the clients.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Track:
+    """Recent counts and the committed count of one item seen by one camera"""
+
+    __slots__ = ("counts", "committed", "candidate", "streak", "last_item")
+
+    def __init__(self, window):
+        self.counts = deque(maxlen=window)
+        self.committed = 0
+        self.candidate = None
+        self.streak = 0
+        self.last_item = None
+
+
+class TemporalCountFilter:
+    """
+    Sliding-window median with time hysteresis, keyed by (device_id, item name)
+
+    observe() takes one frame's detected items and returns only the items
+    whose committed count changed. An item the camera stops seeing gets a
+    count of 0 in its window and is committed as quantity 0 once that is
+    stable, after which it is forgotten.
+    """
+
+    def __init__(self, window=5, stable_frames=3, idle_seconds=3600):
+        self.window = window
+        self.stable_frames = stable_frames
+        self.idle_seconds = idle_seconds
+        self._devices = {}  # device_id -> (last frame monotonic time, {name key: _Track})
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._commits = 0
+        self._suppressed = 0
+
+    def observe(self, device_id, items):
+        """
+        Feed one frame's detections
+
+        Args:
+            device_id: Camera the frame came from
+            items: Detected items (dicts with at least name and quantity)
+
+        Returns:
+            list: Copies of the items whose stable count changed, with the
+                  smoothed quantity (absent items get quantity 0)
+        """
+        now = time.monotonic()
+        seen = {item["name"].strip().lower(): item for item in items}
+        changed = []
+        with self._lock:
+            self._frames += 1
+            self._expire(now)
+            _, tracks = self._devices.get(device_id, (now, {}))
+            self._devices[device_id] = (now, tracks)
+            for key in set(tracks) | set(seen):
+                track = tracks.get(key)
+                if track is None:
+                    track = tracks[key] = _Track(self.window)
+                item = seen.get(key)
+                if item is not None:
+                    track.last_item = item
+                track.counts.append(int(item["quantity"]) if item is not None else 0)
+
+                smoothed = int(np.round(np.median(track.counts)))
+                if smoothed == track.committed:
+                    if item is None and smoothed == 0:
+                        del tracks[key]  # Seen briefly, never committed
+                    elif item is not None and int(item["quantity"]) != smoothed:
+                        self._suppressed += 1
+                    track.candidate, track.streak = None, 0
+                    continue
+                if smoothed == track.candidate:
+                    track.streak += 1
+                else:
+                    track.candidate, track.streak = smoothed, 1
+                if track.streak < self.stable_frames:
+                    continue
+
+                logger.debug("[TEMPORAL] %s: %s %s -> %s", device_id, key, track.committed, smoothed)
+                track.committed, track.candidate, track.streak = smoothed, None, 0
+                self._commits += 1
+                committed_item = dict(item if item is not None else track.last_item, quantity=smoothed)
+                if smoothed == 0:
+                    committed_item["status"] = "Not detected"
+                    del tracks[key]
+                changed.append(committed_item)
+        return changed
+
+    def _expire(self, now):
+        """Drop cameras that have not sent a frame for idle_seconds"""
+        if not self.idle_seconds:
+            return
+        for device_id in [d for d, (seen_at, _) in self._devices.items() if now - seen_at > self.idle_seconds]:
+            del self._devices[device_id]
+
+    def snapshot(self, device_id):
+        """Items one camera currently has committed, with their stable quantities"""
+        with self._lock:
+            _, tracks = self._devices.get(device_id, (None, {}))
+            return [dict(track.last_item, quantity=track.committed)
+                    for track in tracks.values() if track.committed]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window": self.window,
+                "stable_frames": self.stable_frames,
+                "devices": len(self._devices),
+                "tracked_items": sum(len(tracks) for _, tracks in self._devices.values()),
+                "frames": self._frames,
+                "commits": self._commits,
+                "suppressed_changes": self._suppressed,
+            }
@@ -0,0 +1,56 @@
+"""
+Shared fixtures
+
+Modules in backend/ are imported flat (as app.py does), so backend/ goes on
+sys.path. The Flask app is imported once per session inside a temporary
+working directory with the stub detector, so tests never touch real
+history, inventories or uploads and never download a model.
+"""
+import io
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("app")
+    original_dir = os.getcwd()
+    os.environ["DETECTOR_BACKEND"] = "stub"
+    os.environ["MODEL_LOADING"] = "eager"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.chdir(workdir)
+    import app
+
+    assert app.wait_for_model(30)
+    yield app
+    app.shutdown_services()
+    os.chdir(original_dir)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def fridge_jpeg():
+    """A dark 640x480 frame with one red blob (one "bottle" for the stub detector)"""
+    img = np.zeros((480, 640, 3), np.uint8)
+    cv2.circle(img, (100, 100), 30, (0, 0, 255), -1)
+    ok, encoded = cv2.imencode(".jpg", img)
+    assert ok
+    return encoded.tobytes()
+
+
+def upload_form(data, **fields):
+    form = {"image": (io.BytesIO(data), "frame.jpg"), "preprocess": "false"}
+    form.update(fields)
+    return form
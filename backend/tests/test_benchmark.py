@@ -0,0 +1,67 @@
+"""Benchmark harness: synthetic frames, summaries, the HTTP uploader and the load test"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import benchmark
+
+
+def test_synthetic_frames_are_seeded():
+    a = benchmark.synthetic_fridge_image(320, 240, seed=7)
+    assert a.shape == (240, 320, 3) and a.dtype == np.uint8
+    assert np.array_equal(a, benchmark.synthetic_fridge_image(320, 240, seed=7))
+    assert not np.array_equal(a, benchmark.synthetic_fridge_image(320, 240, seed=8))
+
+
+def test_parse_resolutions_and_summarize():
+    assert benchmark.parse_resolutions("640x480,1920X1080") == [(640, 480), (1920, 1080)]
+    assert benchmark.summarize([]) == {"count": 0}
+    report = benchmark.summarize([0.01] * 99 + [1.0], elapsed=2.0)
+    assert report["count"] == 100
+    assert report["p50_ms"] == pytest.approx(10.0)
+    assert report["max_ms"] == pytest.approx(1000.0)
+    assert report["throughput_per_s"] == 50.0
+
+
+class _UploadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.received.append(body)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_uploader_reuses_one_connection():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _UploadHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        uploader = benchmark.HttpUploader(f"http://127.0.0.1:{server.server_port}")
+        assert [uploader.post_frame(b"jpeg-bytes", "cam-0", {"async": "true"}) for _ in range(3)] == [200] * 3
+        uploader.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert uploader.connections == 1
+    body = _UploadHandler.received[-1]
+    assert b'name="device_id"\r\n\r\ncam-0' in body and b'name="async"\r\n\r\ntrue' in body
+    assert b'filename="frame.jpg"' in body and b"jpeg-bytes" in body
+
+
+def test_load_test_through_the_app(app_module):
+    import detect_items
+
+    backend = {"app": app_module, "detect_items": detect_items}
+    report = benchmark.run_load(backend, cameras=2, interval=0.05, duration=0.3, resolution=(320, 240), seed=1)
+    assert report["cameras"] == 2 and report["resolution"] == "320x240"
+    assert report["count"] >= 2
+    assert report["status_codes"] == {"200": report["count"]}
+    assert report["offered_rate_per_s"] == 40.0
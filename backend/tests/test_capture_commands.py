@@ -0,0 +1,63 @@
+"""Per-device capture commands: enqueue, long-poll and broadcast"""
+import threading
+import time
+import uuid
+
+from capture_commands import CommandBus
+from conftest import upload_form
+
+
+def test_send_coalesces_pending_captures():
+    bus = CommandBus()
+    first = bus.send("cam", "capture", trigger_id="door")
+    again = bus.send("cam", "capture", trigger_id="door")
+    assert again["id"] == first["id"]
+    assert bus.wait_for_command("cam", 0) == first
+    assert bus.wait_for_command("cam", 0) is None
+
+
+def test_expired_commands_are_dropped():
+    bus = CommandBus(command_ttl=0.05)
+    bus.send("cam", "capture")
+    time.sleep(0.1)
+    assert bus.wait_for_command("cam", 0) is None
+
+
+def test_long_poll_wakes_up_on_send():
+    bus = CommandBus()
+    received = []
+    poller = threading.Thread(target=lambda: received.append(bus.wait_for_command("cam", 5)))
+    poller.start()
+    time.sleep(0.05)
+    assert bus.devices()[0]["listening"]
+    started = time.monotonic()
+    bus.send("cam", "capture")
+    poller.join(5)
+    assert time.monotonic() - started < 1
+    assert received[0]["command"] == "capture"
+
+
+def test_broadcast_reaches_every_known_device():
+    bus = CommandBus()
+    bus.touch("a")
+    bus.touch("b")
+    assert sorted(bus.broadcast("capture", trigger_id="door")) == ["a", "b"]
+    assert bus.wait_for_command("b", 0)["params"] == {"trigger_id": "door"}
+
+
+def test_trigger_and_poll_routes(client):
+    device_id = f"cam-{uuid.uuid4().hex[:6]}"
+    assert client.get(f"/devices/{device_id}/commands?wait=0").status_code == 204
+    response = client.post("/trigger_capture", json={"device_id": device_id, "trigger_id": "door"})
+    assert response.status_code == 202
+    polled = client.get(f"/devices/{device_id}/commands?wait=1")
+    assert polled.status_code == 200
+    assert polled.get_json()["params"] == {"trigger_id": "door"}
+
+
+def test_uploads_without_device_do_not_register_a_camera(app_module, client, fridge_jpeg):
+    client.post("/upload", data=upload_form(fridge_jpeg))
+    device_ids = [device["device_id"] for device in client.get("/devices").get_json()]
+    assert app_module.DEFAULT_DEVICE_ID not in device_ids
+    targets = client.post("/trigger_capture", json={}).get_json()["devices"]
+    assert app_module.DEFAULT_DEVICE_ID not in targets
@@ -0,0 +1,91 @@
+"""Detection history stores: retention, indexes and torn-write recovery"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from detection_store import JsonlDetectionStore, open_detection_store
+
+
+def entry_items(name, quantity=1):
+    return [{"name": name, "quantity": quantity}]
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def open_store(request, tmp_path):
+    stores = []
+
+    def opener(**kwargs):
+        store = open_detection_store(str(tmp_path / f"history.{request.param}"), backend=request.param, **kwargs)
+        stores.append(store)
+        return store
+
+    yield opener
+    for store in stores:
+        store.close()
+
+
+def test_max_entries_keeps_the_newest(open_store):
+    store = open_store(max_entries=3)
+    for i in range(5):
+        store.append(entry_items(f"item{i}"), timestamp=f"2026-01-01T00:00:0{i}")
+    assert store.count() == 3
+    assert [entry["items"][0]["name"] for entry in store.query()] == ["item2", "item3", "item4"]
+    assert store.latest()["items"][0]["name"] == "item4"
+    assert store.query(item="ITEM0") == []
+    assert len(store.query(item="item3")) == 1
+
+
+def test_max_age_drops_old_entries(open_store):
+    store = open_store(max_entries=None, max_age_days=1)
+    store.append(entry_items("old"), timestamp=(datetime.now() - timedelta(days=3)).isoformat())
+    store.append(entry_items("new"))
+    assert [entry["items"][0]["name"] for entry in store.query()] == ["new"]
+
+
+def test_query_by_time_range_and_limit(open_store):
+    store = open_store()
+    for i in range(6):
+        store.append(entry_items("milk" if i % 2 else "egg", i), timestamp=f"2026-01-01T00:00:0{i}")
+    in_range = store.query(since="2026-01-01T00:00:02", until="2026-01-01T00:00:04")
+    assert [entry["items"][0]["quantity"] for entry in in_range] == [2, 3, 4]
+    assert [entry["items"][0]["quantity"] for entry in store.query(item="milk", limit=2)] == [3, 5]
+
+
+def test_jsonl_torn_write_is_dropped(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    store = JsonlDetectionStore(path)
+    store.append(entry_items("milk"), timestamp="2026-01-01T00:00:00")
+    store.append(entry_items("egg"), timestamp="2026-01-01T00:00:01")
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"timestamp": "2026-01-01T00:00:02", "ite')
+
+    assert JsonlDetectionStore(path).latest()["items"][0]["name"] == "egg"
+    reopened = JsonlDetectionStore(path)
+    assert reopened.count() == 2
+    assert os.path.getsize(path) == intact
+    reopened.append(entry_items("apple"))
+    with open(path) as f:
+        assert [json.loads(line)["items"][0]["name"] for line in f] == ["milk", "egg", "apple"]
+
+
+def test_jsonl_compacts_trimmed_entries(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    store = JsonlDetectionStore(path, max_entries=2)
+    for i in range(10):
+        store.append(entry_items(f"item{i}"))
+    with open(path) as f:
+        assert len(f.readlines()) <= 2 * 2
+    assert [entry["items"][0]["name"] for entry in JsonlDetectionStore(path, max_entries=2).query()] == \
+        ["item8", "item9"]
+
+
+def test_legacy_database_is_imported_once(tmp_path):
+    legacy = tmp_path / "database.json"
+    legacy.write_text(json.dumps([{"timestamp": "2026-01-01T00:00:00", "items": entry_items("milk")}]))
+    path = str(tmp_path / "history.jsonl")
+    open_detection_store(path, legacy_path=str(legacy)).close()
+    store = open_detection_store(path, legacy_path=str(legacy))
+    assert store.count() == 1
@@ -0,0 +1,53 @@
+"""Detector backend selection and the backend-independent parts of each backend"""
+import cv2
+import numpy as np
+import pytest
+
+from detectors import OnnxDetector, StubDetector, create_detector
+
+
+def red_blob_frame():
+    img = np.zeros((480, 640, 3), np.uint8)
+    cv2.circle(img, (100, 100), 30, (0, 0, 255), -1)
+    return img
+
+
+def test_create_detector_picks_backend_and_drops_foreign_options():
+    detector = create_detector("stub", "stub", imgsz=320, iou=0.5, latency_ms=0, intra_op_threads=4)
+    assert isinstance(detector, StubDetector)
+    assert (detector.imgsz, detector.iou) == (320, 0.5)
+    with pytest.raises(ValueError, match="Unknown detector backend"):
+        create_detector("tensorrt", "model.engine")
+
+
+def test_stub_detector_finds_blobs_and_warms_up():
+    detector = StubDetector()
+    [(cls, conf, xyxy)] = detector.predict([red_blob_frame()], 0.25)
+    assert [detector.names[int(c)] for c in cls] == ["bottle"]
+    assert np.allclose(xyxy[0], [70, 70, 131, 131], atol=2)
+    assert detector.warm_up() >= 0
+
+
+def test_onnx_backend_reports_missing_model(tmp_path):
+    pytest.importorskip("onnxruntime")
+    with pytest.raises(FileNotFoundError, match="python detectors.py export"):
+        OnnxDetector(str(tmp_path / "missing.onnx"))
+
+
+def test_onnx_postprocess_undoes_letterbox_and_runs_nms():
+    detector = OnnxDetector.__new__(OnnxDetector)
+    detector.imgsz, detector.iou = 640, 0.45
+    blob, gain, pad = detector._letterbox(np.zeros((480, 640, 3), np.uint8))
+    assert blob.shape == (1, 3, 640, 640) and gain == 1.0 and pad == (0, 80)
+
+    # Rows: cx, cy, w, h, score of class 0, score of class 1 (one column per anchor)
+    anchors = np.array([
+        [120, 200, 40, 40, 0.9, 0.0],  # class 0
+        [122, 201, 40, 40, 0.8, 0.0],  # duplicate of the first, suppressed
+        [122, 201, 40, 40, 0.0, 0.7],  # same place, other class: kept
+        [400, 300, 20, 20, 0.1, 0.0],  # below the threshold
+    ], dtype=np.float32).T
+    cls, conf, xyxy = detector._postprocess(anchors, 0.25, gain, pad, (480, 640, 3))
+    assert cls.tolist() == [0, 1]
+    assert np.allclose(conf, [0.9, 0.7])
+    assert np.allclose(xyxy[0], [100, 100, 140, 140])
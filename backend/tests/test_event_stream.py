@@ -0,0 +1,63 @@
+"""Server-sent inventory events: fan-out, slow subscribers and cleanup"""
+import json
+import uuid
+
+from event_stream import EventBroadcaster, format_event
+
+
+def test_format_event():
+    assert format_event("inventory", {"a": 1}, event_id=7) == b'id: 7\nevent: inventory\ndata: {"a": 1}\n\n'
+
+
+def test_publish_serializes_once_for_all_subscribers_of_a_topic():
+    events = EventBroadcaster()
+    first, second = events.subscribe("kitchen"), events.subscribe("kitchen")
+    everything, other = events.subscribe(), events.subscribe("garage")
+    events.publish("inventory", {"revision": 1}, event_id=1, topic="kitchen")
+    payload = first.queue.get_nowait()
+    assert second.queue.get_nowait() is payload
+    assert everything.queue.get_nowait() is payload
+    assert other.queue.empty()
+
+
+def test_slow_subscriber_is_dropped_without_blocking_others():
+    events = EventBroadcaster(buffer_size=2)
+    slow, fast = events.subscribe(), events.subscribe()
+    for revision in range(3):
+        events.publish("inventory", {"revision": revision})
+        fast.queue.get_nowait()
+    assert slow.dropped and not fast.dropped
+    assert events.stats() == {"subscribers": 1, "published": 3, "dropped_subscribers": 1}
+    # The dropped client's stream ends, so it reconnects and catches up with Last-Event-ID
+    assert list(events.stream(slow)) == [b"retry: 3000\n\n"]
+
+
+def test_closing_a_stream_unsubscribes():
+    events = EventBroadcaster(heartbeat_seconds=0.01)
+    subscriber = events.subscribe()
+    stream = events.stream(subscriber, initial=[b"catch-up"])
+    assert next(stream) == b"retry: 3000\n\n"
+    assert next(stream) == b"catch-up"
+    assert next(stream) == b": keep-alive\n\n"
+    stream.close()
+    assert events.stats()["subscribers"] == 0
+
+
+def test_stream_route_sends_missed_changes_and_cleans_up(app_module, client):
+    fridge = f"fridge-{uuid.uuid4().hex[:6]}"
+    revision = app_module.inventories.get(fridge).revision
+    client.post(f"/add_item?fridge_id={fridge}", json={"name": "milk", "quantity": 1, "status": "Added"})
+    before = app_module.inventory_events.stats()["subscribers"]
+
+    response = client.get(f"/inventory/stream?fridge_id={fridge}", headers={"Last-Event-ID": str(revision)},
+                          buffered=False)
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    assert next(chunks) == b"retry: 3000\n\n"
+    delta = next(chunks).decode()
+    data = json.loads(delta.split("data: ", 1)[1])
+    assert data["fridge_id"] == fridge and not data["full"]
+    assert [item["name"] for item in data["upserted"]] == ["milk"]
+    assert app_module.inventory_events.stats()["subscribers"] == before + 1
+    response.close()
+    assert app_module.inventory_events.stats()["subscribers"] == before
@@ -0,0 +1,42 @@
+"""Unchanged-frame skipping per camera"""
+import uuid
+
+import cv2
+import numpy as np
+
+from conftest import upload_form
+from frame_gate import FrameChangeGate
+
+
+def jpeg(center, background=0):
+    img = np.full((480, 640, 3), background, np.uint8)
+    cv2.circle(img, center, 30, (0, 0, 255), -1)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+def test_gate_reuses_result_only_for_similar_frames():
+    gate = FrameChangeGate(threshold=2.0, max_age_seconds=60)
+    frame = cv2.imdecode(np.frombuffer(jpeg((100, 100)), np.uint8), cv2.IMREAD_COLOR)
+    signature, items, _ = gate.check("cam", frame, ())
+    assert items is None
+    gate.update("cam", signature, (), [{"name": "bottle", "quantity": 1}])
+    assert gate.check("cam", frame, ())[1] == [{"name": "bottle", "quantity": 1}]
+    assert gate.check("cam", frame, ("other params",))[1] is None
+    assert gate.check("other-cam", frame, ())[1] is None
+
+
+def test_upload_gate_hit_and_miss(client):
+    device_id = f"cam-{uuid.uuid4().hex[:6]}"
+    first = client.post("/upload", data=upload_form(jpeg((100, 100)), device_id=device_id)).get_json()
+    same = client.post("/upload", data=upload_form(jpeg((100, 100)), device_id=device_id)).get_json()
+    changed = client.post("/upload", data=upload_form(jpeg((100, 100), 80), device_id=device_id)).get_json()
+    assert [r["frame_unchanged"] for r in (first, same, changed)] == [False, True, False]
+
+
+def test_uploads_without_device_are_not_gated(app_module, client):
+    before = app_module.frame_gate.stats()["checks"]
+    for center in ((100, 100), (101, 100)):
+        response = client.post("/upload", data=upload_form(jpeg(center))).get_json()
+        assert response["frame_unchanged"] is False
+    assert app_module.frame_gate.stats()["checks"] == before
+    assert app_module.DEFAULT_DEVICE_ID not in app_module.frame_gate.stats()["devices"]
@@ -0,0 +1,50 @@
+"""Decode-once in-memory upload pipeline"""
+import cv2
+import numpy as np
+
+from conftest import upload_form
+from image_utils import decode_image, get_image_info_array, validate_image_array
+
+
+def test_decode_image(fridge_jpeg):
+    img = decode_image(fridge_jpeg)
+    assert img.shape == (480, 640, 3) and img.dtype == np.uint8
+    assert decode_image(b"") is None
+    assert decode_image(b"not an image at all") is None
+
+
+def test_validate_image_array():
+    img = np.zeros((100, 100, 3), np.uint8)
+    assert validate_image_array(img, 1000) == (True, "Image is valid")
+    assert not validate_image_array(img, 0)[0]
+    assert not validate_image_array(None, 1000)[0]
+    assert not validate_image_array(np.zeros((40, 100, 3), np.uint8), 1000)[0]
+
+
+def test_image_info_from_array():
+    img = np.full((60, 80, 3), 100, np.uint8)
+    info = get_image_info_array(img, 2048)
+    assert (info["width"], info["height"], info["channels"]) == (80, 60, 3)
+    assert info["brightness"] == 100.0 and info["sharpness"] == 0.0
+    assert info["file_size_kb"] == 2.0
+
+
+def test_upload_decodes_once_and_never_reads_from_disk(client, fridge_jpeg, monkeypatch):
+    calls = {"imdecode": 0, "imread": 0}
+    imdecode = cv2.imdecode
+
+    def counting_imdecode(*args):
+        calls["imdecode"] += 1
+        return imdecode(*args)
+
+    def failing_imread(*args):
+        calls["imread"] += 1
+        raise AssertionError("upload path read an image from disk")
+
+    monkeypatch.setattr(cv2, "imdecode", counting_imdecode)
+    monkeypatch.setattr(cv2, "imread", failing_imread)
+    response = client.post("/upload", data=upload_form(fridge_jpeg, force="true", save_image="false",
+                                                       preprocess="true"))
+    assert response.status_code == 200
+    assert [item["name"] for item in response.get_json()["items"]] == ["bottle"]
+    assert calls == {"imdecode": 1, "imread": 0}
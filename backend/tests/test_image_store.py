@@ -0,0 +1,28 @@
+"""Saved uploads and annotated images"""
+import os
+import uuid
+
+from conftest import upload_form
+
+
+def test_annotated_image_written_without_saving_upload(app_module, client, fridge_jpeg):
+    device_id = f"cam-{uuid.uuid4().hex[:6]}"
+    response = client.post("/upload", data=upload_form(
+        fridge_jpeg, device_id=device_id, save_image="false", save_annotated="true", force="true"))
+    assert response.status_code == 200
+    assert response.get_json()["image_info"]["filename"] is None
+
+    device_dir = app_module.image_store.path(device_id)
+    written = [name for _, _, names in os.walk(device_dir) for name in names]
+    assert len(written) == 1 and written[0].endswith("_annotated.jpg")
+
+
+def test_eviction_over_byte_budget(tmp_path, fridge_jpeg):
+    from image_store import ImageStore
+
+    store = ImageStore(str(tmp_path / "images"), max_bytes=len(fridge_jpeg) * 2)
+    names = [store.new_name("cam-1") for _ in range(4)]
+    for name in names:
+        store.save(name, fridge_jpeg)
+    assert store.sweep() == 2
+    assert [os.path.exists(store.path(name)) for name in names] == [False, False, True, True]
@@ -0,0 +1,111 @@
+"""Batch inference scheduler: batching, per-frame results, errors and shutdown"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference_scheduler import BatchInferenceScheduler
+
+
+def slow_predict(images, min_confidence):
+    time.sleep(0.05)
+    return [len(images)] * len(images)
+
+
+def test_shutdown_inference_finishes_queued_frames(app_module, monkeypatch):
+    import detect_items
+
+    scheduler = BatchInferenceScheduler(slow_predict, max_batch_size=2, max_wait_ms=0)
+    monkeypatch.setattr(detect_items, "batch_scheduler", scheduler)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    futures = [scheduler.submit(frame, 0.25) for _ in range(5)]
+    detect_items.shutdown_inference(timeout=5)
+    assert all(future.done() for future in futures)
+    assert not scheduler._thread.is_alive()
+
+
+class RecordingModel:
+    """predict_fn that records each call and returns every frame's marker pixel"""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def __call__(self, images, min_confidence):
+        self.calls.append((len(images), min_confidence))
+        if self.error is not None:
+            raise self.error
+        return [int(image[0, 0, 0]) for image in images]
+
+
+def marked_frames(count):
+    frames = [np.zeros((4, 4, 3), dtype=np.uint8) for _ in range(count)]
+    for i, frame in enumerate(frames):
+        frame[0, 0, 0] = i
+    return frames
+
+
+def submit_together(scheduler, frames, thresholds):
+    """Submit every frame from its own thread at the same moment"""
+    futures = [None] * len(frames)
+    barrier = threading.Barrier(len(frames))
+
+    def submit(i):
+        barrier.wait()
+        futures[i] = scheduler.submit(frames[i], thresholds[i])
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return futures
+
+
+def test_concurrent_frames_share_one_model_call():
+    model = RecordingModel()
+    scheduler = BatchInferenceScheduler(model, max_batch_size=8, max_wait_ms=200)
+    try:
+        futures = submit_together(scheduler, marked_frames(6), [0.5, 0.3, 0.5, 0.4, 0.5, 0.5])
+        assert [future.result(timeout=5) for future in futures] == list(range(6))
+        # One call at the lowest threshold of the batch
+        assert model.calls == [(6, 0.3)]
+        assert scheduler.stats()["batch_size_histogram"] == {"6": 1}
+    finally:
+        scheduler.shutdown(timeout=5)
+
+
+def test_batches_are_capped_at_max_batch_size():
+    model = RecordingModel()
+    scheduler = BatchInferenceScheduler(model, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [scheduler.submit(frame, 0.25) for frame in marked_frames(10)]
+        assert [future.result(timeout=5) for future in futures] == list(range(10))
+        assert all(size <= 4 for size, _ in model.calls)
+        assert sum(size for size, _ in model.calls) == 10
+    finally:
+        scheduler.shutdown(timeout=5)
+
+
+def test_model_error_reaches_every_frame_in_the_batch():
+    model = RecordingModel(error=RuntimeError("CUDA out of memory"))
+    scheduler = BatchInferenceScheduler(model, max_batch_size=8, max_wait_ms=200)
+    try:
+        futures = submit_together(scheduler, marked_frames(3), [0.25] * 3)
+        for future in futures:
+            with pytest.raises(RuntimeError, match="CUDA out of memory"):
+                future.result(timeout=5)
+        assert len(model.calls) == 1
+        assert scheduler.stats()["total_errors"] == 1
+    finally:
+        scheduler.shutdown(timeout=5)
+
+
+def test_wrong_result_count_fails_the_batch():
+    scheduler = BatchInferenceScheduler(lambda images, conf: [], max_batch_size=2, max_wait_ms=0)
+    try:
+        with pytest.raises(RuntimeError, match="0 results for 1 frames"):
+            scheduler.predict(np.zeros((4, 4, 3), dtype=np.uint8), 0.25, timeout=5)
+    finally:
+        scheduler.shutdown(timeout=5)
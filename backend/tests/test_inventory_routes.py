@@ -0,0 +1,27 @@
+"""Manual inventory edits through the CRUD routes"""
+import uuid
+
+
+def test_add_update_delete_case_insensitively(client):
+    fridge = f"fridge-{uuid.uuid4().hex[:6]}"
+    added = client.post(f"/add_item?fridge_id={fridge}", json={"name": "Orange Juice", "quantity": 1,
+                                                               "status": "Added"})
+    assert added.status_code == 200
+
+    updated = client.put(f"/inventory?fridge_id={fridge}", json={"name": "orange juice", "quantity": 3})
+    assert updated.status_code == 200
+    assert updated.get_json()["item"]["name"] == "Orange Juice"
+    assert client.get(f"/inventory?fridge_id={fridge}").get_json()[0]["quantity"] == 3
+
+    deleted = client.delete(f"/inventory?fridge_id={fridge}&name=ORANGE%20JUICE")
+    assert deleted.get_json()["name"] == "Orange Juice"
+    assert client.get(f"/inventory?fridge_id={fridge}").get_json() == []
+
+
+def test_missing_items_and_bad_input(client):
+    fridge = f"fridge-{uuid.uuid4().hex[:6]}"
+    assert client.put(f"/inventory?fridge_id={fridge}", json={"name": "ghost", "quantity": 1}).status_code == 404
+    assert client.delete(f"/inventory?fridge_id={fridge}&name=ghost").status_code == 404
+    assert client.delete(f"/inventory?fridge_id={fridge}").status_code == 400
+    assert client.post(f"/add_item?fridge_id={fridge}", json={"name": "milk"}).status_code == 400
+    assert client.get("/inventory?fridge_id=../etc").status_code == 400
@@ -0,0 +1,40 @@
+"""Per-fridge inventory shards"""
+import json
+
+from inventory_shards import FridgeInventories
+
+
+def write_shard(directory, fridge_id, items, revision=1):
+    with open(directory / f"{fridge_id}.json", "w") as f:
+        json.dump({"fridge_id": fridge_id, "revision": revision, "items": items}, f)
+
+
+def test_aggregate_and_summary_do_not_load_saved_shards(tmp_path):
+    write_shard(tmp_path, "kitchen", [{"name": "milk", "quantity": 2, "category": "dairy"}], revision=7)
+    write_shard(tmp_path, "garage", [{"name": "Milk", "quantity": 1, "category": "dairy"},
+                                     {"name": "beer", "quantity": 6, "category": "drinks"}])
+    inventories = FridgeInventories(str(tmp_path))
+    inventories.get("office").upsert({"name": "milk", "quantity": 3, "category": "dairy"})
+
+    totals = {entry["name"].lower(): entry for entry in inventories.aggregate()}
+    assert totals["milk"]["quantity"] == 6
+    assert totals["milk"]["fridges"] == {"garage": 1, "kitchen": 2, "office": 3}
+    assert [entry["name"] for entry in inventories.aggregate("drinks")] == ["beer"]
+
+    summary = {entry["fridge_id"]: entry for entry in inventories.summary()}
+    assert summary["kitchen"] == {"fridge_id": "kitchen", "items": 1, "total_quantity": 2, "revision": 7}
+    assert summary["garage"]["total_quantity"] == 7
+    assert summary["office"]["items"] == 1
+    assert inventories.stats()["loaded_fridges"] == 1
+
+
+def test_flush_saves_only_changed_shards(tmp_path):
+    inventories = FridgeInventories(str(tmp_path))
+    inventories.get("a").upsert({"name": "egg", "quantity": 12})
+    inventories.get("b")
+    assert inventories.flush() == 1
+    assert inventories.flush() == 0
+
+    reopened = FridgeInventories(str(tmp_path))
+    assert reopened.fridge_ids() == ["a"]
+    assert reopened.get("a").get("egg")["quantity"] == 12
@@ -0,0 +1,117 @@
+"""InventoryStore: name index, merging, thread safety, revisions, deltas and tombstones"""
+import threading
+
+import inventory_store
+from inventory_store import InventoryStore
+
+
+def test_every_change_bumps_the_revision():
+    store = InventoryStore([{"name": "Milk", "quantity": 1, "category": "dairy"}])
+    start = store.revision
+    _, created, revision = store.upsert({"name": " milk ", "quantity": 2})
+    assert not created and revision == start + 1
+    assert store.get("MILK")["quantity"] == 2
+    _, revision = store.update("missing", {"quantity": 1})
+    assert revision == start + 1
+    assert store.versioned_items()[0] == start + 1
+
+
+def test_changes_since_returns_only_newer_items():
+    store = InventoryStore([{"name": "milk", "quantity": 1}, {"name": "egg", "quantity": 6}])
+    base = store.revision
+    store.upsert({"name": "apple", "quantity": 3})
+    store.update("egg", {"quantity": 5})
+    store.delete("milk")
+
+    changes = store.changes_since(base)
+    assert not changes["full"] and changes["revision"] == base + 3
+    assert [item["name"] for item in changes["upserted"]] == ["apple", "egg"]
+    assert changes["deleted"] == ["milk"]
+    assert store.changes_since(store.revision)["upserted"] == []
+
+
+def test_readding_a_deleted_item_clears_its_tombstone():
+    store = InventoryStore([{"name": "milk", "quantity": 1}])
+    base = store.revision
+    store.delete("milk")
+    store.upsert({"name": "Milk", "quantity": 2})
+    changes = store.changes_since(base)
+    assert changes["deleted"] == []
+    assert [item["quantity"] for item in changes["upserted"]] == [2]
+
+
+def test_stale_or_future_revisions_need_a_full_resync(monkeypatch):
+    monkeypatch.setattr(inventory_store, "MAX_TOMBSTONES", 2)
+    store = InventoryStore([{"name": name, "quantity": 1} for name in ("a", "b", "c")])
+    base = store.revision
+    assert store.changes_since(base - 1)["full"]
+    assert store.changes_since(base + 1)["full"]
+
+    for name in ("a", "b", "c"):
+        store.delete(name)
+    assert store.changes_since(base)["full"]  # The tombstone of "a" was dropped
+    recent = store.changes_since(base + 1)
+    assert not recent["full"] and recent["deleted"] == ["b", "c"]
+
+
+def test_category_index_follows_updates():
+    store = InventoryStore([{"name": "cheese", "quantity": 1, "category": "dairy"}])
+    store.update("cheese", {"category": "snacks"})
+    assert store.by_category("dairy") == []
+    assert [item["name"] for item in store.by_category("snacks")] == ["cheese"]
+    store.delete("cheese")
+    assert store.categories() == {}
+
+
+def test_names_are_matched_case_insensitively():
+    store = InventoryStore()
+    _, created, _ = store.upsert({"name": "Greek Yogurt", "quantity": 1})
+    assert created
+    _, created, _ = store.upsert({"name": "  greek yogurt ", "quantity": 2})
+    assert not created and len(store) == 1
+    assert store.get("GREEK YOGURT")["quantity"] == 2
+    assert store.update("GREEK yogurt", {"quantity": 3})[0]["quantity"] == 3
+    assert store.delete("greek YOGURT")[0]["quantity"] == 3
+    assert store.get("greek yogurt") is None
+
+
+def test_merge_detections_updates_counts_and_skips_absent_new_items():
+    store = InventoryStore([{"name": "Milk", "quantity": 2, "category": "dairy", "status": "Added"}])
+    updated, added, _ = store.merge_detections([
+        {"name": "milk", "quantity": 1, "confidence": 0.8, "status": "Detected"},
+        {"name": "apple", "quantity": 3, "confidence": 0.9},
+        {"name": "pear", "quantity": 0},
+    ])
+    assert [(item["name"], item["quantity"]) for item in updated] == [("Milk", 1)]
+    assert [item["name"] for item in added] == ["apple"]
+    milk = store.get("milk")
+    assert (milk["category"], milk["status"], milk["confidence"]) == ("dairy", "Detected", 0.8)
+    assert store.get("pear") is None
+
+
+def test_snapshot_is_not_affected_by_later_writes():
+    store = InventoryStore([{"name": "milk", "quantity": 1}])
+    snapshot = store.snapshot()
+    store.upsert({"name": "milk", "quantity": 5})
+    store.upsert({"name": "egg", "quantity": 6})
+    assert [(item["name"], item["quantity"]) for item in snapshot] == [("milk", 1)]
+    assert len(store.snapshot()) == 2
+
+
+def test_concurrent_writers_lose_no_updates():
+    store = InventoryStore()
+    start = store.revision
+
+    def writer(worker):
+        for i in range(200):
+            store.upsert({"name": f"item-{worker}-{i % 20}", "quantity": i})
+            store.merge_detections([{"name": "shared", "quantity": i + 1}])
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store) == 8 * 20 + 1
+    assert store.revision == start + 8 * 200 * 2
+    assert len(store.snapshot()) == len(store)
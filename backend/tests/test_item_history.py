@@ -0,0 +1,78 @@
+"""Item history deltas, consumption and the counts endpoint"""
+import pytest
+
+from item_history import ItemHistory, RECORD_DTYPE
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ItemHistory(str(tmp_path / "items"))
+    yield history
+    history.close()
+
+
+def test_counts_sum_per_fridge_deltas(history):
+    history.record("a", upserted=[{"name": "Milk", "quantity": 2}], timestamp="2026-01-01T10:00:00")
+    history.record("b", upserted=[{"name": "milk", "quantity": 3}], timestamp="2026-01-01T11:00:00")
+    history.record("a", upserted=[{"name": "Milk", "quantity": 1}], timestamp="2026-01-01T12:00:00")
+    history.record("b", deleted=["Milk"], timestamp="2026-01-01T13:00:00")
+
+    result = history.item_counts("MILK")
+    assert [count for _, count in result["points"]] == [2, 5, 4, 1]
+    assert (result["start"], result["end"], result["max"]) == (0, 1, 5)
+
+    since = history.item_counts("milk", since="2026-01-01T11:30:00")
+    assert since["start"] == 5
+    assert [count for _, count in since["points"]] == [4, 1]
+
+    only_b = history.item_counts("milk", fridge_id="b")
+    assert [count for _, count in only_b["points"]] == [3, 0]
+
+
+def test_buckets_keep_last_count(history):
+    for minute, quantity in ((0, 1), (1, 2), (2, 3), (10, 4)):
+        history.record("a", upserted=[{"name": "egg", "quantity": quantity}],
+                       timestamp=f"2026-01-01T10:{minute:02d}:00")
+    result = history.item_counts("egg", bucket_seconds=300)
+    assert [count for _, count in result["points"]] == [3, 4]
+
+
+@pytest.mark.parametrize("bucket", [float("inf"), float("nan"), 0.0, 0.0001, -5.0])
+def test_invalid_bucket_rejected(history, bucket):
+    history.record("a", upserted=[{"name": "egg", "quantity": 1}])
+    with pytest.raises(ValueError):
+        history.item_counts("egg", bucket_seconds=bucket)
+
+
+def test_consumption_and_restocking(history):
+    history.record("a", upserted=[{"name": "apple", "quantity": 6}], timestamp="2026-01-01T00:00:00")
+    history.record("a", upserted=[{"name": "apple", "quantity": 2}], timestamp="2026-01-02T00:00:00")
+    history.record("a", upserted=[{"name": "apple", "quantity": 5}], timestamp="2026-01-03T00:00:00")
+    history.record("a", upserted=[{"name": "pear", "quantity": 1}], timestamp="2026-01-03T00:00:00")
+    history.record("a", deleted=["pear"], timestamp="2026-01-04T00:00:00")
+
+    result = history.consumption("2026-01-01T12:00:00", "2026-01-05T12:00:00")
+    assert result["days"] == 4.0
+    apple, pear = result["items"]
+    assert apple == {"name": "apple", "consumed": 4, "restocked": 3, "per_day": 1.0, "current": 5}
+    assert pear == {"name": "pear", "consumed": 1, "restocked": 1, "per_day": 0.25, "current": 0}
+
+
+def test_partial_record_dropped_on_reopen(tmp_path):
+    directory = str(tmp_path / "items")
+    history = ItemHistory(directory)
+    history.record("a", upserted=[{"name": "egg", "quantity": 1}])
+    history.close()
+    with open(history._records_path, "ab") as f:
+        f.write(b"\0" * (RECORD_DTYPE.itemsize // 2))
+
+    reopened = ItemHistory(directory)
+    assert len(reopened) == 1
+    assert reopened.item_counts("egg")["end"] == 1
+    reopened.close()
+
+
+@pytest.mark.parametrize("bucket", ["inf", "1e400", "0.0001", "-1", "abc"])
+def test_counts_endpoint_rejects_bad_bucket(client, bucket):
+    response = client.get(f"/history/items/milk/counts?bucket={bucket}")
+    assert response.status_code == 400
@@ -0,0 +1,39 @@
+"""Background job queue"""
+import threading
+
+from job_queue import JobQueue
+
+
+def test_finished_job_always_has_its_result():
+    jobs = JobQueue(num_workers=4, max_queue_size=0)
+    ids = [jobs.submit(lambda i=i: {"n": i}) for i in range(300)]
+    stop = threading.Event()
+    torn = []
+
+    def poll():
+        while not stop.is_set():
+            for job_id in ids:
+                job = jobs.get(job_id)
+                data = job.to_dict() if job is not None else None
+                if data and data["status"] == "done" and (data["result"] is None or data["finished_at"] is None):
+                    torn.append(data)
+
+    reader = threading.Thread(target=poll)
+    reader.start()
+    assert jobs.shutdown(timeout=10)
+    stop.set()
+    reader.join()
+    assert torn == []
+    assert [jobs.get(job_id).result["n"] for job_id in ids] == list(range(300))
+
+
+def test_failed_job_reports_error():
+    jobs = JobQueue(num_workers=1)
+
+    def boom():
+        raise ValueError("bad frame")
+
+    job = jobs.wait(jobs.submit(boom), timeout=5)
+    assert job.to_dict()["status"] == "failed"
+    assert job.to_dict()["error"] == "bad frame"
+    assert jobs.stats()["pending_jobs"] == 0
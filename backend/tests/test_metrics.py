@@ -0,0 +1,56 @@
+"""Metrics exposition, stage spans and the /metrics endpoint"""
+import re
+
+from conftest import upload_form
+from metrics import MetricsRegistry, format_trace, span, trace
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="x")
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{stage="x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="x",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="x",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="x"} 3' in text
+
+
+def test_counter_labels_are_escaped_and_failing_gauges_skipped():
+    registry = MetricsRegistry()
+    assert registry.counter("hits_total", "Hits") is registry.counter("hits_total", "Hits")
+    registry.counter("hits_total", "Hits").inc(2, path='a"b\\c')
+    registry.gauge("broken", "Raises", lambda: 1 / 0)
+    text = registry.render()
+    assert 'hits_total{path="a\\"b\\\\c"} 2' in text
+    assert "# TYPE broken gauge" in text and "\nbroken " not in text
+
+
+def test_nested_traces_share_one_span_list():
+    with trace() as outer:
+        with span("receive"):
+            pass
+        with trace() as inner:
+            with span("inference"):
+                pass
+    assert inner is outer
+    assert [stage for stage, _ in outer] == ["receive", "inference"]
+    assert re.fullmatch(r"receive=\d+\.\dms inference=\d+\.\dms", format_trace(outer))
+    with span("outside"):
+        pass  # No active trace: only the histogram records it
+    assert len(outer) == 2
+
+
+def test_metrics_endpoint_reports_upload_pipeline(client, fridge_jpeg):
+    assert client.post("/upload", data=upload_form(fridge_jpeg)).status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    for stage in ("receive", "decode", "validate", "database"):
+        assert f'stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert re.search(r'http_requests_total\{endpoint="/upload",method="POST",status="200"\} \d+', text)
+    assert re.search(r"^model_ready 1$", text, re.MULTILINE)
+    assert re.search(r"^upload_queue_depth \d+$", text, re.MULTILINE)
@@ -0,0 +1,18 @@
+"""Model status when the detector cannot be loaded"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_pool_load_failure_reports_error(tmp_path):
+    env = dict(os.environ, DETECTOR_BACKEND="onnx", ONNX_MODEL_PATH=str(tmp_path / "missing.onnx"),
+               INFERENCE_PROCESSES="1", MODEL_LOADING="eager", LOG_LEVEL="CRITICAL", PYTHONPATH=BACKEND_DIR)
+    script = "import json, detect_items; print(json.dumps(detect_items.model_status()))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    status = json.loads(result.stdout.strip().splitlines()[-1])
+    assert status["state"] == "error"
+    assert "missing.onnx" in status["error"]
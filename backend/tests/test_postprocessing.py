@@ -0,0 +1,54 @@
+"""Vectorized detection post-processing"""
+import numpy as np
+import pytest
+
+NAMES = {0: "person", 1: "bottle", 2: "wine glass", 3: "cup", 4: "banana", 5: "apple", 6: "chair", 7: "milk"}
+
+
+@pytest.fixture
+def detect_items(app_module, monkeypatch):
+    import detect_items
+
+    tables = detect_items.build_class_tables(NAMES)
+    for name, table in zip(("CLASS_NAMES", "FOOD_MASK", "CLASS_CATEGORIES"), tables):
+        monkeypatch.setattr(detect_items, name, table)
+    return detect_items
+
+
+def per_box_summary(detect_items, cls, conf, min_confidence, filter_food):
+    """The original loop over boxes, as the reference"""
+    found = {}
+    for index, (class_id, score) in enumerate(zip(cls, conf)):
+        name = NAMES[int(class_id)]
+        if score < min_confidence or (filter_food and not detect_items.is_food_item(name)):
+            continue
+        entry = found.setdefault(name, {"count": 0, "conf": 0.0, "first": index})
+        entry["count"] += 1
+        entry["conf"] = max(entry["conf"], float(score))
+    order = sorted(found, key=lambda name: (-round(found[name]["conf"], 2), found[name]["first"]))
+    return [(name, found[name]["count"], round(found[name]["conf"], 2), detect_items.get_food_category(name))
+            for name in order]
+
+
+def test_class_tables_precompute_food_and_categories(detect_items):
+    assert list(detect_items.FOOD_MASK) == [detect_items.is_food_item(NAMES[i]) for i in range(len(NAMES))]
+    assert not detect_items.FOOD_MASK[0] and detect_items.FOOD_MASK[1]
+    assert detect_items.CLASS_CATEGORIES[4] == detect_items.get_food_category("banana") != "other"
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("filter_food", [True, False])
+def test_matches_per_box_loop(detect_items, seed, filter_food):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(0, 40))
+    cls = rng.integers(0, len(NAMES), count)
+    conf = np.round(rng.uniform(0.1, 1.0, count), 2).astype(np.float32)
+    items = detect_items.summarize_detections(cls, conf, 0.25, filter_food)
+    assert [(item["name"], item["quantity"], item["confidence"], item["category"]) for item in items] == \
+        per_box_summary(detect_items, cls, conf, 0.25, filter_food)
+
+
+def test_empty_and_filtered_out(detect_items):
+    empty = np.array([], dtype=np.intp)
+    assert detect_items.summarize_detections(empty, np.array([], dtype=np.float32)) == []
+    assert detect_items.summarize_detections(np.array([0, 6]), np.array([0.9, 0.9], dtype=np.float32)) == []
@@ -0,0 +1,25 @@
+"""In-memory image enhancement"""
+import numpy as np
+
+
+def test_default_mode_brightens_dark_frame(app_module):
+    from detect_items import enhance_image
+
+    img = np.full((48, 64, 3), 40, np.uint8)
+    enhanced = enhance_image(img)
+    assert enhanced is not img
+    assert enhanced.mean() > img.mean() + 10
+
+
+def test_none_mode_leaves_frame_untouched(app_module):
+    from detect_items import enhance_image
+
+    img = np.full((48, 64, 3), 40, np.uint8)
+    assert enhance_image(img, mode="none") is img
+
+
+def test_fixed_mode_matches_old_brightness_factor(app_module):
+    from detect_items import BRIGHTNESS_FACTOR, enhance_image
+
+    img = np.full((48, 64, 3), 100, np.uint8)
+    assert abs(float(enhance_image(img, mode="fixed").mean()) - 100 * BRIGHTNESS_FACTOR) <= 1
@@ -0,0 +1,76 @@
+"""Worker restarts and load failures of the multi-process inference pool"""
+import time
+
+import numpy as np
+import pytest
+
+import process_pool
+from detectors import StubDetector
+from process_pool import InferenceProcessPool, PoolLoadError, PoolUnavailableError
+
+
+def broken_detector():
+    raise FileNotFoundError("yolov8n.onnx not found")
+
+
+def slow_detector():
+    return StubDetector(latency_ms=1000)
+
+
+@pytest.fixture(autouse=True)
+def fast_restarts(monkeypatch):
+    monkeypatch.setattr(process_pool, "RESTART_BACKOFF_SECONDS", 0.05)
+    monkeypatch.setattr(process_pool, "WATCH_INTERVAL_SECONDS", 0.05)
+
+
+def test_pool_fails_after_capped_load_attempts():
+    pool = InferenceProcessPool(broken_detector, num_workers=1, pin_cores=False, max_load_failures=2)
+    try:
+        with pytest.raises(PoolLoadError, match="yolov8n.onnx not found"):
+            pool.wait_ready(timeout=20)
+        worker = pool.stats()["workers_detail"][0]
+        assert worker["failed"] and worker["restarts"] == 1
+        with pytest.raises(PoolLoadError):
+            pool.submit(np.zeros((8, 8, 3), np.uint8), 0.25)
+    finally:
+        pool.shutdown()
+
+
+def test_pool_predicts_with_stub_detector():
+    pool = InferenceProcessPool(StubDetector, num_workers=1, pin_cores=False)
+    try:
+        assert pool.wait_ready(timeout=20)
+        img = np.zeros((120, 160, 3), np.uint8)
+        img[20:60, 20:60] = (0, 0, 255)
+        cls, conf, xyxy = pool.predict(img, 0.25, timeout=20)
+        assert len(cls) == 1 and xyxy.shape == (1, 4)
+    finally:
+        pool.shutdown()
+
+
+def test_submit_fails_fast_when_no_worker_is_free():
+    pool = InferenceProcessPool(slow_detector, num_workers=1, pin_cores=False, acquire_timeout=0.2)
+    try:
+        assert pool.wait_ready(timeout=20)
+        frame = np.zeros((8, 8, 3), np.uint8)
+        busy = pool.submit(frame, 0.25)
+        started = time.monotonic()
+        with pytest.raises(PoolUnavailableError):
+            pool.submit(frame, 0.25)
+        assert time.monotonic() - started < 2
+        busy.result(timeout=20)
+    finally:
+        pool.shutdown()
+
+
+def test_unavailable_pool_answers_503(client, fridge_jpeg, monkeypatch):
+    import detect_items
+    from conftest import upload_form
+
+    def no_worker(*args, **kwargs):
+        raise PoolUnavailableError("No inference worker available after 30s")
+
+    monkeypatch.setattr(detect_items, "run_frame_inference", no_worker)
+    response = client.post("/upload", data=upload_form(fridge_jpeg, force="true"))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
@@ -0,0 +1,53 @@
+"""Detection result cache invalidation"""
+import uuid
+
+import cv2
+import numpy as np
+
+from conftest import upload_form
+from result_cache import DetectionResultCache, make_cache_key
+
+
+def test_model_change_drops_entries():
+    cache = DetectionResultCache(model_id="stub:a")
+    key = make_cache_key("abc", 0.25, True, "auto_gamma", "off")
+    cache.put(key, [{"name": "apple", "quantity": 1}])
+    cache.set_model_id("stub:a")
+    assert cache.get(key) is not None
+    cache.set_model_id("stub:b")
+    assert cache.get(key) is None
+
+
+def test_app_cache_follows_loaded_model(app_module):
+    import detect_items
+
+    assert app_module.result_cache.model_id == detect_items.model_status()["model_id"]
+    app_module.result_cache.set_model_id("something-else")
+    detect_items.on_model_ready(app_module.result_cache.set_model_id)
+    assert app_module.result_cache.model_id == detect_items.model_status()["model_id"]
+
+
+def test_key_covers_resolved_modes():
+    base = make_cache_key("abc", 0.25, True, "auto_gamma", "off")
+    assert make_cache_key("abc", 0.25, True, "fixed", "off") != base
+    assert make_cache_key("abc", 0.25, True, "auto_gamma", "auto") != base
+    assert make_cache_key("abc", 0.25, True, "auto_gamma", "off", roi="r1") != base
+
+
+def test_changed_default_mode_misses_cache(app_module, client, monkeypatch):
+    import detect_items
+
+    img = np.zeros((480, 640, 3), np.uint8)
+    cv2.circle(img, (100, 100), 30, (0, 0, 255), -1)
+    cv2.putText(img, uuid.uuid4().hex, (10, 470), cv2.FONT_HERSHEY_PLAIN, 1, (40, 40, 40))  # Unique bytes
+    data = cv2.imencode(".jpg", img)[1].tobytes()
+
+    def upload():
+        return client.post("/upload", data=upload_form(data, preprocess="true")).get_json()
+
+    assert upload()["cached"] is False
+    assert upload()["cached"] is True
+    monkeypatch.setattr(detect_items, "PREPROCESS_MODE", "fixed")
+    assert upload()["cached"] is False
+    monkeypatch.setattr(detect_items, "TILED_INFERENCE", "on")
+    assert upload()["cached"] is False
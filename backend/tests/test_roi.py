@@ -0,0 +1,61 @@
+"""Regions of interest"""
+import io
+
+import numpy as np
+import pytest
+
+from roi import MASK_VALUE, RegionStore, crop_regions, validate_regions
+
+
+def frame():
+    return np.arange(100 * 200 * 3, dtype=np.uint32).reshape(100, 200, 3).astype(np.uint8)
+
+
+def test_single_rect_is_a_view():
+    img = frame()
+    crop, offset = crop_regions(img, validate_regions([{"rect": [0.1, 0.2, 0.5, 0.6]}]))
+    assert offset == (20, 20)
+    assert crop.shape == (40, 80, 3)
+    assert np.shares_memory(crop, img)
+
+
+def test_regions_run_as_one_masked_crop():
+    img = frame()
+    regions = validate_regions([
+        {"name": "left", "rect": [0.0, 0.0, 0.25, 0.5]},
+        {"name": "right", "rect": [0.75, 0.5, 1.0, 1.0]},
+    ])
+    crop, offset = crop_regions(img, regions)
+    assert offset == (0, 0) and crop.shape == img.shape
+    assert (crop[:50, :50] == img[:50, :50]).all()
+    assert (crop[60:, 160:] == img[60:, 160:]).all()
+    assert (crop[:50, 60:140] == MASK_VALUE).all()  # Between the regions
+
+
+def test_polygon_outside_is_masked():
+    img = np.full((100, 100, 3), 255, np.uint8)
+    crop, _ = crop_regions(img, validate_regions([{"polygon": [[0, 0], [1, 0], [0, 1]]}]))
+    assert crop[5, 5, 0] == 255
+    assert crop[95, 95, 0] == MASK_VALUE
+
+
+@pytest.mark.parametrize("regions", [[], [{"rect": [0.5, 0.5, 0.4, 0.9]}], [{"polygon": [[0, 0], [1, 1]]}]])
+def test_invalid_regions(regions):
+    with pytest.raises(ValueError):
+        validate_regions(regions)
+
+
+def test_region_store_persists(tmp_path):
+    path = str(tmp_path / "rois.json")
+    RegionStore(path).set("cam-1", [{"rect": [0, 0, 0.5, 0.5]}])
+    assert RegionStore(path).get("cam-1") == [{"name": "region-0", "rect": [0.0, 0.0, 0.5, 0.5]}]
+
+
+def test_upload_detects_only_inside_regions(client, fridge_jpeg):
+    # The blob is at (100, 100) in a 640x480 frame
+    for rect, expected in (([0.0, 0.0, 0.5, 0.5], ["bottle"]), ([0.5, 0.5, 1.0, 1.0], [])):
+        assert client.put("/devices/roi-cam/roi", json={"regions": [{"rect": rect}]}).status_code == 200
+        response = client.post("/upload", data={
+            "image": (io.BytesIO(fridge_jpeg), "frame.jpg"), "device_id": "roi-cam", "force": "true",
+            "preprocess": "false"})
+        assert [item["name"] for item in response.get_json()["items"]] == expected
@@ -0,0 +1,67 @@
+"""Per-camera count smoothing: commits and hysteresis"""
+import time
+
+from temporal_filter import TemporalCountFilter
+
+
+def frame(**counts):
+    return [{"name": name, "quantity": quantity, "confidence": 0.9} for name, quantity in counts.items()]
+
+
+def test_count_commits_after_stable_frames():
+    counts = TemporalCountFilter(window=5, stable_frames=3)
+    assert counts.observe("cam", frame(milk=2)) == []
+    assert counts.observe("cam", frame(milk=2)) == []
+    [committed] = counts.observe("cam", frame(milk=2))
+    assert (committed["name"], committed["quantity"]) == ("milk", 2)
+    assert counts.observe("cam", frame(milk=2)) == []
+    assert counts.snapshot("cam") == [dict(frame(milk=2)[0])]
+
+
+def test_single_frame_flicker_is_suppressed():
+    counts = TemporalCountFilter(window=5, stable_frames=3)
+    for _ in range(3):
+        counts.observe("cam", frame(milk=2))
+    assert counts.observe("cam", frame(milk=1)) == []
+    assert counts.observe("cam", frame(milk=2)) == []
+    assert counts.stats()["suppressed_changes"] == 1
+    assert counts.snapshot("cam")[0]["quantity"] == 2
+
+
+def test_removal_commits_quantity_zero_once_stable():
+    counts = TemporalCountFilter(window=5, stable_frames=3)
+    for _ in range(3):
+        counts.observe("cam", frame(milk=2))
+    changes = [counts.observe("cam", []) for _ in range(5)]
+    # The window median reaches 0 on the third empty frame, then has to hold for three frames
+    assert changes[:4] == [[], [], [], []]
+    [removed] = changes[4]
+    assert (removed["quantity"], removed["status"]) == (0, "Not detected")
+    assert counts.snapshot("cam") == []
+    assert counts.stats()["tracked_items"] == 0
+
+
+def test_brief_sighting_is_forgotten():
+    counts = TemporalCountFilter(window=5, stable_frames=3)
+    assert counts.observe("cam", frame(apple=1)) == []
+    assert counts.observe("cam", []) == []
+    assert counts.stats()["tracked_items"] == 0
+    assert counts.stats()["commits"] == 0
+
+
+def test_cameras_are_independent():
+    counts = TemporalCountFilter(window=3, stable_frames=2)
+    counts.observe("a", frame(egg=6))
+    counts.observe("b", frame(egg=4))
+    assert [item["quantity"] for item in counts.observe("a", frame(egg=6))] == [6]
+    assert [item["quantity"] for item in counts.observe("b", frame(egg=4))] == [4]
+    assert counts.stats()["devices"] == 2
+
+
+def test_idle_cameras_expire():
+    counts = TemporalCountFilter(window=3, stable_frames=1, idle_seconds=0.05)
+    counts.observe("old", frame(milk=1))
+    time.sleep(0.1)
+    counts.observe("new", frame(milk=1))
+    assert counts.stats()["devices"] == 1
+    assert counts.snapshot("old") == []
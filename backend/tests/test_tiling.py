@@ -0,0 +1,61 @@
+"""Tile grid and cross-tile merging"""
+import numpy as np
+
+from tiling import merge_detections, offset_detections, tile_grid, tile_starts
+
+
+def test_tiles_cover_frame_with_overlap():
+    starts = tile_starts(1920, 640, 0.2)
+    assert starts[0] == 0 and starts[-1] == 1920 - 640
+    assert all(b - a <= 640 * 0.8 for a, b in zip(starts, starts[1:]))
+    tiles = tile_grid((1080, 1920), 640, 0.2)
+    assert max(x2 for _, _, x2, _ in tiles) == 1920 and max(y2 for _, _, _, y2 in tiles) == 1080
+
+
+def test_offsets_shift_boxes_to_frame():
+    results = [
+        (np.array([1]), np.array([0.9], np.float32), np.array([[10, 10, 20, 20]], np.float32)),
+        (np.empty(0, np.intp), np.empty(0, np.float32), np.empty((0, 4), np.float32)),
+    ]
+    cls, conf, xyxy = offset_detections(results, [(100, 50), (0, 0)])
+    assert xyxy.tolist() == [[110, 60, 120, 70]]
+
+
+def test_merge_drops_duplicates_and_partial_boxes_per_class():
+    cls = np.array([1, 1, 1, 2])
+    conf = np.array([0.9, 0.8, 0.7, 0.6], np.float32)
+    xyxy = np.array([
+        [0, 0, 100, 100],   # Full item
+        [2, 2, 101, 99],    # Same item from the overlapping tile (IoU)
+        [60, 0, 100, 100],  # Partial box cut by a tile border (contained)
+        [0, 0, 100, 100],   # Another class at the same place stays
+    ], np.float32)
+    kept_cls, kept_conf, kept_xyxy = merge_detections(cls, conf, xyxy, 0.45, 0.8)
+    assert kept_cls.tolist() == [1, 2]
+    assert kept_conf.tolist() == [np.float32(0.9), np.float32(0.6)]
+
+
+def test_merge_keeps_separate_items():
+    cls = np.array([1, 1])
+    conf = np.array([0.9, 0.8], np.float32)
+    xyxy = np.array([[0, 0, 50, 50], [60, 0, 110, 50]], np.float32)
+    assert len(merge_detections(cls, conf, xyxy)[0]) == 2
+
+
+def test_tiling_is_off_unless_requested(app_module):
+    from detect_items import should_tile
+
+    assert not should_tile((3024, 4032, 3))
+    assert should_tile((3024, 4032, 3), "on")
+    assert not should_tile((480, 640, 3), "on")
+
+
+def test_auto_tiles_only_above_threshold(app_module):
+    from detect_items import TILE_AUTO_MIN_PIXELS, should_tile
+
+    width = 1280
+    height = TILE_AUTO_MIN_PIXELS // width
+    assert not should_tile((480, 640, 3), "auto")
+    assert not should_tile((height, width, 3), "auto")
+    assert should_tile((height + 1, width, 3), "auto")
+    assert should_tile((3024, 4032, 3), "auto")
@@ -0,0 +1,32 @@
+"""Upload -> frame gate -> temporal filter -> inventory"""
+import uuid
+
+from conftest import upload_form
+
+
+def test_static_camera_fills_inventory(app_module, client, fridge_jpeg):
+    device_id, fridge_id = f"cam-{uuid.uuid4().hex[:6]}", f"fridge-{uuid.uuid4().hex[:6]}"
+    responses = [
+        client.post("/upload", data=upload_form(fridge_jpeg, device_id=device_id, fridge_id=fridge_id)).get_json()
+        for _ in range(app_module.TEMPORAL_STABLE_FRAMES + 2)
+    ]
+    # After the first frame the gate reuses the detection, but the filter still sees every frame
+    assert [r["frame_unchanged"] for r in responses] == [False] + [True] * (len(responses) - 1)
+
+    inventory = client.get(f"/inventory?fridge_id={fridge_id}").get_json()
+    assert [(item["name"], item["quantity"]) for item in inventory] == [("bottle", 1)]
+
+
+def test_inventory_waits_for_stable_frames(app_module, client, fridge_jpeg):
+    device_id, fridge_id = f"cam-{uuid.uuid4().hex[:6]}", f"fridge-{uuid.uuid4().hex[:6]}"
+    for _ in range(app_module.TEMPORAL_STABLE_FRAMES - 1):
+        client.post("/upload", data=upload_form(fridge_jpeg, device_id=device_id, fridge_id=fridge_id))
+    assert client.get(f"/inventory?fridge_id={fridge_id}").get_json() == []
+
+
+def test_upload_without_device_commits_at_once(client, fridge_jpeg):
+    fridge_id = f"fridge-{uuid.uuid4().hex[:6]}"
+    response = client.post("/upload", data=upload_form(fridge_jpeg, fridge_id=fridge_id, force="true"))
+    assert response.status_code == 200
+    inventory = client.get(f"/inventory?fridge_id={fridge_id}").get_json()
+    assert [item["name"] for item in inventory] == ["bottle"]
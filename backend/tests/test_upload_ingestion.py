@@ -0,0 +1,71 @@
+"""Streaming upload ingestion: early size and format rejection"""
+import cv2
+import numpy as np
+import pytest
+
+from conftest import upload_form
+from image_utils import PNG_SIGNATURE, ImageRejected, ImageUploadBuffer, sniff_image_header
+
+
+def png_header(width, height):
+    return PNG_SIGNATURE + (13).to_bytes(4, "big") + b"IHDR" + width.to_bytes(4, "big") + height.to_bytes(4, "big")
+
+
+def test_sniff_reads_format_and_size(fridge_jpeg):
+    assert sniff_image_header(fridge_jpeg[:2048]) == ("jpeg", 640, 480)
+    assert sniff_image_header(png_header(320, 240)) == ("png", 320, 240)
+    assert sniff_image_header(fridge_jpeg[:4]) is None  # Needs more bytes
+
+
+@pytest.mark.parametrize("data", [b"GIF89a....", b"hello world", b"%PDF"])
+def test_sniff_rejects_other_formats(data):
+    with pytest.raises(ImageRejected) as error:
+        sniff_image_header(data)
+    assert error.value.status_code == 415
+
+
+def test_buffer_enforces_size_while_writing():
+    buffer = ImageUploadBuffer(max_size=100)
+    buffer.write(png_header(320, 240))
+    with pytest.raises(ImageRejected) as error:
+        buffer.write(b"\0" * 100)
+    assert error.value.status_code == 413
+
+
+def test_buffer_rejects_dimensions_from_header():
+    buffer = ImageUploadBuffer()
+    with pytest.raises(ImageRejected) as error:
+        buffer.write(png_header(9000, 9000))
+    assert error.value.status_code == 413
+    with pytest.raises(ImageRejected) as error:
+        ImageUploadBuffer().write(png_header(20, 20))
+    assert error.value.status_code == 400
+
+
+def test_buffer_sniffs_across_chunks(fridge_jpeg):
+    buffer = ImageUploadBuffer()
+    for start in range(0, len(fridge_jpeg), 7):
+        buffer.write(fridge_jpeg[start:start + 7])
+    assert (buffer.image_format, buffer.image_size) == ("jpeg", (640, 480))
+    assert buffer.getvalue() == fridge_jpeg
+
+
+def test_upload_rejects_non_image_with_415(client):
+    response = client.post("/upload", data=upload_form(b"just some text, not a picture"))
+    assert response.status_code == 415
+
+
+def test_upload_rejects_huge_dimensions_with_413(client):
+    response = client.post("/upload", data=upload_form(png_header(9000, 9000) + b"\0" * 64))
+    assert response.status_code == 413
+
+
+def test_upload_rejects_oversized_body_with_413(app_module, client):
+    data = png_header(640, 480) + b"\0" * app_module.MAX_UPLOAD_REQUEST_BYTES
+    response = client.post("/upload", data=upload_form(data))
+    assert response.status_code == 413
+
+
+def test_upload_rejects_tiny_image_with_400(client):
+    data = cv2.imencode(".png", np.zeros((20, 20, 3), np.uint8))[1].tobytes()
+    assert client.post("/upload", data=upload_form(data)).status_code == 400
@@ -0,0 +1,116 @@
+"""
+Sliced inference helpers for high-resolution frames
+
+A large frame is cut into overlapping tiles that are each close to the
+model's input size, so small items are not lost to downscaling. The
+per-tile boxes are shifted back to frame coordinates and merged with a
+class-aware NMS that also drops boxes mostly contained in a stronger box
+of the same class (an item cut by a tile border shows up as a partial box
+in one tile and a full box in the neighbouring one).
+"""
+import math
+
+import cv2
+import numpy as np
+
+
+def tile_starts(length, tile_size, overlap):
+    """
+    Evenly spaced tile offsets covering [0, length) with at least the given overlap
+
+    Args:
+        length: Image width or height in pixels
+        tile_size: Tile width or height in pixels
+        overlap: Minimum overlap between neighbouring tiles (0.0-0.9)
+
+    Returns:
+        list: Start offsets (the last tile ends exactly at length)
+    """
+    if length <= tile_size:
+        return [0]
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+    count = math.ceil((length - tile_size) / stride) + 1
+    return [int(round(x)) for x in np.linspace(0, length - tile_size, count)]
+
+
+def tile_grid(shape, tile_size, overlap):
+    """
+    Tile rectangles for an image of the given shape
+
+    Returns:
+        list: (x1, y1, x2, y2) tuples in row-major order
+    """
+    height, width = shape[:2]
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in tile_starts(height, tile_size, overlap)
+            for x in tile_starts(width, tile_size, overlap)]
+
+
+def crop_tiles(img, tiles):
+    """Views of img for each (x1, y1, x2, y2) rectangle (no pixel copies)"""
+    return [img[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+
+
+def offset_detections(results, offsets):
+    """
+    Concatenate per-tile detections in frame coordinates
+
+    Args:
+        results: (cls, conf, xyxy) per tile
+        offsets: (x, y) of each tile's top-left corner in the frame
+
+    Returns:
+        tuple: (cls, conf, xyxy) arrays for all tiles
+    """
+    classes, scores, boxes = [], [], []
+    for (cls, conf, xyxy), (dx, dy) in zip(results, offsets):
+        if len(cls) == 0:
+            continue
+        shifted = xyxy.astype(np.float32, copy=True)
+        shifted[:, [0, 2]] += dx
+        shifted[:, [1, 3]] += dy
+        classes.append(cls)
+        scores.append(conf)
+        boxes.append(shifted)
+    if not classes:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.float32)
+    return np.concatenate(classes), np.concatenate(scores), np.concatenate(boxes)
+
+
+def merge_detections(cls, conf, xyxy, iou_threshold=0.45, containment_threshold=0.8):
+    """
+    Class-aware NMS across tiles
+
+    A box is dropped when a higher-scoring box of the same class overlaps it
+    by more than iou_threshold (IoU), or covers more than
+    containment_threshold of the smaller of the two boxes.
+
+    Returns:
+        tuple: (cls, conf, xyxy) of the kept boxes, highest confidence first
+    """
+    if len(cls) == 0:
+        return cls, conf, xyxy
+    # Fast path: OpenCV's batched NMS removes the plain IoU duplicates
+    xywh = xyxy.copy()
+    xywh[:, 2:] -= xywh[:, :2]
+    kept = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(), 0.0, iou_threshold)
+    kept = np.asarray(kept, dtype=np.intp).reshape(-1)
+    kept = kept[np.argsort(-conf[kept], kind="stable")]
+    cls, conf, xyxy = cls[kept], conf[kept], xyxy[kept]
+
+    # Then drop partial boxes cut by a tile border
+    areas = np.maximum(xyxy[:, 2] - xyxy[:, 0], 0) * np.maximum(xyxy[:, 3] - xyxy[:, 1], 0)
+    keep = np.ones(len(cls), dtype=bool)
+    for i in range(len(cls)):
+        if not keep[i]:
+            continue
+        rest = np.flatnonzero(keep[i + 1:]) + i + 1
+        rest = rest[cls[rest] == cls[i]]
+        if len(rest) == 0:
+            continue
+        w = np.minimum(xyxy[rest, 2], xyxy[i, 2]) - np.maximum(xyxy[rest, 0], xyxy[i, 0])
+        h = np.minimum(xyxy[rest, 3], xyxy[i, 3]) - np.maximum(xyxy[rest, 1], xyxy[i, 1])
+        inter = np.maximum(w, 0) * np.maximum(h, 0)
+        smaller = np.maximum(np.minimum(areas[rest], areas[i]), 1e-6)
+        keep[rest[inter / smaller > containment_threshold]] = False
+    return cls[keep], conf[keep], xyxy[keep]
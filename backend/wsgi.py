@@ -0,0 +1,15 @@
+"""
+Production WSGI entry point
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Any WSGI server works (waitress-serve --port=5000 wsgi:application), but
+only gunicorn.conf.py calls app.shutdown_services when a worker exits; other
+servers rely on the atexit hook.
+"""
+from app import app, backfill_item_history, seed_default_inventory
+
+seed_default_inventory()
+backfill_item_history()
+
+application = app
@@ -11,16 +11,20 @@
 // IMPORTANT: Replace these with your actual WiFi credentials and Flask server IP
 const char *ssid = "YOUR_WIFI_SSID";           // Replace with your WiFi name
 const char *password = "YOUR_WIFI_PASSWORD";    // Replace with your WiFi password
-const char *serverUrl = "http://10.79.192.126:5000/upload";  // Flask backend server IP (update if different)
+const char *serverUrl = "http://10.79.192.126:5000/upload?async=true";  // Flask backend server IP (update if different); async=true returns 202 immediately
+const char *serverBase = "http://10.79.192.126:5000";  // Same server, used for the capture command long-poll
 
 // Web server for streaming
 WebServer server(80);
 
 // Settings
-const unsigned long CAPTURE_INTERVAL = 30000;  // Capture every 30 seconds (adjust as needed)
+const unsigned long CAPTURE_INTERVAL = 300000;  // Fallback capture every 5 minutes; normal captures are triggered by the server
+const unsigned long COMMAND_POLL_WAIT = 25;  // Seconds the server holds a command long-poll open
 const unsigned long WIFI_RECONNECT_DELAY = 5000;  // Reconnect WiFi every 5 seconds if disconnected
 unsigned long lastCaptureTime = 0;
 unsigned long lastWiFiCheck = 0;
+String deviceId;  // "cam-" + MAC address, sent with every upload and command poll
+volatile bool captureRequested = false;  // Set by the command task when the server sends "capture"
 
 // WiFi connection helper
 bool ensureWiFiConnected() {
@@ -50,6 +54,36 @@ bool ensureWiFiConnected() {
   }
 }
 
+// Background task: hold a long-poll open on the server and flag captures when commanded.
+// Runs on core 0 so the stream web server in loop() is never blocked by the poll.
+void commandTask(void *param) {
+  String url = String(serverBase) + "/devices/" + deviceId + "/commands?wait=" + String(COMMAND_POLL_WAIT);
+  for (;;) {
+    if (WiFi.status() != WL_CONNECTED) {
+      vTaskDelay(pdMS_TO_TICKS(2000));
+      continue;
+    }
+    WiFiClient client;
+    HTTPClient http;
+    http.setTimeout((COMMAND_POLL_WAIT + 10) * 1000);
+    if (http.begin(client, url)) {
+      int code = http.GET();
+      if (code == 200) {
+        String body = http.getString();
+        if (body.indexOf("\"capture\"") >= 0) {
+          Serial.println("📥 Capture command received");
+          captureRequested = true;
+        }
+      } else if (code < 0) {
+        vTaskDelay(pdMS_TO_TICKS(5000));  // Server unreachable, back off
+      }
+      http.end();
+    } else {
+      vTaskDelay(pdMS_TO_TICKS(5000));
+    }
+  }
+}
+
 // Handle MJPEG streaming
 void handleStream() {
   WiFiClient client = server.client();
@@ -185,6 +219,13 @@ void setup() {
   lastCaptureTime = millis();
   lastWiFiCheck = millis();
   
+  // Start listening for on-demand capture commands
+  deviceId = "cam-" + WiFi.macAddress();
+  deviceId.replace(":", "");
+  Serial.print("🆔 Device ID: ");
+  Serial.println(deviceId);
+  xTaskCreatePinnedToCore(commandTask, "commandTask", 8192, NULL, 1, NULL, 0);
+  
   Serial.println("✅ Setup complete! Streaming available and capture loop started...\n");
 }
 
@@ -200,8 +241,8 @@ void loop() {
     lastWiFiCheck = currentTime;
   }
   
-  // Check if it's time to capture and upload to Flask backend
-  if (currentTime - lastCaptureTime < CAPTURE_INTERVAL) {
+  // Capture when the server asks for it, or on the fallback interval
+  if (!captureRequested && currentTime - lastCaptureTime < CAPTURE_INTERVAL) {
     delay(100);  // Small delay to allow web server processing
     return;
   }
@@ -213,6 +254,7 @@ void loop() {
     return;
   }
   
+  captureRequested = false;
   Serial.println("\n📸 Starting image capture for upload...");
   
   // Capture image for upload (separate from stream)
@@ -250,7 +292,7 @@ bool uploadImage(camera_fb_t *fb) {
   HTTPClient http;
   
   // Set timeout
-  http.setTimeout(30000);  // 30 seconds timeout
+  http.setTimeout(10000);  // 10 seconds timeout (async uploads return 202 as soon as the image is accepted)
   
   Serial.print("📤 Connecting to server: ");
   Serial.println(serverUrl);
@@ -266,6 +308,8 @@ bool uploadImage(camera_fb_t *fb) {
 
   // Build multipart body
   String head = "--" + boundary + "\r\n";
+  head += "Content-Disposition: form-data; name=\"device_id\"\r\n\r\n" + deviceId + "\r\n";
+  head += "--" + boundary + "\r\n";
   head += "Content-Disposition: form-data; name=\"image\"; filename=\"esp32cam.jpg\"\r\n";
   head += "Content-Type: image/jpeg\r\n\r\n";
 
@@ -307,8 +351,12 @@ bool uploadImage(camera_fb_t *fb) {
     String response = http.getString();
     Serial.println("📦 Response: " + response);
     
+    if (httpResponseCode == 429) {
+      Serial.println("⏳ Server busy (queue full), frame dropped");
+    }
+    
     http.end();
-    return (httpResponseCode == 200);
+    return (httpResponseCode == 200 || httpResponseCode == 202);
   } else {
     Serial.printf("❌ POST error: %d\n", httpResponseCode);
     if (httpResponseCode == -1) {
@@ -145,7 +145,26 @@ export const uploadImage = async (fileUri) => {
   }
 };
 
-// 🧺 Fetch Full Inventory
+// 🔄 Delta sync state: last revision seen and items keyed by lowercase name
+let inventoryCache = { revision: null, items: new Map() };
+
+const inventoryKey = (name) => String(name).trim().toLowerCase();
+
+const fetchFullInventory = async () => {
+  const response = await axios.get(`${API_URL}/inventory`, {
+    timeout: 5000,
+    validateStatus: (status) => status < 500,
+  });
+  const items = Array.isArray(response.data) ? response.data : [];
+  const revision = Number(response.headers?.["x-inventory-revision"]);
+  inventoryCache = {
+    revision: Number.isFinite(revision) ? revision : null,
+    items: new Map(items.map((item) => [inventoryKey(item.name), item])),
+  };
+  return items;
+};
+
+// 🧺 Fetch Inventory (only changes since the last fetch after the first call)
 export const getInventory = async () => {
   if (USE_MOCK_DATA) {
     console.log("📦 Returning mock inventory data");
@@ -155,12 +174,24 @@ export const getInventory = async () => {
   }
   
   try {
-    const response = await axios.get(`${API_URL}/inventory`, {
-      timeout: 5000, // Reduced timeout to 5 seconds
+    if (inventoryCache.revision === null) {
+      return await fetchFullInventory();
+    }
+
+    const response = await axios.get(`${API_URL}/inventory/changes`, {
+      params: { since: inventoryCache.revision },
+      timeout: 5000,
       validateStatus: (status) => status < 500,
     });
-    // Ensure we return an array
-    return Array.isArray(response.data) ? response.data : [];
+    const delta = response.data;
+    if (response.status !== 200 || !delta || delta.full) {
+      return await fetchFullInventory();
+    }
+
+    (delta.deleted || []).forEach((name) => inventoryCache.items.delete(inventoryKey(name)));
+    (delta.upserted || []).forEach((item) => inventoryCache.items.set(inventoryKey(item.name), item));
+    inventoryCache.revision = delta.revision;
+    return Array.from(inventoryCache.items.values());
   } catch (error) {
     // Don't log errors - just fallback to mock data
     if (__DEV__) {
@@ -168,6 +199,7 @@ export const getInventory = async () => {
     }
     // Fallback to mock data if backend fails
     console.log("📦 Falling back to mock data");
+    inventoryCache = { revision: null, items: new Map() };
     return Array.isArray(MOCK_INVENTORY) ? [...MOCK_INVENTORY] : [];
   }
 };
@@ -241,3 +273,22 @@ export const deleteInventoryItem = async (name) => {
     throw error;
   }
 };
+
+// 📸 Ask the fridge cameras to capture now (all cameras unless deviceId is given)
+export const triggerCapture = async (deviceId = null, triggerId = "app_refresh") => {
+  if (USE_MOCK_DATA) {
+    return { message: "Trigger simulated (mock mode)" };
+  }
+
+  try {
+    const response = await axios.post(
+      `${API_URL}/trigger_capture`,
+      deviceId ? { device_id: deviceId, trigger_id: triggerId } : { trigger_id: triggerId },
+      { headers: { "Content-Type": "application/json" }, timeout: 5000 }
+    );
+    return response.data;
+  } catch (error) {
+    console.error("❌ Trigger Capture Error:", error.message);
+    throw error;
+  }
+};